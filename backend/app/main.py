@@ -2,16 +2,34 @@ import sys
 import os
 import json
 import time
+import asyncio
 import logging
-from fastapi import FastAPI, HTTPException, Request
+from contextlib import aclosing, asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
 
-from backend.app.models.schemas import ChatRequest, ChatResponse
-from rag_engine.agents.onboarding_agent import agent_executor
-from langchain_core.messages import HumanMessage, ToolMessage
+from backend.app.models.schemas import ChatRequest, ChatResponse, IndexReloadRequest, IndexReloadResponse
+from rag_engine.agents.onboarding_agent import DB_FILE as MEMORY_DB_FILE, LLM_MODEL, agent_executor
+from rag_engine.agents.answer_cache import AnswerCache, ANSWER_CACHE_ENABLED, knowledge_version
+from rag_engine.agents.tools import POLICY_SEARCH_K
+from rag_engine.agents.retention import CHECKPOINT_GC_ENABLED, CheckpointRetention, ThreadActivity
+from rag_engine.ingestion.watcher import read_watch_stats
+from rag_engine.observability.health import (
+    HEALTH_LLM_CHECK, HealthMonitor, data_files_check, gemini_check, sqlite_check,
+)
+from rag_engine.observability.metrics import (
+    AGENT_RUNS_IN_FLIGHT, METRICS_ENABLED, AgentMetricsCallback, MetricsMiddleware, render_metrics,
+)
+from rag_engine.observability.profiler import PROFILE_ENABLED, profile_request
+from rag_engine.observability.tracing import TraceCallback, current_trace, traced_request
+from rag_engine.retrieval.embeddings import read_index_provider
+from rag_engine.retrieval.prefetch import prefetch_policies
+from rag_engine.retrieval.retriever import get_retriever
+from rag_engine.retrieval.snapshots import activate_snapshot
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
 
 # --- Logging ---
 logging.basicConfig(
@@ -21,7 +39,145 @@ logging.basicConfig(
 )
 logger = logging.getLogger("nebula.api")
 
-app = FastAPI(title="Nebula AI Onboarding API", version="1.0")
+# --- Concurrency ---
+# Agent runs are awaited on the event loop; this caps how many run at once.
+MAX_CONCURRENT_CHATS = int(os.getenv("MAX_CONCURRENT_CHATS", "32"))
+CHAT_QUEUE_TIMEOUT = float(os.getenv("CHAT_QUEUE_TIMEOUT", "30"))
+chat_slots = asyncio.Semaphore(MAX_CONCURRENT_CHATS)
+
+async def _acquire_chat_slot():
+    try:
+        await asyncio.wait_for(chat_slots.acquire(), timeout=CHAT_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning("Chat capacity exhausted; rejecting request")
+        raise HTTPException(status_code=503, detail="The assistant is busy. Please try again shortly.")
+    AGENT_RUNS_IN_FLIGHT.inc()
+
+def _release_chat_slot():
+    AGENT_RUNS_IN_FLIGHT.dec()
+    chat_slots.release()
+
+def _agent_run_config(config: dict):
+    """
+    Run config for one agent invocation, with the per-request metrics
+    callback (returned too, or None when metrics are off) and the trace
+    callback of the current request.
+    """
+    callbacks = []
+    metrics_callback = AgentMetricsCallback() if METRICS_ENABLED else None
+    if metrics_callback is not None:
+        callbacks.append(metrics_callback)
+    trace = current_trace()
+    if trace is not None:
+        callbacks.append(TraceCallback(trace))
+    return ({**config, "callbacks": callbacks} if callbacks else config), metrics_callback
+
+# --- Answer Cache ---
+# Serves repeated first-turn questions without running the agent. Swapping
+# to another index snapshot also invalidates the cached answers.
+answer_cache = AnswerCache(
+    embed_fn=lambda q: get_retriever().embed_query(q),
+    version_fn=lambda: f"{knowledge_version()}:{get_retriever().index_version()}",
+) if ANSWER_CACHE_ENABLED else None
+
+# --- Admin ---
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+def _require_admin(request: Request):
+    if ADMIN_TOKEN and request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin token required.")
+
+def _profile_requested(request: Request) -> bool:
+    # PROFILE_ENABLED is checked first so unprofiled requests pay nothing else
+    return (
+        PROFILE_ENABLED and request.headers.get("X-Profile") == "1"
+        and (not ADMIN_TOKEN or request.headers.get("X-Admin-Token") == ADMIN_TOKEN)
+    )
+
+async def _answer_cache_lookup(query: str, config: dict):
+    """
+    Returns (cached entry or None, query vector, eligible). Only the first turn
+    of a thread is eligible: later turns depend on the conversation so far.
+    """
+    if answer_cache is None:
+        return None, None, False
+    try:
+        state = await agent_executor.aget_state(config)
+        if state.values.get("messages"):
+            return None, None, False
+        entry, vector, similarity = await asyncio.to_thread(answer_cache.lookup, query)
+    except Exception:
+        logger.warning("Answer cache lookup failed; running the agent", exc_info=True)
+        return None, None, False
+    if entry is not None:
+        logger.info(f"Answer cache hit (similarity={similarity:.3f}): {entry.query[:80]}")
+    return entry, vector, True
+
+async def _record_cached_turn(query: str, answer: str, config: dict):
+    """Writes a cache-served exchange into the thread so follow-ups see it."""
+    await agent_executor.aupdate_state(
+        config, {"messages": [HumanMessage(content=query), AIMessage(content=answer)]}, as_node="agent"
+    )
+
+async def _answer_cache_store(query: str, answer: str, vector):
+    try:
+        await asyncio.to_thread(answer_cache.store, query, answer, vector)
+    except Exception:
+        logger.warning("Answer cache store failed", exc_info=True)
+
+# --- Health ---
+# Dependencies are checked by a background task; /readyz and /health only
+# read its cached results, so probes never touch the disk or the network.
+def _vector_db_check() -> dict:
+    retriever = get_retriever()
+    if not (os.path.exists(retriever.db_path) or retriever.snapshot_dir):
+        return {"status": "warning", "doc_count": 0}
+    return {
+        "doc_count": retriever.count(),
+        "embedding_provider": read_index_provider(retriever.active_db_path),
+        "backend": retriever.backend, "snapshot": retriever.index_version(),
+    }
+
+def _health_checks() -> dict:
+    checks = {
+        "vector_db": _vector_db_check,
+        "data_files": data_files_check(
+            os.getenv("DATA_PATH", "./data_seed"), ["org_chart.json", "role_definitions.json"],
+        ),
+        "checkpoint_db": sqlite_check(MEMORY_DB_FILE),
+    }
+    if HEALTH_LLM_CHECK:
+        checks["llm"] = gemini_check(LLM_MODEL, os.getenv("GOOGLE_API_KEY"))
+    return checks
+
+health_monitor = HealthMonitor(_health_checks())
+
+# --- Checkpoint Retention ---
+# Chat requests run inside thread_activity.track(); the optional background
+# pass prunes and expires only threads without a request in flight.
+thread_activity = ThreadActivity()
+checkpoint_retention = CheckpointRetention(MEMORY_DB_FILE, activity=thread_activity)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the vector store once so the first question doesn't pay for it
+    try:
+        doc_count = get_retriever().warm()
+        logger.info(f"Retriever warmed ({doc_count} chunks)")
+    except Exception:
+        logger.exception("Retriever warm-up failed; will retry on first search")
+    health_monitor.start()
+    if CHECKPOINT_GC_ENABLED:
+        checkpoint_retention.start()
+    yield
+    await health_monitor.stop()
+    await checkpoint_retention.stop()
+    # The pooled checkpointer commits its queued writes before closing
+    close_checkpointer = getattr(agent_executor.checkpointer, "close", None)
+    if close_checkpointer is not None:
+        await asyncio.to_thread(close_checkpointer)
+
+app = FastAPI(title="Nebula AI Onboarding API", version="1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -30,9 +186,16 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Probes arrive every few seconds; logging each one would drown the request log
+UNLOGGED_PATHS = {"/livez", "/readyz"}
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
+    if request.url.path in UNLOGGED_PATHS:
+        return await call_next(request)
     start = time.time()
     response = await call_next(request)
     duration_ms = (time.time() - start) * 1000
@@ -43,7 +206,9 @@ def _extract_text(raw_content) -> str:
     """Extract plain text from Gemini's response format."""
     if isinstance(raw_content, list):
         return "".join(
-            part.get("text", "") for part in raw_content if part.get("type") == "text"
+            part if isinstance(part, str) else part.get("text", "")
+            for part in raw_content
+            if isinstance(part, str) or part.get("type") == "text"
         )
     return str(raw_content)
 
@@ -51,80 +216,236 @@ def _extract_text(raw_content) -> str:
 async def root():
     return {"status": "ok", "service": "Nebula Onboarding AI"}
 
+@app.get("/livez")
+async def liveness():
+    """Liveness probe: the event loop is serving requests. Checks nothing else."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readiness(response: Response):
+    """Readiness probe from the cached dependency checks; 503 until ready."""
+    snapshot = health_monitor.snapshot()
+    if snapshot["status"] != "ready":
+        response.status_code = 503
+    return snapshot
+
 @app.get("/health")
 async def health_check():
-    """Detailed health check with database and LLM status."""
-    health = {"status": "ok", "service": "Nebula Onboarding AI", "checks": {}}
+    """
+    Detailed health: the cached dependency checks plus in-memory cache and
+    watcher stats, and the last checkpoint retention report.
+    """
+    snapshot = health_monitor.snapshot()
+    health = {"status": "ok" if snapshot["status"] == "ready" else "degraded",
+              "service": "Nebula Onboarding AI", "readiness": snapshot["status"], "checks": snapshot["checks"]}
 
-    # Check ChromaDB
-    try:
-        from langchain_chroma import Chroma
-        from langchain_google_genai import GoogleGenerativeAIEmbeddings
-        db_path = os.getenv("DB_PATH", "./chroma_db")
-        if os.path.exists(db_path):
-            embeddings = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
-            db = Chroma(persist_directory=db_path, embedding_function=embeddings)
-            doc_count = db._collection.count()
-            health["checks"]["vector_db"] = {"status": "ok", "doc_count": doc_count}
-        else:
-            health["checks"]["vector_db"] = {"status": "warning", "doc_count": 0}
-    except Exception as e:
-        health["checks"]["vector_db"] = {"status": "error", "detail": str(e)}
-        health["status"] = "degraded"
-
-    # Check data files
-    data_path = os.getenv("DATA_PATH", "./data_seed")
-    health["checks"]["data_files"] = {
-        "org_chart": os.path.exists(os.path.join(data_path, "structured", "org_chart.json")),
-        "role_definitions": os.path.exists(os.path.join(data_path, "structured", "role_definitions.json")),
-    }
+    cache_stats = get_retriever().embedding_cache_stats()
+    if cache_stats is not None:
+        health["checks"]["embedding_cache"] = cache_stats
+    if answer_cache is not None:
+        health["checks"]["answer_cache"] = answer_cache.stats()
+    if checkpoint_retention.last_report is not None:
+        health["checks"]["checkpoint_retention"] = checkpoint_retention.last_report
+
+    # Live ingestion watcher, if one is running
+    watch_stats = read_watch_stats()
+    if watch_stats is not None:
+        health["checks"]["ingestion_watch"] = watch_stats
 
     return health
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint (text exposition format)."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled.")
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.post("/api/v1/admin/index/reload", response_model=IndexReloadResponse)
+async def reload_index(body: IndexReloadRequest, request: Request):
+    """Swaps to the current (or given) index snapshot without interrupting searches in flight."""
+    _require_admin(request)
+    retriever = get_retriever()
+    try:
+        if body.version:
+            if not retriever.snapshot_dir:
+                raise HTTPException(status_code=400, detail="Snapshots are not enabled (SNAPSHOT_DIR is unset).")
+            await asyncio.to_thread(activate_snapshot, retriever.snapshot_dir, body.version)
+        version = await asyncio.to_thread(retriever.refresh, body.force)
+        doc_count = await asyncio.to_thread(retriever.count)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    logger.info(f"Index reloaded (snapshot={version}, {doc_count} chunks)")
+    return IndexReloadResponse(snapshot=version, doc_count=doc_count, reload_count=retriever.reload_count)
+
 @app.post("/api/v1/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(request: ChatRequest, response: Response, http_request: Request):
+    """
+    Answers in one JSON response; the request's timing breakdown is in the
+    Server-Timing header. With profiling enabled, "X-Profile: 1" profiles the
+    request and X-Profile names the artifacts in PROFILE_DIR ("skipped" when
+    rate limited).
+    """
+    if not _profile_requested(http_request):
+        return await _traced_answer(request, response)
+    with profile_request("chat") as profile:
+        response.headers["X-Profile"] = profile.profile_id if profile is not None else "skipped"
+        return await _traced_answer(request, response)
+
+async def _traced_answer(request: ChatRequest, response: Response) -> ChatResponse:
+    with traced_request("chat", thread_id=request.thread_id) as trace:
+        async with thread_activity.track(request.thread_id):
+            result = await _answer(request, response)
+        if trace is not None:
+            trace.finish()
+            response.headers["Server-Timing"] = trace.server_timing()
+            response.headers["X-Trace-Id"] = trace.trace_id
+        return result
+
+async def _answer(request: ChatRequest, response: Response) -> ChatResponse:
+    config = {"configurable": {"thread_id": request.thread_id}}
+    cached, query_vector, cacheable = await _answer_cache_lookup(request.query, config)
+    if cached is not None:
+        try:
+            await _record_cached_turn(request.query, cached.answer, config)
+            response.headers["X-Answer-Cache"] = "hit"
+            return ChatResponse(answer=cached.answer)
+        except Exception:
+            logger.exception("Failed to record cached answer; running the agent")
+    response.headers["X-Answer-Cache"] = "miss"
+
+    await _acquire_chat_slot()
+    run_config, run_metrics = _agent_run_config(config)
     try:
         logger.info(f"Chat request: {request.query[:80]}...")
-        response = agent_executor.invoke(
-            {"messages": [HumanMessage(content=request.query)]},
-            config={"configurable": {"thread_id": request.thread_id}}
-        )
-        final_message = response["messages"][-1]
-        return ChatResponse(answer=_extract_text(final_message.content))
+        # The question's policy search runs alongside the first model call
+        with prefetch_policies(request.query, k=POLICY_SEARCH_K):
+            result = await agent_executor.ainvoke(
+                {"messages": [HumanMessage(content=request.query)]},
+                config=run_config
+            )
+        final_message = result["messages"][-1]
+        answer = _extract_text(final_message.content)
+        if cacheable:
+            await _answer_cache_store(request.query, answer, query_vector)
+        return ChatResponse(answer=answer)
 
     except Exception:
         logger.exception("Chat endpoint error")
         raise HTTPException(status_code=500, detail="An internal error occurred. Please try again.")
+    finally:
+        _release_chat_slot()
+        if run_metrics is not None:
+            run_metrics.finish()
 
 @app.post("/api/v1/chat/stream")
-async def chat_stream_endpoint(request: ChatRequest):
-    """SSE streaming endpoint that yields agent events in real-time."""
+async def chat_stream_endpoint(request: ChatRequest, http_request: Request):
+    """
+    SSE streaming endpoint that yields agent events in real-time. A profiled
+    request ends with a "profile" event naming its artifacts.
+    """
     logger.info(f"Stream request: {request.query[:80]}...")
 
-    def event_generator():
+    config = {"configurable": {"thread_id": request.thread_id}}
+
+    async def agent_events():
+        cached, query_vector, cacheable = await _answer_cache_lookup(request.query, config)
+        if cached is not None:
+            try:
+                await _record_cached_turn(request.query, cached.answer, config)
+                yield f"data: {json.dumps({'type': 'cache_hit'})}\n\n"
+                yield f"data: {json.dumps({'type': 'token', 'content': cached.answer})}\n\n"
+                yield f"data: {json.dumps({'type': 'done'})}\n\n"
+                return
+            except Exception:
+                logger.exception("Failed to record cached answer; running the agent")
+
+        # The slot is taken inside the generator so it is always released,
+        # even if the client disconnects before streaming starts.
         try:
-            for event in agent_executor.stream(
-                {"messages": [HumanMessage(content=request.query)]},
-                config={"configurable": {"thread_id": request.thread_id}},
-                stream_mode="updates",
-            ):
-                for node_name, node_data in event.items():
-                    messages = node_data.get("messages", [])
-                    for msg in messages:
-                        if hasattr(msg, "tool_calls") and msg.tool_calls:
-                            for tc in msg.tool_calls:
-                                logger.info(f"Tool call: {tc['name']}({tc['args']})")
-                                yield f"data: {json.dumps({'type': 'tool_call', 'name': tc['name'], 'args': tc['args']})}\n\n"
-                        elif isinstance(msg, ToolMessage):
-                            yield f"data: {json.dumps({'type': 'tool_result', 'name': msg.name, 'content': msg.content[:200]})}\n\n"
-                        elif hasattr(msg, "content") and msg.content:
-                            text = _extract_text(msg.content)
+            await _acquire_chat_slot()
+        except HTTPException as e:
+            yield f"data: {json.dumps({'type': 'error', 'content': e.detail})}\n\n"
+            return
+
+        # "messages" mode yields LLM token chunks as they are generated;
+        # "updates" mode yields finished node outputs (tool calls/results).
+        streamed_text = False
+        answer = ""
+        run_config, run_metrics = _agent_run_config(config)
+        try:
+            # The question's policy search runs alongside the first model call
+            with prefetch_policies(request.query, k=POLICY_SEARCH_K):
+                async for mode, payload in agent_executor.astream(
+                    {"messages": [HumanMessage(content=request.query)]},
+                    config=run_config,
+                    stream_mode=["messages", "updates"],
+                ):
+                    if mode == "messages":
+                        chunk, _metadata = payload
+                        if isinstance(chunk, AIMessageChunk):
+                            text = _extract_text(chunk.content)
                             if text:
+                                streamed_text = True
+                                answer += text
                                 yield f"data: {json.dumps({'type': 'token', 'content': text})}\n\n"
+                        continue
 
+                    for node_name, node_data in payload.items():
+                        if node_name == "pre_model_hook":
+                            # Context windowing: message removals, not output
+                            continue
+                        messages = (node_data or {}).get("messages", [])
+                        for msg in messages:
+                            if hasattr(msg, "tool_calls") and msg.tool_calls:
+                                if streamed_text:
+                                    # Text streamed before a tool call was preamble, not the answer
+                                    yield f"data: {json.dumps({'type': 'answer_reset'})}\n\n"
+                                    streamed_text = False
+                                answer = ""
+                                for tc in msg.tool_calls:
+                                    logger.info(f"Tool call: {tc['name']}({tc['args']})")
+                                    yield f"data: {json.dumps({'type': 'tool_call', 'name': tc['name'], 'args': tc['args']})}\n\n"
+                            elif isinstance(msg, ToolMessage):
+                                yield f"data: {json.dumps({'type': 'tool_result', 'name': msg.name, 'content': msg.content[:200]})}\n\n"
+                            elif hasattr(msg, "content") and msg.content:
+                                # Models that don't stream deliver the answer here in one piece
+                                text = _extract_text(msg.content)
+                                if text and not streamed_text:
+                                    yield f"data: {json.dumps({'type': 'token', 'content': text})}\n\n"
+                                streamed_text = False
+                                answer = text
+
+            if cacheable:
+                await _answer_cache_store(request.query, answer, query_vector)
             yield f"data: {json.dumps({'type': 'done'})}\n\n"
         except Exception:
             logger.exception("Stream error")
             yield f"data: {json.dumps({'type': 'error', 'content': 'An internal error occurred.'})}\n\n"
+        finally:
+            _release_chat_slot()
+            if run_metrics is not None:
+                run_metrics.finish()
+
+    async def event_generator():
+        # The request's latency waterfall follows as the final event
+        with traced_request("chat_stream", thread_id=request.thread_id) as trace:
+            async with thread_activity.track(request.thread_id), aclosing(agent_events()) as events:
+                async for event in events:
+                    yield event
+            if trace is not None:
+                trace.finish()
+                timing = {"type": "timing", **trace.summary(), "spans": list(trace.spans)}
+                yield f"data: {json.dumps(timing)}\n\n"
+
+    async def profiled_events():
+        with profile_request("chat_stream") as profile:
+            async with aclosing(event_generator()) as events:
+                async for event in events:
+                    yield event
+            profile_id = profile.profile_id if profile is not None else None
+            yield f"data: {json.dumps({'type': 'profile', 'id': profile_id, 'skipped': profile is None})}\n\n"
 
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+    events = profiled_events() if _profile_requested(http_request) else event_generator()
+    return StreamingResponse(events, media_type="text/event-stream")
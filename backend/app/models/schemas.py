@@ -7,3 +7,13 @@ class ChatRequest(BaseModel):
 
 class ChatResponse(BaseModel):
     answer: str
+
+class IndexReloadRequest(BaseModel):
+    # Activate this published snapshot first (e.g. to roll back); default: whatever is current
+    version: Optional[str] = None
+    force: bool = False
+
+class IndexReloadResponse(BaseModel):
+    snapshot: Optional[str]
+    doc_count: int
+    reload_count: int
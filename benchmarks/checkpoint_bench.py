@@ -0,0 +1,140 @@
+"""
+Checkpointer latency under concurrent conversations.
+
+Simulates `concurrency` conversations hitting the conversation store at
+once. Each turn pauses for a simulated model call, then loads the latest
+checkpoint, saves a new one (with a history of `--history` messages) and
+saves its pending writes, which is what the agent does per step. Reports load/save latency percentiles and
+throughput for each checkpointer mode, so the single shared connection
+("threaded") can be compared with the WAL pool ("pooled"):
+
+    python benchmarks/checkpoint_bench.py --concurrency 1,8,32,64
+    python benchmarks/checkpoint_bench.py --compare benchmarks/results/checkpoint_bench-abc1234.json
+
+Latencies are measured on the event loop, so they include queueing for a
+connection, a pool thread or the writer. Once the offered load exceeds
+what one process can (de)serialize, latency grows in every mode.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import sqlite3
+import tempfile
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import compare_metrics, percentiles, run_metadata, write_results  # noqa: E402
+
+from langchain_core.messages import AIMessage, HumanMessage  # noqa: E402
+from langgraph.checkpoint.base import empty_checkpoint  # noqa: E402
+
+from rag_engine.agents.checkpointer import PooledSqliteSaver, ThreadedSqliteSaver  # noqa: E402
+
+MODES = ("threaded", "pooled")
+
+
+def make_saver(mode: str, path: str):
+    if mode == "pooled":
+        return PooledSqliteSaver(path)
+    return ThreadedSqliteSaver(sqlite3.connect(path, check_same_thread=False))
+
+
+def make_history(length: int) -> List:
+    return [
+        (HumanMessage if i % 2 == 0 else AIMessage)(content=f"Message {i}: " + "policy detail " * 40)
+        for i in range(length)
+    ]
+
+
+async def conversation(
+    saver, thread_id: str, turns: int, history: List, think: float, timings: Dict[str, List[float]],
+):
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    parent = config
+    for turn in range(turns):
+        # Stands in for the model call between checkpoint operations (staggered so clients don't move in lockstep)
+        await asyncio.sleep(think * (0.5 + (hash((thread_id, turn)) % 100) / 100))
+        start = time.perf_counter()
+        await saver.aget_tuple(config)
+        timings["get"].append(time.perf_counter() - start)
+
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = {"messages": history}
+        start = time.perf_counter()
+        parent = await saver.aput(parent, checkpoint, {"source": "loop", "step": turn}, {})
+        timings["put"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await saver.aput_writes(parent, [("messages", history[-1])], task_id=uuid.uuid4().hex)
+        timings["put_writes"].append(time.perf_counter() - start)
+
+
+async def run_level(saver, concurrency: int, turns: int, history: List, think: float) -> Dict:
+    timings: Dict[str, List[float]] = {"get": [], "put": [], "put_writes": []}
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        conversation(saver, f"c{concurrency}-{i}", turns, history, think, timings) for i in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "turns_per_s": round(concurrency * turns / elapsed, 1),
+        **{f"{op}_ms": percentiles(samples) for op, samples in timings.items()},
+    }
+
+
+def flatten(runs: Dict[str, Dict]) -> Dict[str, float]:
+    flat = {}
+    for key, run in runs.items():
+        flat[f"{key}.turns_per_s"] = run["turns_per_s"]
+        for op in ("get", "put", "put_writes"):
+            for stat in ("p50", "p95"):
+                flat[f"{key}.{op}.{stat}"] = run[f"{op}_ms"][stat]
+    return flat
+
+
+def main(argv: Optional[List[str]] = None) -> Dict:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--concurrency", default="1,8,32,64", help="comma-separated concurrent conversations")
+    parser.add_argument("--turns", type=int, default=20, help="turns per conversation")
+    parser.add_argument("--history", type=int, default=20, help="messages in each saved checkpoint")
+    parser.add_argument("--think-ms", type=float, default=50.0, help="mean pause between turns (the LLM call)")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/checkpoint_bench-<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to print deltas against")
+    args = parser.parse_args(argv)
+
+    history = make_history(args.history)
+    results = {"meta": run_metadata(vars(args)), "runs": {}}
+    with tempfile.TemporaryDirectory(prefix="nebula-ckpt-") as workdir:
+        for mode in args.modes.split(","):
+            saver = make_saver(mode, os.path.join(workdir, f"{mode}.db"))
+            try:
+                for concurrency in (int(c) for c in args.concurrency.split(",")):
+                    run = asyncio.run(run_level(saver, concurrency, args.turns, history, args.think_ms / 1000))
+                    results["runs"][f"{mode}@{concurrency}"] = run
+                    print(f"{mode:>8} x{concurrency:<3}: {run['turns_per_s']:>8} turns/s  "
+                          f"get p50 {run['get_ms']['p50']} / p95 {run['get_ms']['p95']} ms  "
+                          f"put p50 {run['put_ms']['p50']} / p95 {run['put_ms']['p95']} ms")
+            finally:
+                close = getattr(saver, "close", None)
+                if close is not None:
+                    close()
+
+    path = write_results(results, "checkpoint_bench", args.output)
+    print(f"Results written to {path}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\nChanges vs {args.compare}:")
+        print("\n".join(compare_metrics(flatten(results["runs"]), flatten(baseline["runs"]))))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Helpers shared by the benchmark scripts: environment isolation, percentiles and result files."""
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def isolate_environment(workdir: str, **overrides: str):
+    """
+    Points every on-disk artifact at `workdir` and selects the local embedding
+    provider. Must run before any rag_engine/backend module is imported, since
+    they read their configuration at import time.
+    """
+    os.makedirs(workdir, exist_ok=True)
+    env = {
+        "DATA_PATH": os.path.join(ROOT, "data_seed"),
+        "EMBEDDING_PROVIDER": "local",
+        "DB_PATH": os.path.join(workdir, "index"),
+        "LEXICAL_INDEX_PATH": os.path.join(workdir, "lexical_index.db"),
+        "INGESTION_STATE_FILE": os.path.join(workdir, "ingestion_state.json"),
+        "INGESTION_HASH_CACHE_FILE": os.path.join(workdir, "ingestion_hash_cache.json"),
+        "INGESTION_CHECKPOINT_FILE": os.path.join(workdir, "ingestion_checkpoint.json"),
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embedding_cache.db"),
+        "MEMORY_DB_PATH": os.path.join(workdir, "conversation_history.db"),
+        "WATCH_STATS_FILE": os.path.join(workdir, "ingestion_watch_stats.json"),
+        "SNAPSHOT_DIR": "",
+        "LOG_LEVEL": "WARNING",
+    }
+    env.update(overrides)
+    os.environ.update(env)
+    # The chat model is stubbed, but the Gemini client is still constructed at import
+    os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+
+
+def percentiles(samples: Iterable[float], scale: float = 1000.0) -> Dict[str, Optional[float]]:
+    """p50/p95/p99/mean/max of `samples` (seconds), reported in milliseconds by default."""
+    values = np.asarray(list(samples), dtype=np.float64) * scale
+    if values.size == 0:
+        return {"count": 0, "p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": int(values.size),
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "mean": round(float(values.mean()), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_metadata(params: Dict) -> Dict:
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "params": params,
+    }
+
+
+def write_results(results: Dict, name: str, output: Optional[str] = None) -> str:
+    """Writes results to `output`, or benchmarks/results/<name>-<commit>.json."""
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{name}-{results['meta'].get('commit') or 'local'}.json")
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    return output
+
+
+def compare_metrics(current: Dict[str, float], baseline: Dict[str, float]) -> List[str]:
+    """One line per metric present in both, with the relative change."""
+    lines = []
+    for key in sorted(set(current) & set(baseline)):
+        new, old = current[key], baseline[key]
+        if new is None or old is None:
+            continue
+        delta = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        lines.append(f"  {key:<40} {old:>12.3f} -> {new:>12.3f}  ({delta})")
+    return lines
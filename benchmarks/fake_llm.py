@@ -0,0 +1,88 @@
+"""Deterministic chat model that scripts the agent's tool calls, for offline benchmarks."""
+import re
+import json
+import time
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+ToolCall = Tuple[str, Dict[str, Any]]
+
+# Onboarding questions and the tool calls a well-behaved model makes for them
+SCRIPT: Dict[str, List[ToolCall]] = {
+    "What is the minimum password length?": [("search_policies", {"query": "minimum password length"})],
+    "Can I use my stipend for a standing desk?": [("search_policies", {"query": "home office stipend desk"})],
+    "Who is the manager of Sarah Chen?": [("lookup_org_hierarchy", {"employee": "Sarah Chen"})],
+    "Can a Senior Backend Engineer install TikTok?": [
+        ("lookup_role_requirements", {"role_title_or_id": "Senior Backend Engineer"}),
+        ("search_policies", {"query": "prohibited software TikTok"}),
+    ],
+    "Who reports to Elena Rostova?": [("lookup_org_hierarchy", {"employee": "Elena Rostova", "relation": "direct_reports"})],
+    "Who is the Director of Engineering?": [("lookup_employee", {"name_or_id_or_role": "Director of Engineering"})],
+    "Can I buy a monitor for $800 and a desk for $900?": [("search_policies", {"query": "stipend limit equipment"})],
+    "How many vacation days do I get?": [("search_policies", {"query": "vacation days PTO"})],
+}
+QUESTIONS = list(SCRIPT)
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Answers a question in two model turns, like the real agent: first the
+    scripted tool calls (unknown questions fall back to search_policies), then
+    a final answer quoting the tool results. The answer is streamed word by
+    word. `latency` and `token_latency` add simulated model time (seconds).
+    """
+
+    script: Dict[str, List[ToolCall]] = SCRIPT
+    latency: float = 0.0
+    token_latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "ScriptedChatModel":
+        return self
+
+    def _respond(self, messages: List[BaseMessage]) -> AIMessage:
+        if isinstance(messages[-1], ToolMessage):
+            results = []
+            for message in reversed(messages):
+                if not isinstance(message, ToolMessage):
+                    break
+                results.append(f"{message.name}: {str(message.content)[:160]}")
+            return AIMessage(content="Here is what I found. " + " | ".join(reversed(results)))
+
+        question = next((str(m.content) for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        calls = self.script.get(question, [("search_policies", {"query": question})])
+        turn = sum(isinstance(m, HumanMessage) for m in messages)
+        return AIMessage(content="", tool_calls=[
+            {"name": name, "args": args, "id": f"call_{turn}_{i}"} for i, (name, args) in enumerate(calls)
+        ])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    async def _astream(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        message = self._respond(messages)
+        if message.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+                {"name": tc["name"], "args": json.dumps(tc["args"]), "id": tc["id"], "index": i}
+                for i, tc in enumerate(message.tool_calls)
+            ]))
+            return
+        for piece in re.findall(r"\S+\s*", message.content):
+            if self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
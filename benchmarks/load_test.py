@@ -0,0 +1,304 @@
+"""
+Offline load test for the chat API.
+
+Serves backend.app.main:app with uvicorn on a local port, with the Gemini
+model replaced by a scripted fake that emits real tool calls, local
+embeddings over an index built from data_seed/policies, and the real tools.
+It then drives /api/v1/chat and /api/v1/chat/stream at a fixed concurrency
+and reports throughput, latency percentiles, time to first SSE event and
+token, and per-tool latency. Results are written as JSON for comparing
+commits:
+
+    python benchmarks/load_test.py --concurrency 16 --requests 200
+    python benchmarks/load_test.py --compare benchmarks/results/load_test-abc1234.json
+
+The load generator shares the process (and the GIL) with the server, so the
+numbers are for comparing changes on one machine, not for capacity planning.
+"""
+import os
+import io
+import sys
+import json
+import time
+import uuid
+import socket
+import asyncio
+import argparse
+import tempfile
+import threading
+import contextlib
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx  # noqa: E402
+from langchain_core.callbacks import BaseCallbackHandler  # noqa: E402
+
+from common import compare_metrics, isolate_environment, percentiles, run_metadata, write_results  # noqa: E402
+from fake_llm import QUESTIONS, ScriptedChatModel  # noqa: E402
+
+ENDPOINTS = {"chat": "/api/v1/chat", "stream": "/api/v1/chat/stream"}
+
+
+class ToolTimer(BaseCallbackHandler):
+    """Collects wall time per tool invocation from the tool callbacks."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started: Dict = {}
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "unknown"
+        with self._lock:
+            self._started[run_id] = (name, time.perf_counter())
+
+    def _finish(self, run_id, failed: bool):
+        with self._lock:
+            name, started = self._started.pop(run_id, (None, None))
+            if name is None:
+                return
+            self.samples[name].append(time.perf_counter() - started)
+            if failed:
+                self.errors[name] += 1
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._finish(run_id, failed=False)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, failed=True)
+
+    def reset(self):
+        with self._lock:
+            self.samples.clear()
+            self.errors.clear()
+
+    def report(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {name: {**percentiles(s), "errors": self.errors[name]} for name, s in sorted(self.samples.items())}
+
+
+def build_app(args, workdir: str, timer: ToolTimer):
+    """Configures an isolated environment, indexes the seed policies and stubs the chat model."""
+    isolate_environment(
+        workdir,
+        ANSWER_CACHE_ENABLED="true" if args.answer_cache else "false",
+        VECTOR_BACKEND=args.backend,
+        RETRIEVAL_MODE=args.retrieval_mode,
+        MAX_CONCURRENT_CHATS=str(max(args.concurrency, 1)),
+        PREFETCH_ENABLED="true" if args.prefetch else "false",
+    )
+    from langgraph.prebuilt import create_react_agent
+    from backend.app import main
+    from rag_engine.agents import onboarding_agent
+    from rag_engine.agents.tool_execution import build_tool_node
+    from rag_engine.ingestion.ingest import ingest_data
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        ingest_data(workers=1)
+
+    model = ScriptedChatModel(latency=args.llm_latency / 1000, token_latency=args.token_latency / 1000)
+    tools = [tool.model_copy(update={"callbacks": [timer]}) for tool in onboarding_agent.tools]
+    main.agent_executor = create_react_agent(
+        model, build_tool_node(tools), prompt=onboarding_agent.SYSTEM_PROMPT, checkpointer=onboarding_agent.memory,
+    )
+    return main.app
+
+
+@contextlib.contextmanager
+def serve(app):
+    """Runs the app under uvicorn on a free local port in a background thread."""
+    import uvicorn
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning", access_log=False))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 30
+    while not server.started:
+        if time.monotonic() > deadline or not thread.is_alive():
+            raise RuntimeError("uvicorn did not start")
+        time.sleep(0.05)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(10)
+        sock.close()
+
+
+async def _one_request(client: httpx.AsyncClient, endpoint: str, query: str, thread_id: str) -> Dict:
+    payload = {"query": query, "thread_id": thread_id}
+    started = time.perf_counter()
+    sample = {"ok": False, "latency": None, "first_event": None, "first_token": None}
+    try:
+        if endpoint == "chat":
+            response = await client.post(ENDPOINTS["chat"], json=payload)
+            sample["ok"] = response.status_code == 200 and bool(response.json().get("answer"))
+        else:
+            async with client.stream("POST", ENDPOINTS["stream"], json=payload) as response:
+                done = False
+                async for line in response.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    now = time.perf_counter()
+                    if sample["first_event"] is None:
+                        sample["first_event"] = now - started
+                    event = json.loads(line[6:])
+                    if event["type"] == "token" and sample["first_token"] is None:
+                        sample["first_token"] = now - started
+                    elif event["type"] == "error":
+                        break
+                    elif event["type"] == "done":
+                        done = True
+                sample["ok"] = response.status_code == 200 and done
+    except (httpx.HTTPError, ValueError):
+        sample["ok"] = False
+    sample["latency"] = time.perf_counter() - started
+    return sample
+
+
+async def run_load(base_url: str, endpoint: str, concurrency: int, total: int, timeout: float) -> Dict:
+    """Runs `total` first-turn requests with `concurrency` in flight; returns the aggregated metrics."""
+    run_id = uuid.uuid4().hex[:8]
+    next_index = 0
+    samples: List[Dict] = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def worker():
+            nonlocal next_index
+            while next_index < total:
+                index = next_index
+                next_index += 1
+                query = QUESTIONS[index % len(QUESTIONS)]
+                samples.append(await _one_request(client, endpoint, query, f"bench-{run_id}-{endpoint}-{index}"))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+
+    ok = [s for s in samples if s["ok"]]
+    result = {
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(ok) / wall, 2) if wall else None,
+        "latency_ms": percentiles(s["latency"] for s in ok),
+    }
+    if endpoint == "stream":
+        result["first_event_ms"] = percentiles(s["first_event"] for s in ok if s["first_event"] is not None)
+        result["first_token_ms"] = percentiles(s["first_token"] for s in ok if s["first_token"] is not None)
+    return result
+
+
+PREFETCH_OUTCOMES = ("hit", "miss", "unused", "error", "cancelled")
+
+
+def prefetch_counters() -> Dict[str, float]:
+    """The server's prefetch outcome counts and saved seconds (it shares this process's registry)."""
+    from prometheus_client import REGISTRY
+
+    counters = {
+        outcome: REGISTRY.get_sample_value("nebula_prefetch_requests_total", {"outcome": outcome}) or 0.0
+        for outcome in PREFETCH_OUTCOMES
+    }
+    counters["saved_s"] = REGISTRY.get_sample_value("nebula_prefetch_saved_seconds_sum") or 0.0
+    return counters
+
+
+def prefetch_report(before: Dict[str, float], after: Dict[str, float]) -> Dict:
+    delta = {key: after[key] - before[key] for key in after}
+    total = sum(delta[outcome] for outcome in PREFETCH_OUTCOMES)
+    return {
+        **{outcome: int(delta[outcome]) for outcome in PREFETCH_OUTCOMES},
+        "hit_rate": round(delta["hit"] / total, 3) if total else None,
+        "saved_ms_per_hit": round(delta["saved_s"] * 1000 / delta["hit"], 3) if delta["hit"] else None,
+    }
+
+
+def flatten(results: Dict) -> Dict[str, float]:
+    """Comparable scalar metrics, keyed like 'stream.latency_ms.p95'."""
+    flat = {}
+    for endpoint, metrics in results.get("endpoints", {}).items():
+        flat[f"{endpoint}.throughput_rps"] = metrics["throughput_rps"]
+        for group in ("latency_ms", "first_event_ms", "first_token_ms"):
+            for stat in ("p50", "p95", "p99"):
+                if group in metrics:
+                    flat[f"{endpoint}.{group}.{stat}"] = metrics[group][stat]
+    for endpoint, tools in results.get("tools", {}).items():
+        for tool, metrics in tools.items():
+            flat[f"{endpoint}.tool.{tool}.p95"] = metrics["p95"]
+    for endpoint, prefetch in results.get("prefetch", {}).items():
+        if prefetch["hit_rate"] is not None:
+            flat[f"{endpoint}.prefetch.hit_rate"] = prefetch["hit_rate"]
+    return flat
+
+
+def main(argv: Optional[List[str]] = None) -> Dict:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--endpoint", choices=["chat", "stream", "both"], default="both")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100, help="measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=8, help="unmeasured requests per endpoint")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="simulated ms per model call")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="simulated ms per streamed token")
+    parser.add_argument("--backend", choices=["chroma", "matrix"], default=os.getenv("VECTOR_BACKEND", "chroma"))
+    parser.add_argument("--retrieval-mode", choices=["hybrid", "vector", "lexical"], default="hybrid")
+    parser.add_argument("--answer-cache", action="store_true", help="turn the semantic answer cache on")
+    parser.add_argument("--prefetch", action="store_true", help="start the question's policy search with the request")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--output", help="result file (default: benchmarks/results/load_test-<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to print deltas against")
+    args = parser.parse_args(argv)
+
+    timer = ToolTimer()
+    endpoints = ["chat", "stream"] if args.endpoint == "both" else [args.endpoint]
+    results = {"meta": run_metadata(vars(args)), "endpoints": {}, "tools": {}}
+
+    with tempfile.TemporaryDirectory(prefix="nebula-bench-") as workdir:
+        app = build_app(args, workdir, timer)
+        with serve(app) as base_url:
+            for endpoint in endpoints:
+                if args.warmup:
+                    asyncio.run(run_load(base_url, endpoint, args.concurrency, args.warmup, args.timeout))
+                timer.reset()
+                before = prefetch_counters()
+                results["endpoints"][endpoint] = asyncio.run(
+                    run_load(base_url, endpoint, args.concurrency, args.requests, args.timeout)
+                )
+                results["tools"][endpoint] = timer.report()
+                if args.prefetch:
+                    results.setdefault("prefetch", {})[endpoint] = prefetch_report(before, prefetch_counters())
+
+    for endpoint, metrics in results["endpoints"].items():
+        lat = metrics["latency_ms"]
+        print(f"{endpoint:>6}: {metrics['throughput_rps']} req/s, p50 {lat['p50']} ms, p95 {lat['p95']} ms, "
+              f"p99 {lat['p99']} ms, {metrics['errors']} errors")
+        if "first_event_ms" in metrics:
+            print(f"        first SSE event p50 {metrics['first_event_ms']['p50']} ms, "
+                  f"first token p50 {metrics['first_token_ms']['p50']} ms")
+        for tool, tool_metrics in results["tools"][endpoint].items():
+            print(f"        tool {tool}: {tool_metrics['count']} calls, "
+                  f"p50 {tool_metrics['p50']} ms, p95 {tool_metrics['p95']} ms")
+        prefetch = results.get("prefetch", {}).get(endpoint)
+        if prefetch is not None:
+            print(f"        prefetch: hit rate {prefetch['hit_rate']} ({prefetch['hit']} hits, {prefetch['miss']} misses, "
+                  f"{prefetch['unused']} unused), {prefetch['saved_ms_per_hit']} ms saved per hit")
+
+    path = write_results(results, "load_test", args.output)
+    print(f"Results written to {path}")
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.compare} ({baseline['meta'].get('commit')}):")
+        print("\n".join(compare_metrics(flatten(results), flatten(baseline))))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+"""
+Retrieval quality-vs-latency benchmark for search_policies.
+
+Chunks a labeled corpus at every chunk size / overlap in the sweep, builds
+each vector index configuration plus the BM25 index, and runs every labeled
+question at every k in each retrieval mode. It reports recall@k, MRR, the
+context tokens the agent would receive, per-query latency percentiles, and
+each index's build time and size on disk:
+
+    python benchmarks/retrieval_bench.py
+    python benchmarks/retrieval_bench.py --synthetic-chunks 100000 --chunk-sizes 1000 --overlaps 100
+
+The default corpus is data_seed/policies with the questions in
+benchmarks/retrieval_qa.json; a question's expected chunk is any chunk of its
+file containing its `expect` text, so labels hold for every chunking.
+Embeddings use the local provider, so vector quality is a lower bound for
+Gemini, while relative latency, size and chunking effects carry over.
+"""
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import ROOT, compare_metrics, isolate_environment, percentiles, run_metadata, write_results  # noqa: E402
+from synthetic_corpus import generate_corpus  # noqa: E402
+
+QA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "retrieval_qa.json")
+MODES = ("vector", "lexical", "hybrid")
+
+
+def normalize(text: str) -> str:
+    """Lowercased, whitespace-collapsed text without markdown emphasis, for label matching."""
+    return re.sub(r"\s+", " ", re.sub(r"[*`]", "", text)).strip().lower()
+
+
+def label_chunks(questions: Sequence[Dict], chunks: Sequence) -> List[Set[str]]:
+    """Chunk IDs relevant to each question: chunks of its file that contain its expected text."""
+    by_file: Dict[str, List[Tuple[str, str]]] = {}
+    for doc in chunks:
+        by_file.setdefault(doc.metadata["source_file"], []).append((doc.metadata["chunk_id"], normalize(doc.page_content)))
+    relevant = []
+    for q in questions:
+        expect = normalize(q["expect"])
+        relevant.append({chunk_id for chunk_id, text in by_file.get(q["file"], []) if expect in text})
+    return relevant
+
+
+def score_rankings(rankings: Sequence[Sequence[str]], relevant: Sequence[Set[str]], k: int) -> Dict[str, float]:
+    """
+    recall@k: share of questions with a relevant chunk in the top k; MRR: mean
+    of 1/rank of the first relevant chunk (0 if none in the top k). Questions
+    whose answer no chunk contains whole count as misses.
+    """
+    hits, reciprocal = 0, 0.0
+    for ranked, wanted in zip(rankings, relevant):
+        rank = next((i for i, chunk_id in enumerate(ranked[:k], 1) if chunk_id in wanted), None)
+        if rank is not None:
+            hits += 1
+            reciprocal += 1.0 / rank
+    n = max(len(relevant), 1)
+    return {"recall": round(hits / n, 4), "mrr": round(reciprocal / n, 4)}
+
+
+def disk_size_mb(path: str) -> float:
+    if os.path.isfile(path):
+        return round(os.path.getsize(path) / 1e6, 3)
+    total = sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names
+    )
+    return round(total / 1e6, 3)
+
+
+def parse_indexes(spec: str) -> List[Tuple[str, Optional[str]]]:
+    """'chroma,matrix:int8' -> [('chroma', None), ('matrix', 'int8')]."""
+    indexes = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        backend, _, dtype = part.partition(":")
+        if backend not in ("chroma", "matrix"):
+            raise ValueError(f"Unknown vector backend '{backend}'")
+        indexes.append((backend, (dtype or "float16") if backend == "matrix" else None))
+    return indexes
+
+
+def index_label(backend: str, dtype: Optional[str]) -> str:
+    return f"{backend}-{dtype}" if dtype else backend
+
+
+def chunk_corpus(policies_dir: str, chunk_size: int, chunk_overlap: int) -> List:
+    from rag_engine.ingestion.ingest import assign_chunk_ids, process_document
+
+    chunks = []
+    for path in sorted(os.path.join(policies_dir, name) for name in os.listdir(policies_dir) if name.endswith(".md")):
+        docs = process_document(path, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        assign_chunk_ids(os.path.basename(path), docs)
+        chunks.extend(docs)
+    return chunks
+
+
+def build_vector_index(path: str, backend: str, dtype: Optional[str], embeddings, chunks, vectors, batch_size: int = 1000):
+    """Writes precomputed vectors into a fresh store, so every index config shares one embedding pass."""
+    from rag_engine.retrieval.matrix_store import MatrixVectorStore, deferred_writes, open_vector_store
+
+    store = MatrixVectorStore(path, embeddings, dtype=dtype) if backend == "matrix" else open_vector_store(path, embeddings, backend)
+    # Batched like an ingest run, which persists the matrix once at the end
+    with deferred_writes(store):
+        for start in range(0, len(chunks), batch_size):
+            batch = chunks[start:start + batch_size]
+            store._collection.upsert(
+                ids=[doc.metadata["chunk_id"] for doc in batch],
+                embeddings=[list(v) for v in vectors[start:start + batch_size]],
+                metadatas=[doc.metadata for doc in batch],
+                documents=[doc.page_content for doc in batch],
+            )
+    return store
+
+
+class Searcher:
+    """search_policies' retrieval path (see RetrieverService.search) over explicit stores."""
+
+    def __init__(self, mode: str, vector_store=None, lexical_index=None):
+        from rag_engine.retrieval.retriever import RETRIEVAL_FETCH_K, reciprocal_rank_fusion
+
+        self.mode = mode
+        self.vector_store = vector_store
+        self.lexical_index = lexical_index
+        self.fetch_k = RETRIEVAL_FETCH_K
+        self._fuse = reciprocal_rank_fusion
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def search(self, query: str, k: int) -> List:
+        if self.mode == "vector":
+            return self.vector_store.similarity_search(query, k=k)
+        if self.mode == "lexical":
+            return self.lexical_index.search(query, k=k)
+        fetch_k = max(k, self.fetch_k)
+        vector_future = self._executor.submit(self.vector_store.similarity_search, query, fetch_k)
+        lexical_results = self.lexical_index.search(query, k=fetch_k)
+        vector_results = vector_future.result()
+        if not lexical_results:
+            return vector_results[:k]
+        return self._fuse([vector_results, lexical_results], limit=k)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+def evaluate(searcher: Searcher, questions, relevant, ks: Sequence[int], tokens: Dict[str, int]) -> List[Dict]:
+    """One row per k: recall, MRR, mean context tokens of the top k, and per-query latency."""
+    searcher.search(questions[0]["question"], max(ks))  # warm caches and lazily opened files
+    rows = []
+    for k in ks:
+        rankings, latencies = [], []
+        for q in questions:
+            started = time.perf_counter()
+            results = searcher.search(q["question"], k)
+            latencies.append(time.perf_counter() - started)
+            rankings.append([doc.metadata.get("chunk_id") for doc in results])
+        context = [sum(tokens.get(chunk_id, 0) for chunk_id in ranked) for ranked in rankings]
+        rows.append({
+            "k": k,
+            **score_rankings(rankings, relevant, k),
+            "context_tokens": round(sum(context) / max(len(context), 1), 1),
+            "latency_ms": percentiles(latencies),
+        })
+    return rows
+
+
+def sweep(
+    policies_dir: str,
+    questions: List[Dict],
+    workdir: str,
+    chunk_sizes: Sequence[int] = (1000,),
+    overlaps: Sequence[int] = (100,),
+    ks: Sequence[int] = (5,),
+    indexes: Sequence[Tuple[str, Optional[str]]] = (("chroma", None),),
+    modes: Sequence[str] = MODES,
+    log=print,
+) -> Dict:
+    """Runs the full sweep; returns {'builds': [...], 'runs': [...]}."""
+    from rag_engine.ingestion.pipeline import count_tokens
+    from rag_engine.retrieval.embeddings import get_embeddings
+    from rag_engine.retrieval.lexical_index import LexicalIndex
+
+    embeddings = get_embeddings("local")
+    builds, runs = [], []
+    for chunk_size in chunk_sizes:
+        for overlap in overlaps:
+            if overlap >= chunk_size:
+                continue
+            base = {"chunk_size": chunk_size, "chunk_overlap": overlap}
+            started = time.perf_counter()
+            chunks = chunk_corpus(policies_dir, chunk_size, overlap)
+            chunk_s = time.perf_counter() - started
+            relevant = label_chunks(questions, chunks)
+            tokens = {doc.metadata["chunk_id"]: count_tokens(doc.page_content) for doc in chunks}
+
+            started = time.perf_counter()
+            vectors = embeddings.embed_documents([doc.page_content for doc in chunks])
+            embed_s = time.perf_counter() - started
+
+            build_dir = os.path.join(workdir, f"build-{chunk_size}-{overlap}")
+            os.makedirs(build_dir, exist_ok=True)
+            lexical_path = os.path.join(build_dir, "lexical_index.db")
+            started = time.perf_counter()
+            lexical = LexicalIndex(lexical_path)
+            lexical.upsert([doc.metadata["chunk_id"] for doc in chunks], chunks)
+            build = {
+                **base,
+                "chunks": len(chunks),
+                "mean_chunk_tokens": round(sum(tokens.values()) / max(len(tokens), 1), 1),
+                "unanswerable": sum(1 for r in relevant if not r),
+                "chunk_s": round(chunk_s, 3),
+                "embed_s": round(embed_s, 3),
+                "indexes": {"bm25": {"build_s": round(time.perf_counter() - started, 3), "size_mb": disk_size_mb(lexical_path)}},
+            }
+            log(f"chunk_size={chunk_size} overlap={overlap}: {len(chunks)} chunks, "
+                f"{build['unanswerable']} questions without a whole answer chunk")
+
+            if "lexical" in modes:
+                searcher = Searcher("lexical", lexical_index=lexical)
+                runs += [{**base, "index": "bm25", "mode": "lexical", **row} for row in evaluate(searcher, questions, relevant, ks, tokens)]
+                searcher.close()
+
+            for backend, dtype in indexes:
+                label = index_label(backend, dtype)
+                path = os.path.join(build_dir, label)
+                started = time.perf_counter()
+                store = build_vector_index(path, backend, dtype, embeddings, chunks, vectors)
+                build["indexes"][label] = {
+                    "build_s": round(time.perf_counter() - started + embed_s, 3),
+                    "size_mb": disk_size_mb(path),
+                }
+                for mode in (m for m in modes if m != "lexical"):
+                    searcher = Searcher(mode, vector_store=store, lexical_index=lexical)
+                    runs += [{**base, "index": label, "mode": mode, **row} for row in evaluate(searcher, questions, relevant, ks, tokens)]
+                    searcher.close()
+            builds.append(build)
+            shutil.rmtree(build_dir, ignore_errors=True)
+    return {"builds": builds, "runs": runs}
+
+
+def recommend(runs: Sequence[Dict], tolerance: float = 0.0) -> Optional[Dict]:
+    """Cheapest run (fewest context tokens, then lowest p95) within `tolerance` of the best recall."""
+    if not runs:
+        return None
+    best = max(run["recall"] for run in runs)
+    candidates = [run for run in runs if run["recall"] >= best - tolerance]
+    return min(candidates, key=lambda run: (run["context_tokens"], run["latency_ms"]["p95"] or 0.0))
+
+
+def run_key(run: Dict) -> str:
+    return f"{run['chunk_size']}/{run['chunk_overlap']}/{run['index']}/{run['mode']}/k{run['k']}"
+
+
+def flatten(results: Dict) -> Dict[str, float]:
+    """Comparable scalar metrics, keyed like '1000/100/matrix-int8/hybrid/k5.recall'."""
+    flat = {}
+    for run in results.get("runs", []):
+        key = run_key(run)
+        flat[f"{key}.recall"] = run["recall"]
+        flat[f"{key}.mrr"] = run["mrr"]
+        flat[f"{key}.context_tokens"] = run["context_tokens"]
+        flat[f"{key}.latency_ms.p95"] = run["latency_ms"]["p95"]
+    for build in results.get("builds", []):
+        for label, metrics in build["indexes"].items():
+            prefix = f"{build['chunk_size']}/{build['chunk_overlap']}/{label}"
+            flat[f"{prefix}.build_s"] = metrics["build_s"]
+            flat[f"{prefix}.size_mb"] = metrics["size_mb"]
+    return flat
+
+
+def _ints(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> Dict:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--corpus", help="directory written by synthetic_corpus.py (policies/ + questions.json)")
+    parser.add_argument("--synthetic-chunks", type=int, default=0, help="generate a synthetic corpus of this many chunks")
+    parser.add_argument("--questions", type=int, default=200, help="labeled questions for a generated corpus")
+    parser.add_argument("--chunk-sizes", type=_ints, default=[500, 1000, 1500])
+    parser.add_argument("--overlaps", type=_ints, default=[0, 100, 200])
+    parser.add_argument("--k", type=_ints, default=[1, 3, 5, 10])
+    parser.add_argument("--indexes", type=parse_indexes, default=parse_indexes("chroma,matrix:float16,matrix:int8"),
+                        help="vector indexes to build, e.g. chroma,matrix:float16,matrix:int8")
+    parser.add_argument("--modes", default=",".join(MODES), help="comma-separated retrieval modes")
+    parser.add_argument("--recall-tolerance", type=float, default=0.0,
+                        help="recall the recommended setting may give up against the best run")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/retrieval_bench-<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to print deltas against")
+    args = parser.parse_args(argv)
+    modes = [m for m in args.modes.split(",") if m]
+    if set(modes) - set(MODES):
+        parser.error(f"--modes must be drawn from {', '.join(MODES)}")
+
+    params = {**vars(args), "indexes": [index_label(*i) for i in args.indexes]}
+    with tempfile.TemporaryDirectory(prefix="nebula-retrieval-bench-") as workdir:
+        isolate_environment(workdir)
+        if args.synthetic_chunks:
+            questions = generate_corpus(os.path.join(workdir, "corpus"), args.synthetic_chunks, args.questions)
+            policies_dir, corpus = os.path.join(workdir, "corpus", "policies"), f"synthetic-{args.synthetic_chunks}"
+        elif args.corpus:
+            with open(os.path.join(args.corpus, "questions.json"), 'r') as f:
+                questions = json.load(f)
+            policies_dir, corpus = os.path.join(args.corpus, "policies"), args.corpus
+        else:
+            with open(QA_FILE, 'r') as f:
+                questions = json.load(f)
+            policies_dir, corpus = os.path.join(ROOT, "data_seed", "policies"), "data_seed"
+
+        results = {"meta": run_metadata(params), "corpus": {"name": corpus, "questions": len(questions)}}
+        results.update(sweep(
+            policies_dir, questions, workdir, args.chunk_sizes, args.overlaps, args.k, args.indexes, modes,
+        ))
+
+    print(f"{'chunking':>10} {'index':>14} {'mode':>8} {'k':>3} {'recall':>7} {'mrr':>6} {'tokens':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for run in results["runs"]:
+        lat = run["latency_ms"]
+        print(f"{run['chunk_size']:>5}/{run['chunk_overlap']:<4} {run['index']:>14} {run['mode']:>8} {run['k']:>3} "
+              f"{run['recall']:>7.3f} {run['mrr']:>6.3f} {run['context_tokens']:>7.0f} {lat['p50']:>8.2f} {lat['p95']:>8.2f}")
+    for build in results["builds"]:
+        sizes = ", ".join(f"{label} {m['size_mb']} MB in {m['build_s']}s" for label, m in build["indexes"].items())
+        print(f"{build['chunk_size']}/{build['chunk_overlap']}: {build['chunks']} chunks; {sizes}")
+
+    best = recommend(results["runs"], args.recall_tolerance)
+    results["recommended"] = best and run_key(best)
+    if best:
+        print(f"Recommended: {run_key(best)} (recall@{best['k']} {best['recall']}, "
+              f"{best['context_tokens']:.0f} context tokens, p95 {best['latency_ms']['p95']} ms)")
+
+    path = write_results(results, "retrieval_bench", args.output)
+    print(f"Results written to {path}")
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.compare} ({baseline['meta'].get('commit')}):")
+        print("\n".join(compare_metrics(flatten(results), flatten(baseline))))
+    return results
+
+
+if __name__ == "__main__":
+    main()
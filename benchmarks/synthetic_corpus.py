@@ -0,0 +1,136 @@
+"""
+Synthetic policy corpus with labeled questions, for retrieval benchmarks at scale.
+
+Every section of a generated file states one unique fact (an allowance for a
+team) among filler policy prose. Sections sharing a qualifier, item or team
+act as near-miss distractors. Each labeled question asks for one fact, and the
+chunk holding the fact's reference code is the expected answer:
+
+    python benchmarks/synthetic_corpus.py --chunks 100000 --output /tmp/corpus
+"""
+import os
+import sys
+import json
+import random
+import argparse
+from typing import Dict, List, Optional
+
+QUALIFIERS = [
+    "annual", "quarterly", "monthly", "one-time", "emergency", "international", "domestic", "relocation",
+    "onboarding", "offsite", "conference", "training", "certification", "wellness", "parental", "commuter",
+    "overtime", "on-call", "holiday", "sabbatical", "referral", "retention", "hardware", "software", "remote",
+]
+ITEMS = [
+    "laptop", "monitor", "headset", "desk", "chair", "keyboard", "phone", "internet", "coworking", "meal",
+    "lodging", "airfare", "train travel", "taxi", "parking", "mileage", "gym", "therapy", "childcare",
+    "tuition", "book", "course", "exam fee", "visa", "moving", "storage", "shipping", "team dinner",
+    "client gift", "swag", "cloud credit", "license seat", "domain", "printer", "webcam", "microphone",
+    "docking station", "tablet", "charger", "backpack", "ergonomic assessment", "eye exam", "vaccination",
+    "language class", "mentoring", "hackathon", "volunteer day", "recognition award",
+]
+REGIONS = ["Americas", "EMEA", "APAC", "Nordics", "Iberia", "Benelux", "Andes", "Pacific", "Balkans", "Gulf"]
+FUNCTIONS = [
+    "Platform", "Security", "Sales", "Support", "Finance", "Legal", "Design", "Data", "Research", "Operations",
+]
+TEAMS = [f"{region} {function}" for region in REGIONS for function in FUNCTIONS]
+
+FILLER = [
+    "Requests must be submitted through the internal portal before the spend is incurred.",
+    "Managers review each request within five business days and may ask for additional context.",
+    "Receipts must be itemized and legible; card statements alone are not accepted.",
+    "Exceptions require written approval from the budget owner and are reviewed each quarter.",
+    "Unused amounts do not roll over into the next period unless stated otherwise.",
+    "Contractors are not eligible unless their statement of work explicitly includes this benefit.",
+    "Amounts are paid in local currency at the exchange rate on the day of approval.",
+    "Purchases from vendors on the restricted list will not be reimbursed.",
+    "Claims older than ninety days are rejected automatically by the expense system.",
+    "Employees on leave keep their eligibility but cannot submit new claims until they return.",
+    "Finance audits a random sample of claims every month to confirm compliance.",
+    "Duplicate submissions are flagged and the later claim is discarded.",
+    "Shared purchases must be claimed by a single employee with the participants listed.",
+    "Tax treatment differs by country; consult the payroll team for local guidance.",
+    "Misuse of company funds is handled under the code of conduct and may lead to dismissal.",
+    "This section is reviewed annually by People Ops together with the finance team.",
+    "Questions about eligibility should be raised in the benefits help channel.",
+    "Approvals granted by email must be attached to the claim as a PDF.",
+    "Part-time employees receive a pro-rated amount based on their contracted hours.",
+    "Interns are covered from their first day for the items listed in this section.",
+]
+
+
+def fact_sentence(qualifier: str, item: str, team: str, amount: int, code: str) -> str:
+    return f"The {qualifier} {item} allowance for the {team} team is ${amount:,} (policy ref {code})."
+
+
+def question_for(qualifier: str, item: str, team: str) -> str:
+    return f"What is the {qualifier} {item} allowance for the {team} team?"
+
+
+def _section(rng: random.Random, fact: str, target_chars: int) -> str:
+    sentences: List[str] = []
+    while sum(len(s) + 1 for s in sentences) < target_chars - len(fact):
+        sentences.append(rng.choice(FILLER))
+    # The fact sits on its own line at a random position among the filler paragraphs
+    paragraphs = [" ".join(sentences[i:i + 3]) for i in range(0, len(sentences), 3)]
+    paragraphs.insert(rng.randint(0, len(paragraphs)), fact)
+    return "\n\n".join(paragraphs)
+
+
+def generate_corpus(
+    output: str,
+    chunks: int = 1000,
+    questions: int = 200,
+    sections_per_file: int = 100,
+    section_chars: int = 800,
+    seed: int = 0,
+) -> List[Dict[str, str]]:
+    """
+    Writes about `chunks` sections of `section_chars` characters (one chunk
+    each at the default chunk size) as markdown files under
+    `output`/policies, and returns `questions` labeled questions
+    ({question, file, expect}); they are also saved to `output`/questions.json.
+    """
+    combos = len(QUALIFIERS) * len(ITEMS) * len(TEAMS)
+    if chunks > combos:
+        raise ValueError(f"At most {combos} unique facts can be generated")
+    rng = random.Random(seed)
+    policies = os.path.join(output, "policies")
+    os.makedirs(policies, exist_ok=True)
+
+    facts = []
+    for n, combo in enumerate(rng.sample(range(combos), chunks)):
+        qualifier = QUALIFIERS[combo % len(QUALIFIERS)]
+        item = ITEMS[combo // len(QUALIFIERS) % len(ITEMS)]
+        team = TEAMS[combo // (len(QUALIFIERS) * len(ITEMS))]
+        facts.append((qualifier, item, team, rng.randrange(50, 5000, 25), f"SYN-{n:06d}"))
+
+    labeled = []
+    for start in range(0, len(facts), sections_per_file):
+        filename = f"SYN_{start // sections_per_file:05d}_Allowances.md"
+        lines = [f"# Synthetic Allowances Policy {start // sections_per_file}", ""]
+        for number, (qualifier, item, team, amount, code) in enumerate(facts[start:start + sections_per_file], 1):
+            fact = fact_sentence(qualifier, item, team, amount, code)
+            lines += [f"## {number}. {qualifier.title()} {item} ({team})", _section(rng, fact, section_chars), ""]
+            labeled.append({"question": question_for(qualifier, item, team), "file": filename, "expect": f"policy ref {code}"})
+        with open(os.path.join(policies, filename), 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines))
+
+    labeled = rng.sample(labeled, min(questions, len(labeled)))
+    with open(os.path.join(output, "questions.json"), 'w') as f:
+        json.dump(labeled, f, indent=2)
+    return labeled
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--output", required=True, help="directory to write policies/ and questions.json into")
+    parser.add_argument("--chunks", type=int, default=1000, help="sections (about one chunk each) to generate")
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    labeled = generate_corpus(args.output, args.chunks, args.questions, seed=args.seed)
+    print(f"Wrote {args.chunks} sections and {len(labeled)} questions to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -30,6 +30,7 @@ TOOL_ICONS = {
     "search_policies": "🔍 Searching policies",
     "lookup_employee": "👤 Looking up employee",
     "lookup_role_requirements": "📋 Checking role requirements",
+    "lookup_org_hierarchy": "🏢 Tracing org chart",
 }
 
 # --- SESSION STATE ---
@@ -176,14 +177,37 @@ def stream_response(query):
                         reasoning_steps.append(step)
 
                     elif event_type == "token":
-                        final_answer = data["content"]
-                        answer_placeholder.markdown(final_answer)
+                        # Tokens arrive as incremental deltas
+                        final_answer += data["content"]
+                        answer_placeholder.markdown(final_answer + "▌")
+
+                    elif event_type == "answer_reset":
+                        # Drop the streamed preamble from the screen too, not just the buffer
+                        final_answer = ""
+                        answer_placeholder.empty()
+
+                    elif event_type == "cache_hit":
+                        step = "⚡ Answered from cache"
+                        reasoning_steps.append(step)
+                        with reasoning_container:
+                            st.markdown(f'<div class="tool-badge">{step}</div>', unsafe_allow_html=True)
 
                     elif event_type == "error":
                         answer_placeholder.error(data["content"])
 
+                    elif event_type == "timing":
+                        # Final event: where the time went, slowest stages first
+                        stages = sorted(data["stages"].items(), key=lambda item: -item[1]["ms"])[:4]
+                        breakdown = " · ".join(f"{name} {stage['ms']:.0f} ms" for name, stage in stages)
+                        step = f"⏱️ {data['total_ms'] / 1000:.2f}s total" + (f" ({breakdown})" if breakdown else "")
+                        reasoning_steps.append(step)
+                        with reasoning_container:
+                            st.caption(step)
+
                 if not final_answer:
                     answer_placeholder.markdown("_No response received._")
+                else:
+                    answer_placeholder.markdown(final_answer)
 
                 st.session_state.messages.append({
                     "role": "assistant",
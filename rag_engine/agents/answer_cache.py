@@ -0,0 +1,201 @@
+import os
+import time
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from rag_engine.retrieval.embedding_cache import normalize_query
+
+# --- CONFIGURATION ---
+DATA_PATH = os.getenv("DATA_PATH", "./data_seed")
+STATE_FILE = os.getenv("INGESTION_STATE_FILE", "ingestion_state.json")
+# Off by default: each first-turn miss costs an extra query embedding
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+
+
+def _structured_files() -> List[str]:
+    base = os.path.join(DATA_PATH, "structured")
+    return [os.path.join(base, "org_chart.json"), os.path.join(base, "role_definitions.json")]
+
+
+def _stat_key(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+# (stat of every input, version) from the last call; the lookup path is hot
+_last_version: Optional[Tuple[Tuple, str]] = None
+
+
+def knowledge_version(state_file: Optional[str] = None, structured_files: Optional[List[str]] = None) -> str:
+    """
+    Fingerprint of everything an answer can depend on: the per-file hashes in
+    ingestion_state.json plus the mtimes of the structured JSON files. The
+    state file is only re-read when a file's mtime, size or inode changed.
+    """
+    global _last_version
+    state_file = state_file or STATE_FILE
+    structured_files = structured_files if structured_files is not None else _structured_files()
+    key = tuple((path, _stat_key(path)) for path in [state_file, *structured_files])
+    last = _last_version
+    if last is not None and last[0] == key:
+        return last[1]
+    hasher = hashlib.md5()
+    try:
+        with open(state_file, 'r') as f:
+            hasher.update(json.dumps(json.load(f), sort_keys=True).encode("utf-8"))
+    except (OSError, ValueError):
+        hasher.update(b"no-state")
+    for path in structured_files:
+        try:
+            hasher.update(f"{path}:{os.stat(path).st_mtime_ns}".encode("utf-8"))
+        except OSError:
+            hasher.update(f"{path}:missing".encode("utf-8"))
+    version = hasher.hexdigest()
+    _last_version = (key, version)
+    return version
+
+
+class CachedAnswer:
+    __slots__ = ("query", "answer", "vector", "version", "created_at")
+
+    def __init__(self, query: str, answer: str, vector: np.ndarray, version: str, created_at: float):
+        self.query = query
+        self.answer = answer
+        self.vector = vector
+        self.version = version
+        self.created_at = created_at
+
+
+class AnswerCache:
+    """
+    Semantic cache of final answers for first-turn questions.
+
+    A lookup embeds the question and returns the stored answer whose question
+    embedding has cosine similarity >= `threshold`. Entries are tagged with the
+    knowledge version they were produced under; any policy or org-chart change
+    makes them unreachable and they are evicted on the next lookup. Entries also
+    expire after `ttl` seconds, and the least recently used is dropped beyond
+    `max_entries`.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[str], List[float]],
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        ttl: float = ANSWER_CACHE_TTL,
+        max_entries: int = ANSWER_CACHE_SIZE,
+        version_fn: Callable[[], str] = knowledge_version,
+    ):
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version_fn = version_fn
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[str] = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _evict(self, key: str):
+        del self._entries[key]
+        self._matrix = None
+        self.evictions += 1
+
+    def _purge(self, version: str, now: float):
+        for key in [k for k, e in self._entries.items() if e.version != version or now - e.created_at > self.ttl]:
+            self._evict(key)
+
+    def _similarities(self, vector: np.ndarray) -> Tuple[List[str], np.ndarray]:
+        if self._matrix is not None and self._matrix.shape[1] != vector.shape[0]:
+            # The embedding model changed under us; old vectors are not comparable
+            self._entries.clear()
+            self._matrix = None
+        if self._matrix is None:
+            self._matrix_keys = list(self._entries.keys())
+            self._matrix = (
+                np.stack([self._entries[k].vector for k in self._matrix_keys])
+                if self._matrix_keys else np.empty((0, vector.shape[0]), dtype=np.float32)
+            )
+        return self._matrix_keys, self._matrix @ vector
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        arr = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(arr)
+        return arr / norm if norm else arr
+
+    def lookup(self, query: str) -> Tuple[Optional[CachedAnswer], Optional[np.ndarray], float]:
+        """
+        Returns (entry or None, query vector, best similarity). The vector is
+        handed back so a miss can be stored without a second embedding call.
+        """
+        key = normalize_query(query)
+        version = self.version_fn()
+        now = time.time()
+        with self._lock:
+            self._purge(version, now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry, entry.vector, 1.0
+            if not self._entries:
+                self.misses += 1
+                return None, None, 0.0
+
+        vector = self._normalize(self.embed_fn(query))
+        with self._lock:
+            keys, scores = self._similarities(vector)
+            if len(keys):
+                best = int(np.argmax(scores))
+                similarity = float(scores[best])
+                entry = self._entries.get(keys[best])
+                if entry is not None and similarity >= self.threshold:
+                    self._entries.move_to_end(keys[best])
+                    self.hits += 1
+                    return entry, vector, similarity
+            else:
+                similarity = 0.0
+            self.misses += 1
+            return None, vector, similarity
+
+    def store(self, query: str, answer: str, vector: Optional[np.ndarray] = None):
+        if not answer:
+            return
+        if vector is None:
+            vector = self._normalize(self.embed_fn(query))
+        key = normalize_query(query)
+        entry = CachedAnswer(query, answer, vector, self.version_fn(), time.time())
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._matrix = None
+            while len(self._entries) > self.max_entries:
+                self._evict(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,339 @@
+import os
+import json
+import queue
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP, BaseCheckpointSaver, ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple,
+    SerializerProtocol, get_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from rag_engine.observability.metrics import CHECKPOINT_COMMIT_BATCH, CHECKPOINT_SECONDS, observe
+from rag_engine.observability.tracing import span
+
+# --- CONFIGURATION ---
+# "threaded" shares one connection behind a lock; "pooled" uses PooledSqliteSaver
+CHECKPOINT_MODE = os.getenv("CHECKPOINT_MODE", "threaded")
+CHECKPOINT_READERS = int(os.getenv("CHECKPOINT_READERS", "4"))
+CHECKPOINT_CACHE_MB = int(os.getenv("CHECKPOINT_CACHE_MB", "16"))
+# NORMAL is durable against app crashes in WAL mode; FULL also against power loss
+CHECKPOINT_SYNCHRONOUS = os.getenv("CHECKPOINT_SYNCHRONOUS", "NORMAL").upper()
+CHECKPOINT_MAX_BATCH = int(os.getenv("CHECKPOINT_MAX_BATCH", "64"))
+
+# (sql, rows) pairs, each run with executemany
+Statements = List[Tuple[str, Sequence[Sequence[Any]]]]
+
+
+class ThreadedSqliteSaver(SqliteSaver):
+    """
+    SqliteSaver whose async methods run the sync implementation in a worker thread.
+
+    The stock SqliteSaver refuses async calls, which forces the agent onto
+    invoke/stream and blocks the event loop. SqliteSaver already serializes
+    access to its connection with a lock, so offloading is safe. Reads and
+    writes are timed (including the wait for that lock) into
+    nebula_checkpoint_duration_seconds and the request's trace.
+    """
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        with observe(CHECKPOINT_SECONDS, operation="get"), span("checkpoint.get"):
+            return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        with observe(CHECKPOINT_SECONDS, operation="list"), span("checkpoint.list"):
+            items = await asyncio.to_thread(
+                lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+            )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        with observe(CHECKPOINT_SECONDS, operation="put"), span("checkpoint.put"):
+            return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        with observe(CHECKPOINT_SECONDS, operation="put_writes"), span("checkpoint.put_writes"):
+            await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+class PooledSqliteSaver(ThreadedSqliteSaver):
+    """
+    Checkpointer for concurrent conversations: WAL-mode SQLite with pooled
+    readers and a single group-committing writer.
+
+    Reads run on a small thread pool, each thread holding its own read-only
+    connection; WAL lets them proceed while a write commits, so loading one
+    thread's history never waits behind another thread's save. Writes are
+    queued to one writer thread, which commits everything queued since its
+    last commit in a single transaction (one fsync for many saves). A write
+    returns once it is durable. The read queries are SqliteSaver's own,
+    running against the calling thread's connection.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        readers: int = CHECKPOINT_READERS,
+        cache_mb: int = CHECKPOINT_CACHE_MB,
+        synchronous: str = CHECKPOINT_SYNCHRONOUS,
+        max_batch: int = CHECKPOINT_MAX_BATCH,
+        serde: Optional[SerializerProtocol] = None,
+    ):
+        if path == ":memory:":
+            raise ValueError("PooledSqliteSaver needs a database file; its connections can't share :memory:")
+        if synchronous not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+            raise ValueError(f"Unknown synchronous mode: {synchronous}")
+        BaseCheckpointSaver.__init__(self, serde=serde)
+        self.jsonplus_serde = JsonPlusSerializer()
+        self.path = path
+        self.cache_mb = cache_mb
+        self.synchronous = synchronous
+        self.max_batch = max_batch
+        self.lock = threading.Lock()
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+
+        self._writer_conn = self._connect()
+        # Only takes effect on a new file: lets retention return freed pages (see retention.py)
+        self._writer_conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self._writer_conn.execute("PRAGMA journal_mode = WAL")
+        # Creates (or migrates) the tables with SqliteSaver's own schema
+        schema = SqliteSaver(self._writer_conn)
+        schema.setup()
+        self._has_task_path = schema._has_task_path
+        self.is_setup = True
+
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="checkpoint-read")
+        self._queue: "queue.Queue[Optional[Tuple[Statements, Future]]]" = queue.Queue()
+        self._closed = False
+        self._submit_lock = threading.Lock()
+        self._writer = threading.Thread(target=self._write_loop, name="checkpoint-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode: reads see the latest commit, the writer opens its own transactions
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        conn.execute(f"PRAGMA cache_size = -{self.cache_mb * 1024}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    # --- Reads ---
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """The calling thread's read-only connection (SqliteSaver's read queries use it)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            conn.execute("PRAGMA query_only = ON")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def cursor(self, transaction: bool = True) -> Iterator[sqlite3.Cursor]:
+        if transaction:
+            raise RuntimeError("PooledSqliteSaver writes go through its writer thread")
+        cur = self.conn.cursor()
+        try:
+            yield cur
+        finally:
+            cur.close()
+
+    async def _read(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._readers, fn, *args)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        with observe(CHECKPOINT_SECONDS, operation="get"), span("checkpoint.get"):
+            return await self._read(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        with observe(CHECKPOINT_SECONDS, operation="list"), span("checkpoint.list"):
+            items = await self._read(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    # --- Writes ---
+    def _submit(self, statements: Statements) -> Future:
+        future: Future = Future()
+        # Queued writes always commit: a caller giving up doesn't cancel them
+        future.set_running_or_notify_cancel()
+        with self._submit_lock:
+            if self._closed:
+                raise RuntimeError("PooledSqliteSaver is closed")
+            self._queue.put((statements, future))
+        return future
+
+    def _write_loop(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+        self._writer_conn.close()
+
+    def _commit(self, batch: List[Tuple[Statements, Future]]):
+        conn = self._writer_conn
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for statements, _ in batch:
+                for sql, rows in statements:
+                    conn.executemany(sql, rows)
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                try:
+                    conn.execute("ROLLBACK")
+                except sqlite3.Error:
+                    pass
+            if len(batch) > 1:
+                # Retry one by one so only the offending write fails
+                for item in batch:
+                    self._commit([item])
+            else:
+                batch[0][1].set_exception(e)
+            return
+        CHECKPOINT_COMMIT_BATCH.observe(len(batch))
+        for _, future in batch:
+            future.set_result(None)
+
+    def _put_statements(
+        self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+    ) -> Tuple[Statements, RunnableConfig]:
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        type_, serialized_checkpoint = self.serde.dumps_typed(checkpoint)
+        serialized_metadata = json.dumps(
+            get_checkpoint_metadata(config, metadata), ensure_ascii=False
+        ).encode("utf-8", "ignore")
+        statements = [(
+            "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+            "type, checkpoint, metadata) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+              type_, serialized_checkpoint, serialized_metadata)],
+        )]
+        return statements, {
+            "configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}
+        }
+
+    def _writes_statements(
+        self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str,
+    ) -> Statements:
+        verb = "INSERT OR REPLACE" if all(w[0] in WRITES_IDX_MAP for w in writes) else "INSERT OR IGNORE"
+        configurable = config["configurable"]
+        rows = [
+            (str(configurable["thread_id"]), str(configurable["checkpoint_ns"]), str(configurable["checkpoint_id"]),
+             task_id, task_path, WRITES_IDX_MAP.get(channel, idx), channel, *self.serde.dumps_typed(value))
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        return [(
+            f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, task_path, idx, channel, "
+            "type, value) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )]
+
+    @staticmethod
+    def _delete_statements(thread_id: str) -> Statements:
+        return [
+            ("DELETE FROM checkpoints WHERE thread_id = ?", [(str(thread_id),)]),
+            ("DELETE FROM writes WHERE thread_id = ?", [(str(thread_id),)]),
+        ]
+
+    def put(
+        self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        statements, saved = self._put_statements(config, checkpoint, metadata)
+        self._submit(statements).result()
+        return saved
+
+    def put_writes(
+        self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "",
+    ) -> None:
+        self._submit(self._writes_statements(config, writes, task_id, task_path)).result()
+
+    def delete_thread(self, thread_id: str) -> None:
+        self._submit(self._delete_statements(thread_id)).result()
+
+    async def aput(
+        self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        with observe(CHECKPOINT_SECONDS, operation="put"), span("checkpoint.put"):
+            statements, saved = self._put_statements(config, checkpoint, metadata)
+            await asyncio.wrap_future(self._submit(statements))
+            return saved
+
+    async def aput_writes(
+        self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "",
+    ) -> None:
+        with observe(CHECKPOINT_SECONDS, operation="put_writes"), span("checkpoint.put_writes"):
+            await asyncio.wrap_future(self._submit(self._writes_statements(config, writes, task_id, task_path)))
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.wrap_future(self._submit(self._delete_statements(thread_id)))
+
+    def close(self):
+        """Commits the queued writes, then closes every connection."""
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._writer.join()
+        self._readers.shutdown(wait=True)
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
@@ -0,0 +1,205 @@
+import os
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from langchain_core.messages import (
+    AIMessage, BaseMessage, HumanMessage, RemoveMessage, SystemMessage, ToolMessage,
+)
+from langchain_core.runnables import RunnableLambda
+from langgraph.constants import TAG_NOSTREAM
+from langgraph.prebuilt.chat_agent_executor import AgentState
+from typing_extensions import NotRequired
+
+from rag_engine.ingestion.pipeline import count_tokens
+
+logger = logging.getLogger("nebula.context")
+
+# --- CONFIGURATION ---
+CONTEXT_WINDOW_ENABLED = os.getenv("CONTEXT_WINDOW_ENABLED", "true").lower() in ("1", "true", "yes")
+# Prompt budget: system prompt, summary, earlier turns and the current turn
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "8000"))
+# Once over budget, fold old turns until the prompt is back under this, so the
+# summarizer runs every few turns rather than on every one
+CONTEXT_TARGET_TOKENS = int(os.getenv("CONTEXT_TARGET_TOKENS", str(CONTEXT_MAX_TOKENS * 6 // 10)))
+# Completed turns whose tool calls and results stay verbatim (older turns keep question and answer only)
+CONTEXT_KEEP_TOOL_TURNS = int(os.getenv("CONTEXT_KEEP_TOOL_TURNS", "1"))
+# Longest tool result passed to the model; longer ones are cut
+CONTEXT_MAX_TOOL_TOKENS = int(os.getenv("CONTEXT_MAX_TOOL_TOKENS", "2000"))
+CONTEXT_SUMMARY_TOKENS = int(os.getenv("CONTEXT_SUMMARY_TOKENS", "400"))
+
+SUMMARY_PROMPT = """You maintain the running summary of a conversation between an employee and the
+Nebula Dynamics onboarding assistant. Extend the summary with the new exchanges below.
+Keep names, roles, figures, policy references and open questions; drop pleasantries.
+Reply with the updated summary only, in at most {max_tokens} tokens.
+
+Current summary:
+{summary}
+
+New exchanges:
+{transcript}"""
+
+Summarizer = Callable[[str, List[BaseMessage]], Awaitable[str]]
+
+
+class ContextState(AgentState):
+    """Agent state plus the rolling summary of turns no longer kept verbatim."""
+
+    summary: NotRequired[str]
+
+
+def _text(message: BaseMessage) -> str:
+    content = message.content
+    if isinstance(content, list):
+        return "".join(part if isinstance(part, str) else part.get("text", "") for part in content)
+    return str(content)
+
+
+def message_tokens(message: BaseMessage) -> int:
+    tokens = count_tokens(_text(message)) + 4
+    if isinstance(message, AIMessage) and message.tool_calls:
+        tokens += count_tokens(json.dumps([{"name": c["name"], "args": c["args"]} for c in message.tool_calls]))
+    return tokens
+
+
+def split_turns(messages: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+    """Groups messages into turns, each starting at a user message."""
+    turns: List[List[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def compact_turn(turn: List[BaseMessage]) -> List[BaseMessage]:
+    """The turn without its tool calls and results: the question and the answer."""
+    return [
+        m for m in turn
+        if not isinstance(m, ToolMessage) and not (isinstance(m, AIMessage) and m.tool_calls)
+    ]
+
+
+def transcript(messages: Sequence[BaseMessage]) -> str:
+    lines = []
+    for message in messages:
+        role = "Employee" if isinstance(message, HumanMessage) else "Assistant"
+        text = _text(message).strip()
+        if text:
+            lines.append(f"{role}: {text}")
+    return "\n".join(lines)
+
+
+def llm_summarizer(llm, max_tokens: int = CONTEXT_SUMMARY_TOKENS) -> Summarizer:
+    """Summarizes with the agent's model; tagged so the call isn't streamed to the user."""
+    async def summarize(summary: str, messages: List[BaseMessage]) -> str:
+        prompt = SUMMARY_PROMPT.format(
+            max_tokens=max_tokens, summary=summary or "(none yet)", transcript=transcript(messages),
+        )
+        response = await llm.ainvoke([HumanMessage(content=prompt)], config={"tags": [TAG_NOSTREAM]})
+        return _text(response).strip()
+    return summarize
+
+
+class ContextManager:
+    """
+    pre_model_hook that bounds the prompt the agent sends on every model call.
+
+    Before each call:
+    - tool calls and results of turns older than the last `keep_tool_turns`
+      completed turns are removed from the thread (question and answer stay);
+    - if the prompt would exceed `max_tokens`, the oldest turns are folded
+      into the thread's rolling summary (saved in the checkpoint with the
+      messages) and removed, until the prompt fits `target_tokens`;
+    - tool results longer than `max_tool_tokens` are cut in the model input.
+
+    Tokens are counted with tiktoken's cl100k_base, an estimate of Gemini's
+    own tokenizer; leave headroom below the model's real limit.
+
+    The turn in progress is never folded or trimmed from the thread, so the
+    prompt is bounded by the budget plus the current turn's capped tool
+    results, however long the thread grows. If the summarizer fails, the
+    turns are dropped anyway and the previous summary is kept.
+    """
+
+    def __init__(
+        self,
+        system_prompt: str,
+        summarize: Optional[Summarizer] = None,
+        max_tokens: int = CONTEXT_MAX_TOKENS,
+        target_tokens: int = CONTEXT_TARGET_TOKENS,
+        keep_tool_turns: int = CONTEXT_KEEP_TOOL_TURNS,
+        max_tool_tokens: int = CONTEXT_MAX_TOOL_TOKENS,
+        summary_tokens: int = CONTEXT_SUMMARY_TOKENS,
+    ):
+        self.system_prompt = system_prompt
+        self.summarize = summarize
+        self.max_tokens = max_tokens
+        self.target_tokens = min(target_tokens, max_tokens)
+        self.keep_tool_turns = keep_tool_turns
+        self.max_tool_tokens = max_tool_tokens
+        self.summary_tokens = summary_tokens
+
+    def prompt(self, state: Dict[str, Any]) -> List[BaseMessage]:
+        """The agent's `prompt`: system instructions plus the summary, then the windowed messages."""
+        system = self.system_prompt
+        if state.get("summary"):
+            system += f"\n\nSUMMARY OF THE EARLIER CONVERSATION:\n{state['summary']}"
+        return [SystemMessage(content=system)] + list(state["messages"])
+
+    def _cap_tool_result(self, message: BaseMessage) -> BaseMessage:
+        if not isinstance(message, ToolMessage) or message_tokens(message) <= self.max_tool_tokens:
+            return message
+        # ~4 characters per token; cutting by characters avoids re-encoding
+        text = _text(message)[: self.max_tool_tokens * 4]
+        return message.model_copy(update={"content": f"{text}\n[... truncated to fit the context budget]"})
+
+    def _plan(self, state: Dict[str, Any]):
+        """(turns to fold, trimmed tool messages, turns sent to the model) for the current state."""
+        turns = split_turns(state["messages"])
+        history, current = turns[:-1], turns[-1:]
+        keep_from = max(len(history) - self.keep_tool_turns, 0)
+        compacted = [compact_turn(t) if i < keep_from else t for i, t in enumerate(history)]
+        kept_ids = {id(m) for t in compacted for m in t}
+        trimmed = [m for t in history for m in t if id(m) not in kept_ids]
+
+        system = count_tokens(self.system_prompt)
+        sizes = [sum(message_tokens(m) for m in t) for t in compacted]
+        remaining = sum(sizes) + sum(message_tokens(self._cap_tool_result(m)) for t in current for m in t)
+        fold = 0
+        if system + count_tokens(state.get("summary", "")) + remaining > self.max_tokens:
+            # The new summary may grow to summary_tokens
+            while fold < len(compacted) and system + self.summary_tokens + remaining > self.target_tokens:
+                remaining -= sizes[fold]
+                fold += 1
+        return compacted[:fold], trimmed, compacted[fold:] + current
+
+    def _model_input(self, turns: List[List[BaseMessage]]) -> List[BaseMessage]:
+        return [self._cap_tool_result(m) for t in turns for m in t]
+
+    async def ahook(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        folded, trimmed, kept = self._plan(state)
+        update: Dict[str, Any] = {"llm_input_messages": self._model_input(kept)}
+        gone = trimmed + [m for t in folded for m in t]
+        update["messages"] = [RemoveMessage(id=m.id) for m in gone if m.id]
+        if folded:
+            update["summary"] = await self._fold(state.get("summary", ""), folded)
+            logger.info(f"Folded {len(folded)} turns into the conversation summary")
+        return update
+
+    async def _fold(self, summary: str, turns: List[List[BaseMessage]]) -> str:
+        if self.summarize is None:
+            return summary
+        try:
+            return await self.summarize(summary, [m for t in turns for m in t])
+        except Exception:
+            logger.warning("Conversation summary failed; dropping the oldest turns unsummarized", exc_info=True)
+            return summary
+
+    def hook(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Sync runs can't await the summarizer: they window the model input and leave the thread as is."""
+        _, _, kept = self._plan(state)
+        return {"llm_input_messages": self._model_input(kept)}
+
+    def as_runnable(self) -> RunnableLambda:
+        return RunnableLambda(self.hook, afunc=self.ahook, name="context_window")
@@ -0,0 +1,275 @@
+import os
+import json
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set
+
+# --- CONFIGURATION ---
+DATA_PATH = os.getenv("DATA_PATH", "./data_seed")
+QUERY_CACHE_SIZE = 4096
+
+
+def _load_records(path: str) -> List[Dict[str, Any]]:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def _file_mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class _EmployeeIndex:
+    """Immutable indexes over one version of org_chart.json."""
+
+    def __init__(self, employees: List[Dict[str, Any]]):
+        self.employees = employees
+        self.by_id: Dict[str, int] = {}
+        self.postings: Dict[str, Set[int]] = defaultdict(set)
+        self.reports: Dict[str, List[str]] = defaultdict(list)
+        for i, emp in enumerate(employees):
+            self.by_id.setdefault(emp["employee_id"].lower(), i)
+            for token in f"{emp['name']} {emp['title']} {emp['role_id']}".lower().split():
+                self.postings[token].add(i)
+            if emp.get("manager_id"):
+                self.reports[emp["manager_id"]].append(emp["employee_id"])
+        self.part_cache: Dict[str, Set[int]] = {}
+        self._build_hierarchy()
+
+    def _build_hierarchy(self):
+        """
+        Precomputes the org graph so hierarchy questions are single lookups:
+
+        - `chains`: employee_id -> [manager, skip-level, ..., CEO]
+        - `euler`: employee_ids in DFS pre-order; `tin`/`tout` give each
+          person's subtree as the slice euler[tin : tout + 1]
+        """
+        ids = {emp["employee_id"] for emp in self.employees}
+        manager_of = {
+            emp["employee_id"]: emp.get("manager_id")
+            for emp in self.employees
+            if emp.get("manager_id") in ids
+        }
+
+        self.chains: Dict[str, List[str]] = {}
+        for emp_id in ids:
+            chain: List[str] = []
+            seen = {emp_id}
+            current = manager_of.get(emp_id)
+            while current is not None and current not in seen:
+                chain.append(current)
+                seen.add(current)
+                current = manager_of.get(current)
+            self.chains[emp_id] = chain
+
+        self.euler: List[str] = []
+        self.tin: Dict[str, int] = {}
+        self.tout: Dict[str, int] = {}
+        roots = [emp["employee_id"] for emp in self.employees if emp["employee_id"] not in manager_of]
+        # Anyone left unvisited afterwards sits on a manager cycle; treat them as roots too
+        for start in roots + [emp["employee_id"] for emp in self.employees]:
+            if start in self.tin:
+                continue
+            stack = [(start, False)]
+            while stack:
+                emp_id, done = stack.pop()
+                if done:
+                    self.tout[emp_id] = len(self.euler) - 1
+                    continue
+                if emp_id in self.tin:
+                    continue
+                self.tin[emp_id] = len(self.euler)
+                self.euler.append(emp_id)
+                stack.append((emp_id, True))
+                for report in reversed(self.reports.get(emp_id, [])):
+                    if report not in self.tin:
+                        stack.append((report, False))
+
+    def matching_part(self, part: str) -> Set[int]:
+        cached = self.part_cache.get(part)
+        if cached is not None:
+            return cached
+        matched: Set[int] = set()
+        for token, positions in self.postings.items():
+            if part in token:
+                matched |= positions
+        if len(self.part_cache) >= QUERY_CACHE_SIZE:
+            self.part_cache.clear()
+        self.part_cache[part] = matched
+        return matched
+
+
+class EmployeeDirectory:
+    """
+    Loaded-once view of org_chart.json, re-parsed only when the file's mtime changes.
+
+    Matching keeps the semantics of the original linear scan: a record matches on
+    an exact employee_id, or when every query word is a substring of
+    "name title role_id". A word without whitespace can only be a substring of a
+    single token, so candidates come from an inverted index over the token
+    vocabulary instead of from every record.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.mtime_ns: Optional[int] = None
+        self.version = 0
+        self._index = _EmployeeIndex([])
+        self.refresh(force=True)
+
+    def refresh(self, force: bool = False) -> "_EmployeeIndex":
+        mtime_ns = _file_mtime(self.path)
+        if not force and mtime_ns == self.mtime_ns:
+            return self._index
+        with self._lock:
+            if force or mtime_ns != self.mtime_ns:
+                self._index = _EmployeeIndex(_load_records(self.path))
+                self.mtime_ns = mtime_ns
+                self.version += 1
+            return self._index
+
+    @property
+    def employees(self) -> List[Dict[str, Any]]:
+        return self.refresh().employees
+
+    def get(self, employee_id: str) -> Optional[Dict[str, Any]]:
+        index = self.refresh()
+        i = index.by_id.get(employee_id.lower())
+        return index.employees[i] if i is not None else None
+
+    def search(self, query: str) -> List[Dict[str, Any]]:
+        """Employees matching an exact ID or containing every query word, in file order."""
+        index = self.refresh()
+        query_parts = query.lower().split()
+        positions: Set[int] = set()
+
+        # 1. Exact ID match
+        i = index.by_id.get(query.lower())
+        if i is not None:
+            positions.add(i)
+
+        # 2. All-words match (an empty query matches everyone, like the old scan)
+        if query_parts:
+            text_matches = index.matching_part(query_parts[0])
+            for part in query_parts[1:]:
+                if not text_matches:
+                    break
+                text_matches = text_matches & index.matching_part(part)
+        else:
+            text_matches = set(range(len(index.employees)))
+        positions |= text_matches
+
+        return [index.employees[i] for i in sorted(positions)]
+
+    def direct_reports(self, employee_id: str) -> List[str]:
+        return list(self.refresh().reports.get(employee_id, []))
+
+    def manager_chain(self, employee_id: str) -> List[str]:
+        """Managers from the direct manager up to the top of the org."""
+        return list(self.refresh().chains.get(employee_id, []))
+
+    def skip_level(self, employee_id: str) -> Optional[str]:
+        chain = self.refresh().chains.get(employee_id, [])
+        return chain[1] if len(chain) > 1 else None
+
+    def org_members(self, employee_id: str) -> List[str]:
+        """Everyone below the employee, direct and indirect, in DFS order."""
+        index = self.refresh()
+        if employee_id not in index.tin:
+            return []
+        return index.euler[index.tin[employee_id] + 1:index.tout[employee_id] + 1]
+
+    def is_in_org(self, employee_id: str, leader_id: str) -> bool:
+        """True if the employee reports (directly or indirectly) to the leader."""
+        index = self.refresh()
+        if employee_id == leader_id or employee_id not in index.tin or leader_id not in index.tin:
+            return False
+        return index.tin[leader_id] < index.tin[employee_id] <= index.tout[leader_id]
+
+
+class _RoleIndex:
+    """Immutable indexes over one version of role_definitions.json."""
+
+    def __init__(self, roles: List[Dict[str, Any]]):
+        self.roles = roles
+        self.by_id: Dict[str, int] = {}
+        for i, role in enumerate(roles):
+            self.by_id.setdefault(role["role_id"].lower(), i)
+        self.keys = [(role["role_id"].lower(), role["title"].lower()) for role in roles]
+        self.query_cache: Dict[str, Optional[int]] = {}
+
+
+class RoleDirectory:
+    """Loaded-once view of role_definitions.json with memoized title/ID lookups."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.mtime_ns: Optional[int] = None
+        self.version = 0
+        self._index = _RoleIndex([])
+        self.refresh(force=True)
+
+    def refresh(self, force: bool = False) -> "_RoleIndex":
+        mtime_ns = _file_mtime(self.path)
+        if not force and mtime_ns == self.mtime_ns:
+            return self._index
+        with self._lock:
+            if force or mtime_ns != self.mtime_ns:
+                self._index = _RoleIndex(_load_records(self.path))
+                self.mtime_ns = mtime_ns
+                self.version += 1
+            return self._index
+
+    @property
+    def roles(self) -> List[Dict[str, Any]]:
+        return self.refresh().roles
+
+    def find(self, query: str) -> Optional[Dict[str, Any]]:
+        """First role whose ID or title contains the query (case-insensitive)."""
+        index = self.refresh()
+        query_str = query.lower()
+        if query_str not in index.query_cache:
+            exact = index.by_id.get(query_str)
+            # An exact ID hit is the answer unless an earlier role also matches
+            candidates = index.keys if exact is None else index.keys[:exact]
+            match = exact
+            for i, (role_id, title) in enumerate(candidates):
+                if query_str in role_id or query_str in title:
+                    match = i
+                    break
+            if len(index.query_cache) >= QUERY_CACHE_SIZE:
+                index.query_cache.clear()
+            index.query_cache[query_str] = match
+        i = index.query_cache[query_str]
+        return index.roles[i] if i is not None else None
+
+
+# --- SINGLETONS ---
+_employees: Optional[EmployeeDirectory] = None
+_roles: Optional[RoleDirectory] = None
+_singleton_lock = threading.Lock()
+
+
+def get_employee_directory() -> EmployeeDirectory:
+    global _employees
+    if _employees is None:
+        with _singleton_lock:
+            if _employees is None:
+                _employees = EmployeeDirectory(os.path.join(DATA_PATH, "structured", "org_chart.json"))
+    return _employees
+
+
+def get_role_directory() -> RoleDirectory:
+    global _roles
+    if _roles is None:
+        with _singleton_lock:
+            if _roles is None:
+                _roles = RoleDirectory(os.path.join(DATA_PATH, "structured", "role_definitions.json"))
+    return _roles
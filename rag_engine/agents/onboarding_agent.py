@@ -4,15 +4,18 @@ from dotenv import load_dotenv
 
 from langgraph.prebuilt import create_react_agent
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langgraph.checkpoint.sqlite import SqliteSaver
 
-from rag_engine.agents.tools import search_policies, lookup_employee, lookup_role_requirements
+from rag_engine.agents.checkpointer import CHECKPOINT_MODE, PooledSqliteSaver, ThreadedSqliteSaver
+from rag_engine.agents.context import CONTEXT_WINDOW_ENABLED, ContextManager, ContextState, llm_summarizer
+from rag_engine.agents.tool_execution import build_tool_node
+from rag_engine.agents.tools import search_policies, lookup_employee, lookup_role_requirements, lookup_org_hierarchy
 
 load_dotenv()
 
 # --- 1. Initialize the LLM ---
+LLM_MODEL = "gemini-2.5-flash"
 llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash",
+    model=LLM_MODEL,
     temperature=0,
     max_tokens=None,
     timeout=None,
@@ -20,7 +23,9 @@ llm = ChatGoogleGenerativeAI(
 )
 
 # --- 2. Register the Tools ---
-tools = [search_policies, lookup_employee, lookup_role_requirements]
+tools = [search_policies, lookup_employee, lookup_role_requirements, lookup_org_hierarchy]
+# Runs the tool calls of one step concurrently, capped and with per-tool timeouts
+tool_node = build_tool_node(tools)
 
 # --- 3. System Prompt ---
 SYSTEM_PROMPT = """You are the Nebula Dynamics Onboarding Assistant.
@@ -30,17 +35,35 @@ RULES:
 1. ALWAYS use the tools. Do not guess.
 2. If a user asks for a role (e.g., "Engineering Director"), use 'lookup_employee' to find the person holding that title.
 3. If a policy search for a specific term fails, try a shorter keyword (e.g., "stipend" instead of "remote stipend policy").
-4. When asked about managers, look up the employee first, find their 'manager_id', then look up that ID.
+4. For managers, skip-levels, reports, or who is in someone's org, call 'lookup_org_hierarchy' once instead of chaining 'lookup_employee' calls.
 5. Be concise and professional.
 """
 
 # --- 4. Persistent Memory (FIXED) ---
 DB_FILE = os.getenv("MEMORY_DB_PATH", "./conversation_history.db")
 
-# Create a persistent SQLite connection
-# check_same_thread=False allows usage across multiple requests
-conn = sqlite3.connect(DB_FILE, check_same_thread=False)
-memory = SqliteSaver(conn)
+if CHECKPOINT_MODE == "pooled":
+    # WAL, pooled readers and a group-committing writer for concurrent conversations
+    memory = PooledSqliteSaver(DB_FILE)
+else:
+    # Create a persistent SQLite connection
+    # check_same_thread=False allows usage across multiple requests
+    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+    # New files only: lets checkpoint retention return freed pages to the filesystem
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    # Async methods offload to a thread so the API can use ainvoke/astream
+    memory = ThreadedSqliteSaver(conn)
 
-# --- 5. Create the Agent ---
-agent_executor = create_react_agent(llm, tools, prompt=SYSTEM_PROMPT, checkpointer=memory)
+# --- 5. Context Window ---
+# Bounds the prompt on long threads: old tool output is trimmed and old turns
+# are folded into a rolling summary kept in the checkpoint
+context = ContextManager(SYSTEM_PROMPT, summarize=llm_summarizer(llm)) if CONTEXT_WINDOW_ENABLED else None
+
+# --- 6. Create the Agent ---
+if context is not None:
+    agent_executor = create_react_agent(
+        llm, tool_node, prompt=context.prompt, checkpointer=memory,
+        state_schema=ContextState, pre_model_hook=context.as_runnable(),
+    )
+else:
+    agent_executor = create_react_agent(llm, tool_node, prompt=SYSTEM_PROMPT, checkpointer=memory)
@@ -0,0 +1,374 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import argparse
+import sqlite3
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from rag_engine.observability.metrics import CHECKPOINT_DB_BYTES, CHECKPOINT_DB_ROWS
+
+logger = logging.getLogger("nebula.retention")
+
+# --- CONFIGURATION ---
+MEMORY_DB_PATH = os.getenv("MEMORY_DB_PATH", "./conversation_history.db")
+# Checkpoints kept per thread (0 keeps all); the agent resumes from the latest one
+CHECKPOINT_KEEP_PER_THREAD = int(os.getenv("CHECKPOINT_KEEP_PER_THREAD", "20"))
+# Threads idle for longer are deleted (0 keeps them forever)
+CHECKPOINT_THREAD_TTL_DAYS = float(os.getenv("CHECKPOINT_THREAD_TTL_DAYS", "30"))
+# Threads written to more recently than this are left alone: they may have a
+# request in flight in another process (a second replica, or the API while
+# the CLI runs)
+CHECKPOINT_GC_MIN_IDLE = float(os.getenv("CHECKPOINT_GC_MIN_IDLE", "300"))
+# Threads per delete transaction; small batches keep the write lock short
+CHECKPOINT_GC_BATCH = int(os.getenv("CHECKPOINT_GC_BATCH", "100"))
+# Pages returned to the filesystem per incremental VACUUM step
+CHECKPOINT_VACUUM_STEP = int(os.getenv("CHECKPOINT_VACUUM_STEP", "1000"))
+# Background collection in the API (seconds between runs)
+CHECKPOINT_GC_ENABLED = os.getenv("CHECKPOINT_GC_ENABLED", "false").lower() in ("1", "true", "yes")
+CHECKPOINT_GC_INTERVAL = float(os.getenv("CHECKPOINT_GC_INTERVAL", "3600"))
+
+# Gregorian epoch (1582-10-15) to Unix epoch, in the 100 ns ticks of UUID timestamps
+_UUID_EPOCH_OFFSET = 0x01B21DD213814000
+AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+
+Hold = Callable[[List[str]], ContextManager[List[str]]]
+
+EXPIRE_STATEMENTS = [
+    # Rechecked inside the transaction: a thread written to since it was selected is kept
+    "DELETE FROM writes WHERE thread_id = ? AND NOT EXISTS "
+    "(SELECT 1 FROM checkpoints WHERE thread_id = ? AND checkpoint_id >= ?)",
+    "DELETE FROM checkpoints WHERE thread_id = ? AND NOT EXISTS "
+    "(SELECT 1 FROM checkpoints AS newer WHERE newer.thread_id = ? AND newer.checkpoint_id >= ?)",
+]
+PRUNE_STATEMENTS = [
+    # Checkpoint ids are time-ordered, so the highest ranks are the oldest (per namespace)
+    "DELETE FROM checkpoints WHERE thread_id = ? AND (checkpoint_ns, checkpoint_id) IN ("
+    "SELECT checkpoint_ns, checkpoint_id FROM (SELECT checkpoint_ns, checkpoint_id, ROW_NUMBER() OVER "
+    "(PARTITION BY checkpoint_ns ORDER BY checkpoint_id DESC) AS age FROM checkpoints WHERE thread_id = ?) "
+    "WHERE age > ?)",
+    "DELETE FROM writes WHERE thread_id = ? AND NOT EXISTS (SELECT 1 FROM checkpoints AS c "
+    "WHERE c.thread_id = writes.thread_id AND c.checkpoint_ns = writes.checkpoint_ns "
+    "AND c.checkpoint_id = writes.checkpoint_id)",
+]
+
+
+def checkpoint_id_at(timestamp: float) -> str:
+    """
+    The lowest checkpoint id with the given Unix time. LangGraph's ids are
+    version 6 UUIDs, which compare as strings in time order, so
+    `checkpoint_id < checkpoint_id_at(t)` selects checkpoints saved before t.
+    """
+    ticks = max(int(timestamp * 1e7) + _UUID_EPOCH_OFFSET, 0)
+    high = f"{ticks >> 12:012x}"
+    return f"{high[:8]}-{high[8:]}-6{ticks & 0xFFF:03x}-0000-000000000000"
+
+
+@contextmanager
+def _hold_all(thread_ids: List[str]) -> Iterator[List[str]]:
+    yield thread_ids
+
+
+def _batches(items: Sequence[str], size: int) -> Iterator[List[str]]:
+    for i in range(0, len(items), size):
+        yield list(items[i:i + size])
+
+
+class ThreadActivity:
+    """
+    Threads with a request in flight in this process.
+
+    Requests run inside `track(thread_id)`. The collector `hold`s a batch of
+    threads while it deletes their checkpoints: it gets back only the idle
+    ones, and a request for a held thread waits for the batch to finish
+    before it starts. Safe to use from the event loop and worker threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active: Dict[str, int] = {}
+        self._held: Dict[str, threading.Event] = {}
+
+    @asynccontextmanager
+    async def track(self, thread_id: str):
+        while True:
+            with self._lock:
+                released = self._held.get(thread_id)
+                if released is None:
+                    self._active[thread_id] = self._active.get(thread_id, 0) + 1
+                    break
+            await asyncio.to_thread(released.wait)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active[thread_id] -= 1
+                if not self._active[thread_id]:
+                    del self._active[thread_id]
+
+    @contextmanager
+    def hold(self, thread_ids: List[str]) -> Iterator[List[str]]:
+        released = threading.Event()
+        with self._lock:
+            idle = [t for t in thread_ids if t not in self._active and t not in self._held]
+            for thread_id in idle:
+                self._held[thread_id] = released
+        try:
+            yield idle
+        finally:
+            with self._lock:
+                for thread_id in idle:
+                    del self._held[thread_id]
+            released.set()
+
+    def active(self) -> List[str]:
+        with self._lock:
+            return list(self._active)
+
+
+class CheckpointRetention:
+    """
+    Retention for the conversation checkpoint database, which otherwise
+    grows by a full checkpoint per agent step and never shrinks. A pass:
+    - deletes threads whose latest checkpoint is older than `ttl_days`;
+    - keeps only the latest `keep_per_thread` checkpoints of other threads
+      (the latest holds the whole conversation; older ones only serve state
+      history) and the pending writes of the kept ones;
+    - returns the freed pages to the filesystem with incremental VACUUM;
+    - reports the file size and row counts.
+
+    It uses its own connection and short per-batch transactions, so it can
+    run next to the app's checkpointer. A thread is only touched when its
+    latest checkpoint is older than `min_idle` seconds and `hold` (e.g.
+    ThreadActivity.hold) releases it.
+
+    Incremental VACUUM needs the database in auto_vacuum=INCREMENTAL mode.
+    The app's checkpointers create new databases that way; an older file is
+    converted once with `enable_incremental_vacuum()` (a full VACUUM that
+    blocks writers while it runs, so the CLI does it on request only).
+    """
+
+    def __init__(
+        self,
+        path: str = MEMORY_DB_PATH,
+        keep_per_thread: int = CHECKPOINT_KEEP_PER_THREAD,
+        ttl_days: float = CHECKPOINT_THREAD_TTL_DAYS,
+        min_idle: float = CHECKPOINT_GC_MIN_IDLE,
+        batch_size: int = CHECKPOINT_GC_BATCH,
+        vacuum_step: int = CHECKPOINT_VACUUM_STEP,
+        interval: float = CHECKPOINT_GC_INTERVAL,
+        activity: Optional[ThreadActivity] = None,
+    ):
+        self.path = path
+        self.keep_per_thread = keep_per_thread
+        self.ttl_days = ttl_days
+        self.min_idle = min_idle
+        self.batch_size = batch_size
+        self.vacuum_step = vacuum_step
+        self.interval = interval
+        self.activity = activity
+        self.last_report: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def connect(self) -> sqlite3.Connection:
+        # Autocommit: each batch opens its own transaction
+        return sqlite3.connect(self.path, isolation_level=None, timeout=30)
+
+    # --- Policy ---
+
+    def candidates(self, conn: sqlite3.Connection, now: Optional[float] = None) -> Tuple[List[str], List[str]]:
+        """(threads past the TTL, idle threads with more than keep_per_thread checkpoints)."""
+        now = time.time() if now is None else now
+        idle_before = checkpoint_id_at(now - self.min_idle)
+        expire_before = checkpoint_id_at(now - self.ttl_days * 86400) if self.ttl_days > 0 else None
+        expired, prunable = [], []
+        # Reads only the primary key index, not the checkpoint blobs
+        rows = conn.execute("SELECT thread_id, MAX(checkpoint_id), COUNT(*) FROM checkpoints GROUP BY thread_id")
+        for thread_id, latest, count in rows:
+            if latest >= idle_before:
+                continue
+            if expire_before is not None and latest < expire_before:
+                expired.append(thread_id)
+            elif self.keep_per_thread > 0 and count > self.keep_per_thread:
+                prunable.append(thread_id)
+        return expired, prunable
+
+    def _delete(self, conn: sqlite3.Connection, statements: List[Tuple[str, List[Tuple]]]) -> int:
+        deleted = 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, rows in statements:
+                for row in rows:
+                    deleted += conn.execute(sql, row).rowcount
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return deleted
+
+    def expire(self, conn: sqlite3.Connection, thread_ids: List[str], now: Optional[float] = None) -> int:
+        """Deletes the threads (rows deleted); one written to since selection is kept."""
+        now = time.time() if now is None else now
+        idle_before = checkpoint_id_at(now - max(self.ttl_days * 86400, self.min_idle))
+        return self._delete(conn, [(sql, [(t, t, idle_before) for t in thread_ids]) for sql in EXPIRE_STATEMENTS])
+
+    def prune(self, conn: sqlite3.Connection, thread_ids: List[str]) -> int:
+        """
+        Deletes all but the latest keep_per_thread checkpoints of the threads
+        (rows deleted). Unlike expiry this needs no recheck: a thread written
+        to since selection still keeps its newest checkpoints.
+        """
+        checkpoints, writes = PRUNE_STATEMENTS
+        return self._delete(conn, [
+            (checkpoints, [(t, t, self.keep_per_thread) for t in thread_ids]),
+            (writes, [(t,) for t in thread_ids]),
+        ])
+
+    def vacuum(self, conn: sqlite3.Connection) -> int:
+        """Returns free pages to the filesystem a step at a time (pages freed; 0 if not in incremental mode)."""
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            return 0
+        freed = 0
+        while True:
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if not free:
+                break
+            # Each step is its own short write transaction; the pragma runs as its rows are read
+            conn.execute(f"PRAGMA incremental_vacuum({min(free, self.vacuum_step)})").fetchall()
+            left = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if left >= free:
+                break
+            freed += free - left
+        # Moves the shrunken pages into the main file without waiting for readers
+        conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+        return freed
+
+    def enable_incremental_vacuum(self, conn: sqlite3.Connection) -> bool:
+        """Switches the file to auto_vacuum=INCREMENTAL with a full VACUUM. False if it already was."""
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return False
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        return True
+
+    def stats(self, conn: sqlite3.Connection) -> Dict[str, Any]:
+        """File size (with the WAL), page usage and row counts."""
+        size = sum(os.path.getsize(p) for p in (self.path, f"{self.path}-wal") if os.path.exists(p))
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        stats = {
+            "size_mb": round(size / 1e6, 2),
+            "free_mb": round(conn.execute("PRAGMA freelist_count").fetchone()[0] * page_size / 1e6, 2),
+            "auto_vacuum": AUTO_VACUUM_MODES.get(conn.execute("PRAGMA auto_vacuum").fetchone()[0], "unknown"),
+        }
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for table in ("checkpoints", "writes"):
+            stats[table] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] if table in tables else 0
+        stats["threads"] = (
+            conn.execute("SELECT COUNT(DISTINCT thread_id) FROM checkpoints").fetchone()[0]
+            if "checkpoints" in tables else 0
+        )
+        CHECKPOINT_DB_BYTES.set(size)
+        for table in ("checkpoints", "writes"):
+            CHECKPOINT_DB_ROWS.labels(table=table).set(stats[table])
+        return stats
+
+    def collect(self, hold: Optional[Hold] = None, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        One full pass: expire, prune, vacuum. Returns a report with the rows
+        deleted, the threads skipped because they were busy, and the stats
+        after the pass. With `dry_run`, only counts the candidate threads.
+        """
+        hold = hold or (self.activity.hold if self.activity is not None else _hold_all)
+        start = time.perf_counter()
+        report: Dict[str, Any] = {"expired_threads": 0, "pruned_threads": 0, "deleted_rows": 0, "busy_threads": 0}
+        if not os.path.exists(self.path):
+            return {**report, "status": "warning", "detail": "not created yet"}
+        conn = self.connect()
+        try:
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            if {"checkpoints", "writes"} - tables:
+                return {**report, "stats": self.stats(conn)}
+            expired, prunable = self.candidates(conn)
+            if dry_run:
+                report.update(expired_threads=len(expired), pruned_threads=len(prunable))
+            else:
+                for key, threads, delete in (
+                    ("expired_threads", expired, self.expire), ("pruned_threads", prunable, self.prune),
+                ):
+                    for batch in _batches(threads, self.batch_size):
+                        with hold(batch) as idle:
+                            if idle:
+                                report["deleted_rows"] += delete(conn, idle)
+                        report[key] += len(idle)
+                        report["busy_threads"] += len(batch) - len(idle)
+                page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+                report["vacuumed_mb"] = round(self.vacuum(conn) * page_size / 1e6, 2)
+            report["stats"] = self.stats(conn)
+        finally:
+            conn.close()
+        report["duration_s"] = round(time.perf_counter() - start, 2)
+        report["finished_at"] = time.time()
+        return report
+
+    # --- Background task ---
+
+    async def _run(self):
+        while True:
+            try:
+                self.last_report = await asyncio.to_thread(self.collect)
+                report = self.last_report
+                logger.info(
+                    f"Checkpoint retention: {report['expired_threads']} threads expired, "
+                    f"{report['pruned_threads']} pruned, {report['deleted_rows']} rows deleted "
+                    f"({report['busy_threads']} busy) in {report['duration_s']}s; "
+                    f"{report.get('stats', {}).get('size_mb', 0)} MB"
+                )
+            except Exception:
+                logger.exception("Checkpoint retention failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="checkpoint-retention")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prune, expire and vacuum the conversation checkpoint database.")
+    parser.add_argument("--db", default=MEMORY_DB_PATH, help="checkpoint database (default: MEMORY_DB_PATH)")
+    parser.add_argument("--keep", type=int, default=CHECKPOINT_KEEP_PER_THREAD, help="checkpoints kept per thread (0 = all)")
+    parser.add_argument("--ttl-days", type=float, default=CHECKPOINT_THREAD_TTL_DAYS, help="delete threads idle for longer (0 = never)")
+    parser.add_argument("--min-idle", type=float, default=CHECKPOINT_GC_MIN_IDLE, help="skip threads written to in the last N seconds")
+    parser.add_argument("--stats", action="store_true", help="only print the size and row counts")
+    parser.add_argument("--dry-run", action="store_true", help="count the threads that would be expired or pruned")
+    parser.add_argument(
+        "--enable-incremental-vacuum", action="store_true",
+        help="convert an existing database so freed space can be returned (one full VACUUM; stop the API first)",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s")
+
+    retention = CheckpointRetention(args.db, keep_per_thread=args.keep, ttl_days=args.ttl_days, min_idle=args.min_idle)
+    if args.stats or args.enable_incremental_vacuum:
+        if not os.path.exists(args.db):
+            parser.error(f"{args.db} does not exist")
+        db = retention.connect()
+        try:
+            if args.enable_incremental_vacuum and retention.enable_incremental_vacuum(db):
+                logger.info("Converted to auto_vacuum=INCREMENTAL")
+            print(json.dumps(retention.stats(db), indent=2))
+        finally:
+            db.close()
+    else:
+        print(json.dumps(retention.collect(dry_run=args.dry_run), indent=2))
@@ -0,0 +1,113 @@
+import os
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from langchain_core.messages import ToolMessage
+from langchain_core.tools import BaseTool
+from langgraph.prebuilt import ToolNode
+from langgraph.prebuilt.tool_node import ToolCallRequest
+
+from rag_engine.observability.metrics import TOOL_CALL_TIMEOUTS
+
+logger = logging.getLogger("nebula.tools")
+
+# --- CONFIGURATION ---
+# Tool calls from one model message run concurrently, at most this many at a time
+TOOL_MAX_CONCURRENCY = int(os.getenv("TOOL_MAX_CONCURRENCY", "4"))
+# Seconds a tool call may run (queueing for a slot not included)
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "20"))
+# Per-tool overrides, e.g. "search_policies=15,lookup_employee=5"
+TOOL_TIMEOUTS = os.getenv("TOOL_TIMEOUTS", "")
+
+TIMEOUT_MESSAGE = (
+    "The {tool} tool did not respond within {timeout:g} seconds. Answer from the other results, "
+    "or tell the user this information is temporarily unavailable."
+)
+
+Execute = Callable[[ToolCallRequest], Awaitable[Any]]
+
+
+def parse_timeouts(spec: str) -> Dict[str, float]:
+    """Parses "name=seconds,name=seconds"; malformed entries are skipped with a warning."""
+    timeouts = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, seconds = entry.partition("=")
+        try:
+            timeouts[name.strip()] = float(seconds)
+        except ValueError:
+            logger.warning(f"Ignoring malformed TOOL_TIMEOUTS entry: {entry!r}")
+    return timeouts
+
+
+class ToolCallLimiter:
+    """
+    awrap_tool_call for the agent's ToolNode. The agent sends each tool call
+    of a model message to the tool node as its own task, and all tasks of a
+    step run concurrently on the event loop (tools with an async
+    implementation don't block it; see offloaded_tool in tools.py).
+
+    Each step of each thread gets its own semaphore of `max_concurrency`
+    slots, so one model message with many calls can't flood the embedding
+    API or the worker threads. A call that runs longer than its timeout is abandoned and
+    answered with an error ToolMessage, so the model can still reply from
+    the other results; an offloaded call's worker thread runs on to
+    completion in the background.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = TOOL_MAX_CONCURRENCY,
+        timeout: float = TOOL_TIMEOUT,
+        timeouts: Optional[Dict[str, float]] = None,
+    ):
+        self.max_concurrency = max(max_concurrency, 1)
+        self.timeout = timeout
+        self.timeouts = parse_timeouts(TOOL_TIMEOUTS) if timeouts is None else timeouts
+        # Step key -> [semaphore, calls using it]; only touched on the event loop
+        self._steps: Dict[str, List[Any]] = {}
+
+    def timeout_for(self, tool: str) -> float:
+        return self.timeouts.get(tool, self.timeout)
+
+    @staticmethod
+    def _step_key(request: ToolCallRequest) -> str:
+        # A thread runs one step at a time; the namespace minus the task id
+        # tells a subgraph's steps from the parent's
+        config = getattr(request.runtime, "config", None) or {}
+        metadata = config.get("metadata", {})
+        parent_ns = metadata.get("langgraph_checkpoint_ns", "").rpartition("|")[0]
+        return f"{metadata.get('thread_id', '')}|{parent_ns}|{metadata.get('langgraph_step', '')}"
+
+    def _enter(self, key: str) -> asyncio.Semaphore:
+        step = self._steps.setdefault(key, [asyncio.Semaphore(self.max_concurrency), 0])
+        step[1] += 1
+        return step[0]
+
+    def _exit(self, key: str):
+        step = self._steps[key]
+        step[1] -= 1
+        if not step[1]:
+            del self._steps[key]
+
+    async def __call__(self, request: ToolCallRequest, execute: Execute) -> Any:
+        name = request.tool_call["name"]
+        timeout = self.timeout_for(name)
+        key = self._step_key(request)
+        semaphore = self._enter(key)
+        try:
+            async with semaphore:
+                return await asyncio.wait_for(execute(request), timeout)
+        except asyncio.TimeoutError:
+            TOOL_CALL_TIMEOUTS.labels(tool=name).inc()
+            logger.warning(f"Tool call {name} timed out after {timeout:g}s")
+            return ToolMessage(
+                content=TIMEOUT_MESSAGE.format(tool=name, timeout=timeout),
+                name=name, tool_call_id=request.tool_call["id"], status="error",
+            )
+        finally:
+            self._exit(key)
+
+
+def build_tool_node(tools: Sequence[BaseTool], limiter: Optional[ToolCallLimiter] = None) -> ToolNode:
+    return ToolNode(tools, awrap_tool_call=limiter or ToolCallLimiter())
@@ -1,15 +1,22 @@
 import json
 import os
-from typing import List, Dict, Any
+import asyncio
+import functools
+from typing import Any, Callable, Dict, List
 
 # LangChain Imports
-from langchain_core.tools import tool
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_chroma import Chroma
+from langchain_core.tools import BaseTool, StructuredTool
+
+from rag_engine.agents.directory import get_employee_directory, get_role_directory
+from rag_engine.retrieval.prefetch import prefetched_results
+from rag_engine.retrieval.retriever import get_retriever
 
 # --- CONFIGURATION ---
 DATA_PATH = os.getenv("DATA_PATH", "./data_seed")
-DB_PATH = os.getenv("DB_PATH", "./chroma_db")
+# Chunks returned per policy search (benchmarks/retrieval_bench.py reports recall at each k)
+POLICY_SEARCH_K = int(os.getenv("POLICY_SEARCH_K", "5"))
+# Candidates listed when a name matches several employees (the rest are only counted)
+MAX_AMBIGUOUS_MATCHES = 10
 
 # --- HELPER: Load JSON Data ---
 def _load_json(filename: str) -> List[Dict[str, Any]]:
@@ -20,19 +27,31 @@ def _load_json(filename: str) -> List[Dict[str, Any]]:
     except FileNotFoundError:
         return []
 
+# --- HELPER: Async Tools ---
+def offloaded_tool(func: Callable[..., str]) -> BaseTool:
+    """
+    Like @tool, plus an async implementation that runs the blocking body in a
+    worker thread (with the caller's context, so spans land in the request's
+    trace). The agent's tool node awaits it, so the calls of one step run
+    side by side.
+    """
+    @functools.wraps(func)
+    async def coroutine(*args, **kwargs):
+        return await asyncio.to_thread(func, *args, **kwargs)
+    return StructuredTool.from_function(func=func, coroutine=coroutine)
+
 # --- TOOL 1: Policy Retrieval (Unstructured) ---
-@tool
+@offloaded_tool
 def search_policies(query: str) -> str:
     """
     Useful for answering questions about company policies, benefits, security,
     remote work, holidays, or IT procedures.
     """
-    # Initialize connection
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
-    vector_store = Chroma(persist_directory=DB_PATH, embedding_function=embeddings)
-
-    # INCREASED k=5 to get more context
-    results = vector_store.similarity_search(query, k=5)
+    # The question's own search may have started with the request (see rag_engine/retrieval/prefetch.py)
+    results = prefetched_results(query)
+    if results is None:
+        # Shared, pre-warmed store; BM25 + vector results fused (see rag_engine/retrieval/retriever.py)
+        results = get_retriever().search(query, k=POLICY_SEARCH_K)
 
     if not results:
         return "No relevant policy documents found. Try searching for a broader term like 'stipend' or 'benefits'."
@@ -45,30 +64,14 @@ def search_policies(query: str) -> str:
     return formatted_results
 
 # --- TOOL 2: Employee Lookup (Structured) ---
-@tool
+@offloaded_tool
 def lookup_employee(name_or_id_or_role: str) -> str:
     """
     Useful for finding details about a specific employee, such as their email,
     title, location, or manager. Can search by Name, ID, or Job Title.
     """
-    employees = _load_json("org_chart.json")
-    query_parts = name_or_id_or_role.lower().split() # Split "Engineering Director" -> ["engineering", "director"]
-
-    matches = []
-    for emp in employees:
-        # 1. Exact ID match (Strongest signal)
-        if name_or_id_or_role.lower() == emp["employee_id"].lower():
-            matches.append(emp)
-            continue
-
-        # 2. Text Search (Check Name and Title)
-        # We count how many words from the query appear in the employee record
-        emp_text = f"{emp['name']} {emp['title']} {emp['role_id']}".lower()
-
-        # If all words in the query are found in the employee record, it's a match.
-        # e.g. "Engineering" AND "Director" are both in "Director of Engineering"
-        if all(part in emp_text for part in query_parts):
-            matches.append(emp)
+    # Indexed, mtime-reloaded org chart (see rag_engine/agents/directory.py)
+    matches = get_employee_directory().search(name_or_id_or_role)
 
     if not matches:
         return f"No employee found matching '{name_or_id_or_role}'. Try using just the first name or exact role title."
@@ -76,7 +79,7 @@ def lookup_employee(name_or_id_or_role: str) -> str:
     return json.dumps(matches, indent=2)
 
 # --- TOOL 3: Role Requirements (Structured) ---
-@tool
+@offloaded_tool
 def lookup_role_requirements(role_title_or_id: str) -> str:
     """
     Useful for finding the specific tools, permissions, and first-week goals
@@ -85,11 +88,78 @@ def lookup_role_requirements(role_title_or_id: str) -> str:
     Args:
         role_title_or_id: The job title (e.g., "Senior Backend Engineer") or Role ID.
     """
-    roles = _load_json("role_definitions.json")
-    query_str = role_title_or_id.lower()
-
-    for role in roles:
-        if query_str in role["role_id"].lower() or query_str in role["title"].lower():
-            return json.dumps(role, indent=2)
+    role = get_role_directory().find(role_title_or_id)
+    if role is not None:
+        return json.dumps(role, indent=2)
 
     return f"No role definition found for '{role_title_or_id}'."
+
+# --- TOOL 4: Org Hierarchy (Structured) ---
+ORG_RELATIONS = ("manager_chain", "skip_level", "direct_reports", "org_members", "is_in_org")
+
+def _summarize(emp: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: emp.get(k) for k in ("employee_id", "name", "title", "email", "location")}
+
+def _resolve_employee(name_or_id: str, argument: str = "employee"):
+    """Returns (employee, None) for a unique match or (None, error message)."""
+    if not name_or_id.strip():
+        # An empty search matches everyone; don't list the whole directory
+        return None, f"'{argument}' is empty. Pass an employee name or ID."
+    directory = get_employee_directory()
+    exact = directory.get(name_or_id)
+    if exact is not None:
+        return exact, None
+    matches = directory.search(name_or_id)
+    if len(matches) == 1:
+        return matches[0], None
+    if not matches:
+        return None, f"No employee found matching '{name_or_id}'."
+    names = ", ".join(f"{m['name']} ({m['employee_id']})" for m in matches[:MAX_AMBIGUOUS_MATCHES])
+    if len(matches) > MAX_AMBIGUOUS_MATCHES:
+        names += f" and {len(matches) - MAX_AMBIGUOUS_MATCHES} more"
+    return None, f"'{name_or_id}' matches several employees: {names}. Use an employee ID."
+
+@offloaded_tool
+def lookup_org_hierarchy(employee: str, relation: str = "manager_chain", other_employee: str = "") -> str:
+    """
+    Answers reporting-line questions in one step. Prefer this over repeated
+    lookup_employee calls for anything about managers or teams.
+
+    Args:
+        employee: Name, ID, or unique job title of the person the question is about.
+        relation: One of
+            "manager_chain"  - manager, skip-level, ... up to the CEO
+            "skip_level"     - the manager's manager
+            "direct_reports" - people reporting directly to the employee
+            "org_members"    - everyone in the employee's org (direct and indirect)
+            "is_in_org"      - whether `other_employee` is in the employee's org
+        other_employee: Only used with "is_in_org".
+    """
+    if relation not in ORG_RELATIONS:
+        return f"Unknown relation '{relation}'. Use one of: {', '.join(ORG_RELATIONS)}."
+
+    emp, error = _resolve_employee(employee)
+    if error:
+        return error
+
+    directory = get_employee_directory()
+    emp_id = emp["employee_id"]
+    result: Dict[str, Any] = {"employee": _summarize(emp), "relation": relation}
+
+    if relation == "manager_chain":
+        result["managers"] = [_summarize(directory.get(m)) for m in directory.manager_chain(emp_id)]
+    elif relation == "skip_level":
+        skip = directory.skip_level(emp_id)
+        result["skip_level"] = _summarize(directory.get(skip)) if skip else None
+    elif relation == "direct_reports":
+        result["direct_reports"] = [_summarize(directory.get(r)) for r in directory.direct_reports(emp_id)]
+    elif relation == "org_members":
+        result["org_members"] = [_summarize(directory.get(m)) for m in directory.org_members(emp_id)]
+    else:
+        other, error = _resolve_employee(other_employee, "other_employee")
+        if error:
+            return error
+        result["other_employee"] = _summarize(other)
+        result["is_in_org"] = directory.is_in_org(other["employee_id"], emp_id)
+
+    return json.dumps(result, indent=2)
@@ -2,30 +2,69 @@ import os
 import glob
 import json
 import hashlib
-from typing import List, Dict
+import logging
+import argparse
+from typing import List, Dict, Optional, Set, Tuple
 from dotenv import load_dotenv
 
 from langchain_community.document_loaders import TextLoader
 from langchain_text_splitters import MarkdownHeaderTextSplitter, RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_chroma import Chroma
 from langchain_core.documents import Document
 
+from rag_engine.ingestion.pipeline import IngestionPipeline, load_checkpoint
+from rag_engine.ingestion.watcher import PolicyWatcher
+from rag_engine.retrieval.embeddings import (
+    EMBEDDING_PROVIDER, EmbeddingProviderMismatch, check_index_provider, get_embeddings, is_remote,
+    provider_signature, read_index_info, write_index_info, write_index_provider,
+)
+from rag_engine.retrieval.lexical_index import LEXICAL_INDEX_PATH, LexicalIndex
+from rag_engine.retrieval.matrix_store import VECTOR_BACKEND, deferred_writes, open_vector_store, read_index_backend
+from rag_engine.retrieval.snapshots import SNAPSHOT_DIR, SNAPSHOT_MIN_INTERVAL, SnapshotPublisher, publish_snapshot
+
 load_dotenv()
 
 # --- CONFIGURATION ---
 DATA_PATH = os.getenv("DATA_PATH", "./data_seed") + "/policies"
 DB_PATH = os.getenv("DB_PATH", "./chroma_db")
-STATE_FILE = "ingestion_state.json"
+STATE_FILE = os.getenv("INGESTION_STATE_FILE", "ingestion_state.json")
+HASH_CACHE_FILE = os.getenv("INGESTION_HASH_CACHE_FILE", "ingestion_hash_cache.json")
+CHECKPOINT_FILE = os.getenv("INGESTION_CHECKPOINT_FILE", "ingestion_checkpoint.json")
+# Characters per chunk and shared between neighbours (benchmarks/retrieval_bench.py sweeps both)
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "100"))
 
 def calculate_file_hash(filepath: str) -> str:
-    """Creates a unique fingerprint (MD5) for a file's content."""
+    """Creates a unique fingerprint (MD5) for a file's content, reading it in blocks."""
     hasher = hashlib.md5()
     with open(filepath, 'rb') as f:
-        buf = f.read()
-        hasher.update(buf)
+        for block in iter(lambda: f.read(1 << 20), b""):
+            hasher.update(block)
     return hasher.hexdigest()
 
+def load_hash_cache() -> Dict[str, Dict]:
+    """Size/mtime of each file when it was last hashed."""
+    try:
+        with open(HASH_CACHE_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_hash_cache(cache: Dict[str, Dict]):
+    with open(HASH_CACHE_FILE, 'w') as f:
+        json.dump(cache, f)
+
+def cached_file_hash(filepath: str, cache: Dict[str, Dict]) -> str:
+    """Reuses the previous hash when size and mtime are unchanged; otherwise re-reads the file."""
+    st = os.stat(filepath)
+    filename = os.path.basename(filepath)
+    entry = cache.get(filename)
+    if entry and entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns:
+        return entry["hash"]
+    file_hash = calculate_file_hash(filepath)
+    cache[filename] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": file_hash}
+    return file_hash
+
 def load_state() -> Dict[str, str]:
     """Loads the registry of known files and their hashes."""
     if os.path.exists(STATE_FILE):
@@ -38,7 +77,10 @@ def save_state(state: Dict[str, str]):
     with open(STATE_FILE, 'w') as f:
         json.dump(state, f, indent=2)
 
-def process_document(file_path: str) -> List[Document]:
+def chunking_signature(chunk_size: int, chunk_overlap: int) -> str:
+    return f"{chunk_size}/{chunk_overlap}"
+
+def process_document(file_path: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> List[Document]:
     """Reads and splits a single document."""
     try:
         loader = TextLoader(file_path, encoding='utf-8')
@@ -57,8 +99,8 @@ def process_document(file_path: str) -> List[Document]:
 
         # 2. Split by Character (for large sections)
         text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=100,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
             separators=["\n\n", "\n", " ", ""]
         )
         final_splits = text_splitter.split_documents(md_header_splits)
@@ -67,74 +109,293 @@ def process_document(file_path: str) -> List[Document]:
         print(f"Error processing {file_path}: {e}")
         return []
 
-def ingest_data():
-    print("--- Starting Incremental Ingestion ---")
+def chunk_header_path(doc: Document) -> str:
+    """The markdown header trail a chunk sits under, e.g. 'Handbook > Benefits'."""
+    return " > ".join(doc.metadata[h] for h in ("Header 1", "Header 2", "Header 3") if doc.metadata.get(h))
+
+def assign_chunk_ids(filename: str, chunks: List[Document]) -> List[str]:
+    """
+    Gives each chunk a deterministic, content-addressed ID.
+
+    The ID hashes the file name, header path and chunk text, so an unchanged
+    chunk keeps its ID (and its stored vector) across re-ingests. Identical
+    chunks within one file get an occurrence suffix to stay unique.
+    """
+    ids = []
+    seen: Dict[str, int] = {}
+    for doc in chunks:
+        base = hashlib.sha256(
+            f"{filename}\x00{chunk_header_path(doc)}\x00{doc.page_content}".encode("utf-8")
+        ).hexdigest()[:32]
+        occurrence = seen.get(base, 0)
+        seen[base] = occurrence + 1
+        chunk_id = base if occurrence == 0 else f"{base}-{occurrence}"
+        doc.metadata["source_file"] = filename
+        doc.metadata["chunk_id"] = chunk_id
+        ids.append(chunk_id)
+    return ids
 
-    if not os.getenv("GOOGLE_API_KEY"):
+def parse_file(file_path: str) -> Tuple[str, List[Document]]:
+    """Process-pool worker: splits a file and assigns chunk IDs."""
+    filename = os.path.basename(file_path)
+    chunks = process_document(file_path, CHUNK_SIZE, CHUNK_OVERLAP)
+    assign_chunk_ids(filename, chunks)
+    return filename, chunks
+
+def existing_chunk_ids(vector_store: Chroma, filename: str) -> Set[str]:
+    """IDs currently stored for a file, looked up by file name rather than full path."""
+    return set(vector_store.get(where={"source_file": filename}, include=[])["ids"])
+
+def delete_legacy_chunks(vector_store: Chroma, filename: str, file_path: Optional[str] = None) -> int:
+    """Removes chunks written before chunk IDs existed (keyed only by the loader's full path)."""
+    candidates = {os.path.join(DATA_PATH, filename)}
+    if file_path:
+        candidates.update({file_path, os.path.abspath(file_path), os.path.normpath(file_path)})
+    legacy = vector_store.get(where={"source": {"$in": sorted(candidates)}}, include=["metadatas"])
+    stale = [i for i, meta in zip(legacy["ids"], legacy["metadatas"]) if not (meta or {}).get("chunk_id")]
+    if stale:
+        vector_store.delete(ids=stale)
+    return len(stale)
+
+def remove_file(vector_store: Chroma, filename: str, lexical_index: Optional[LexicalIndex] = None) -> int:
+    """Deletes every chunk of a file that no longer exists. Returns the count."""
+    existing = sorted(existing_chunk_ids(vector_store, filename))
+    if existing:
+        vector_store.delete(ids=existing)
+        if lexical_index is not None:
+            lexical_index.delete(existing)
+    return len(existing) + delete_legacy_chunks(vector_store, filename)
+
+def backfill_lexical_index(vector_store: Chroma, lexical_index: LexicalIndex, page_size: int = 1000) -> int:
+    """Copies ID-keyed chunks from the vector store into an empty lexical index."""
+    copied = 0
+    offset = 0
+    while True:
+        page = vector_store.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            return copied
+        rows = [
+            (meta["chunk_id"], Document(page_content=text, metadata=meta))
+            for text, meta in zip(page["documents"], page["metadatas"])
+            if meta and meta.get("chunk_id")
+        ]
+        lexical_index.upsert([r[0] for r in rows], [r[1] for r in rows])
+        copied += len(rows)
+        offset += page_size
+
+def open_index() -> Optional[Chroma]:
+    """Opens the configured vector store at DB_PATH; prints why and returns None if it can't be used."""
+    if is_remote() and not os.getenv("GOOGLE_API_KEY"):
         print("Error: GOOGLE_API_KEY not found in .env")
-        return
+        return None
+
+    # Refuse to mix vectors from different providers in one index
+    has_data = os.path.isdir(DB_PATH) and bool(os.listdir(DB_PATH))
+    try:
+        check_index_provider(DB_PATH, legacy_default=provider_signature("gemini") if has_data else None)
+    except EmbeddingProviderMismatch as e:
+        print(f"Error: {e}")
+        return None
+    return open_vector_store(DB_PATH, get_embeddings(EMBEDDING_PROVIDER), VECTOR_BACKEND)
+
+def ingest_data(
+    vector_store: Optional[Chroma] = None,
+    workers: Optional[int] = None,
+    lexical_index: Optional[LexicalIndex] = None,
+    only: Optional[Set[str]] = None,
+    publish: Optional[bool] = None,
+):
+    """
+    Syncs the index with DATA_PATH. `only` restricts the diff to those file
+    names (as reported by the watcher); other files keep their recorded state.
+    A snapshot is published when SNAPSHOT_DIR is set and `publish` is true
+    (by default, when the store was opened here).
+    """
+    print("--- Starting Incremental Ingestion ---")
+
+    # Switching VECTOR_BACKEND leaves the new store empty and changing CHUNK_SIZE/CHUNK_OVERLAP
+    # changes every chunk, so in both cases every file is re-synced
+    rebuild = False
+    record_backend = False
+    record_chunking = False
+    if publish is None:
+        publish = vector_store is None
+    if vector_store is None:
+        recorded_backend = read_index_backend(DB_PATH)
+        vector_store = open_index()
+        if vector_store is None:
+            return
+        rebuild = recorded_backend is not None and recorded_backend != VECTOR_BACKEND
+        record_backend = recorded_backend != VECTOR_BACKEND
+        if rebuild:
+            print(f"Vector backend changed ({recorded_backend} -> {VECTOR_BACKEND}): re-indexing all files")
+
+        chunking = chunking_signature(CHUNK_SIZE, CHUNK_OVERLAP)
+        recorded_chunking = read_index_info(DB_PATH).get("chunking")
+        if recorded_chunking is None and vector_store._collection.count() > 0:
+            # Indexes from before chunking was recorded used the original 1000/100 split
+            recorded_chunking = chunking_signature(1000, 100)
+        record_chunking = recorded_chunking != chunking
+        if recorded_chunking is not None and recorded_chunking != chunking:
+            print(f"Chunking changed ({recorded_chunking} -> {chunking}): re-chunking all files")
+            rebuild = True
 
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
-    vector_store = Chroma(persist_directory=DB_PATH, embedding_function=embeddings)
+        print(f"Embedding provider: {provider_signature()}, vector backend: {VECTOR_BACKEND}")
+        write_index_provider(DB_PATH)
+
+    # Keyword (BM25) index kept in step with the vector store, chunk ID for chunk ID
+    if lexical_index is None:
+        lexical_index = LexicalIndex(LEXICAL_INDEX_PATH)
+    if lexical_index.count() == 0 and vector_store._collection.count() > 0:
+        print(f"Backfilled lexical index with {backfill_lexical_index(vector_store, lexical_index)} chunks")
 
     # 1. Load the current registry (What we knew properly before)
     known_files = load_state()
-    current_files = glob.glob(f"{DATA_PATH}/*.md")
+    # Files finished by an interrupted run count as known at their checkpointed hash
+    # (after a backend switch the batch ID check skips whatever is already stored instead)
+    resumed = {} if rebuild else load_checkpoint(CHECKPOINT_FILE)
+    if resumed:
+        print(f"Resuming: {len(resumed)} files completed by a previous run")
+    current_files = sorted(glob.glob(f"{DATA_PATH}/*.md"))
+    if only is not None:
+        current_files = [p for p in current_files if os.path.basename(p) in only]
+    hash_cache = load_hash_cache()
 
     current_file_hashes = {}
-    docs_to_add = []
-    files_to_remove = []
+    files_to_sync = []
+    modified = set()
 
     print(f"Scanning {len(current_files)} files...")
 
-    # 2. Identify Changes (The "Diff" Logic)
+    # 2. Identify Changes (The "Diff" Logic; size/mtime fast-path skips re-reading)
     for file_path in current_files:
         filename = os.path.basename(file_path)
-        new_hash = calculate_file_hash(file_path)
+        new_hash = cached_file_hash(file_path, hash_cache)
         current_file_hashes[filename] = new_hash
 
+        if resumed.get(filename) == new_hash:
+            continue
         # Check if file is new or modified
-        if filename not in known_files:
+        if rebuild:
+            files_to_sync.append((file_path, new_hash))
+            modified.add(filename)
+        elif filename not in known_files:
             print(f"New File Detected: {filename}")
-            docs_to_add.extend(process_document(file_path))
+            files_to_sync.append((file_path, new_hash))
         elif known_files[filename] != new_hash:
-            print(f"Modified File: {filename} (Re-ingesting...)")
-            # Mark old version for deletion logic below
-            files_to_remove.append(filename)
-            docs_to_add.extend(process_document(file_path))
+            print(f"Modified File: {filename} (Diffing chunks...)")
+            files_to_sync.append((file_path, new_hash))
+            modified.add(filename)
         else:
             # Hash matches -> No change -> Skip
             pass
+    save_hash_cache({
+        k: v for k, v in hash_cache.items() if k in current_file_hashes or (only is not None and k not in only)
+    })
 
     # 3. Identify Deletions (Files that existed before but are gone now)
-    for filename in known_files:
-        if filename not in current_file_hashes:
-            print(f"Deleted File Detected: {filename}")
-            files_to_remove.append(filename)
-
-    # 4. EXECUTE DB UPDATES
+    files_to_remove = [f for f in known_files if f not in current_file_hashes and (only is None or f in only)]
+    for filename in files_to_remove:
+        print(f"Deleted File Detected: {filename}")
 
-    # A. Remove old/changed chunks first
-    if files_to_remove:
-        print(f"Removing {len(files_to_remove)} outdated documents from DB...")
-        # Chroma allows deleting by metadata "source"
+    # 4. EXECUTE DB UPDATES (chunk-level: only new chunk IDs are embedded)
+    # A matrix store writes its new generation at pipeline commits and once at the end
+    with deferred_writes(vector_store):
+        deleted = 0
         for filename in files_to_remove:
-            # We reconstruct the full path because TextLoader saves full path in metadata
-            full_path_guess = os.path.join(DATA_PATH, filename)
-            # Use specific Chroma collection delete method
-            vector_store._collection.delete(where={"source": full_path_guess})
-
-    # B. Add new chunks
-    if docs_to_add:
-        print(f"Upserting {len(docs_to_add)} new chunks...")
-        vector_store.add_documents(docs_to_add)
+            deleted += remove_file(vector_store, filename, lexical_index)
+
+        paths = {os.path.basename(p): p for p, _ in files_to_sync}
+
+        def drop_stale_chunks(filename: str, new_ids: List[str]) -> int:
+            stale: List[str] = []
+            # New files have no ID-keyed chunks yet (re-runs are caught by the batch ID check)
+            if filename in modified:
+                stale = sorted(existing_chunk_ids(vector_store, filename) - set(new_ids))
+                if stale:
+                    vector_store.delete(ids=stale)
+                    lexical_index.delete(stale)
+            return len(stale) + delete_legacy_chunks(vector_store, filename, paths[filename])
+
+        pipeline_kwargs = {"workers": workers} if workers is not None else {}
+        pipeline = IngestionPipeline(
+            vector_store,
+            parse_file,
+            checkpoint_path=CHECKPOINT_FILE,
+            on_file_parsed=drop_stale_chunks,
+            lexical_index=lexical_index,
+            **pipeline_kwargs,
+        )
+        stats = pipeline.run(files_to_sync)
+        stats.deleted += deleted
+
+    if stats.embedded or stats.deleted:
         print("Database Updated.")
     else:
         print("No content changes detected.")
+    print(f"Throughput: {stats.report()}")
 
-    # 5. Save new state
+    # 5. Save new state (untouched files keep their entries in a partial sync)
+    if only is not None:
+        current_file_hashes = {
+            **{k: v for k, v in known_files.items() if k not in only}, **current_file_hashes,
+        }
     save_state(current_file_hashes)
+    if record_backend:
+        # Recorded only once the store holds every file
+        write_index_info(DB_PATH, vector_backend=VECTOR_BACKEND)
+    if record_chunking:
+        write_index_info(DB_PATH, chunking=chunking)
+    if os.path.exists(CHECKPOINT_FILE):
+        os.remove(CHECKPOINT_FILE)
+
+    # 6. Publish an immutable snapshot for API replicas to load or hot-swap to
+    if SNAPSHOT_DIR and publish:
+        manifest = publish_snapshot(vector_store, lexical_index, current_file_hashes, DB_PATH, SNAPSHOT_DIR, VECTOR_BACKEND)
+        if manifest is None:
+            print("Snapshot already current.")
+        else:
+            print(f"Published snapshot {manifest['version']} ({manifest['chunk_count']} chunks)")
     print("--- Ingestion Complete ---")
+    return stats
+
+def watch(workers: Optional[int] = None):
+    """
+    Catches up with a full sync, then keeps running: each debounced batch of
+    touched files is diffed and pushed into the open store. Running APIs pick
+    the changes up from the state file, or from a snapshot published at most
+    once per SNAPSHOT_MIN_INTERVAL (each publish copies the whole store).
+    """
+    if ingest_data(workers=workers) is None:
+        return
+    vector_store = open_index()
+    lexical_index = LexicalIndex(LEXICAL_INDEX_PATH)
+    publisher = None
+    if SNAPSHOT_DIR:
+        publisher = SnapshotPublisher(
+            vector_store, lexical_index, DB_PATH, SNAPSHOT_DIR, VECTOR_BACKEND, min_interval=SNAPSHOT_MIN_INTERVAL,
+        )
+
+    def sync(touched: Set[str]):
+        ingest_data(vector_store, workers, lexical_index, only=touched, publish=False)
+        if publisher is not None:
+            publisher.request(load_state())
+
+    watcher = PolicyWatcher(DATA_PATH, sync, idle_fn=publisher.run_due if publisher is not None else None)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
+        if publisher is not None:
+            publisher.run_due(force=True)
+        print("Watcher stopped.")
 
 if __name__ == "__main__":
-    ingest_data()
+    parser = argparse.ArgumentParser(description="Incrementally ingest the policy documents.")
+    parser.add_argument("--watch", action="store_true", help="keep running and ingest changes as they happen")
+    args = parser.parse_args()
+    if args.watch:
+        logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s")
+        watch()
+    else:
+        ingest_data()
@@ -0,0 +1,279 @@
+import os
+import json
+import time
+import random
+from concurrent.futures import (
+    FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait,
+)
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+
+from rag_engine.retrieval.matrix_store import flush_writes
+
+# --- CONFIGURATION ---
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "20000"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+CHECKPOINT_FILE = os.getenv("INGESTION_CHECKPOINT_FILE", "ingestion_checkpoint.json")
+# Seconds between commits (vector store flushed, then checkpoint written) during a run
+INGEST_COMMIT_INTERVAL = float(os.getenv("INGEST_COMMIT_INTERVAL", "30"))
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Token estimate for batch sizing; falls back to ~4 chars/token if tiktoken can't load."""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4)
+
+
+def _is_rate_limit(exc: Exception) -> bool:
+    msg = f"{type(exc).__name__} {exc}".lower()
+    return any(marker in msg for marker in ("429", "rate limit", "ratelimit", "quota", "resourceexhausted", "resource_exhausted"))
+
+
+def load_checkpoint(path: str = CHECKPOINT_FILE) -> Dict[str, str]:
+    """Files (name -> hash) fully upserted by an interrupted run."""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_json_atomic(path: str, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+class PipelineStats:
+    def __init__(self):
+        self.files = 0
+        self.chunks = 0
+        self.embedded = 0
+        self.reused = 0
+        self.deleted = 0
+        self.batches = 0
+        self.retries = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+
+    def as_dict(self) -> Dict[str, float]:
+        elapsed = self.elapsed or 1e-9
+        return {
+            "files": self.files,
+            "chunks": self.chunks,
+            "embedded": self.embedded,
+            "reused": self.reused,
+            "deleted": self.deleted,
+            "batches": self.batches,
+            "retries": self.retries,
+            "elapsed_s": round(self.elapsed, 3),
+            "files_per_s": round(self.files / elapsed, 2),
+            "chunks_per_s": round(self.chunks / elapsed, 2),
+        }
+
+    def report(self) -> str:
+        d = self.as_dict()
+        return (
+            f"{d['files']} files, {d['chunks']} chunks ({d['embedded']} embedded, {d['reused']} reused, "
+            f"{d['deleted']} deleted) in {d['elapsed_s']}s -> {d['files_per_s']} files/s, {d['chunks_per_s']} chunks/s"
+        )
+
+
+class IngestionPipeline:
+    """
+    Streaming ingestion: parse -> batch -> embed -> upsert.
+
+    - Parsing/splitting runs in a process pool with a bounded number of files in flight.
+    - Chunks are grouped into batches bounded by count and by token estimate.
+    - Batches are embedded on a thread pool (network-bound) with retry and
+      exponential backoff on rate limits; at most `embed_concurrency` batches
+      are in flight, so memory stays bounded regardless of corpus size.
+    - Upserts happen on the calling thread, one call per batch; the optional
+      lexical index is updated with every batch as it is formed.
+    - Every `commit_interval` seconds, and at the end, the store is flushed
+      (a deferred matrix store writes its new generation) and the files whose
+      chunks are all stored are written to the checkpoint, so an interrupted
+      run resumes where it stopped.
+    """
+
+    def __init__(
+        self,
+        vector_store,
+        parse_fn: Callable[[str], Tuple[str, List[Document]]],
+        workers: int = INGEST_WORKERS,
+        batch_size: int = EMBED_BATCH_SIZE,
+        batch_tokens: int = EMBED_BATCH_TOKENS,
+        embed_concurrency: int = EMBED_CONCURRENCY,
+        max_retries: int = EMBED_MAX_RETRIES,
+        checkpoint_path: Optional[str] = CHECKPOINT_FILE,
+        on_file_parsed: Optional[Callable[[str, List[str]], int]] = None,
+        lexical_index=None,
+        commit_interval: float = INGEST_COMMIT_INTERVAL,
+    ):
+        self.vector_store = vector_store
+        self.parse_fn = parse_fn
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.batch_tokens = max(1, batch_tokens)
+        self.embed_concurrency = max(1, embed_concurrency)
+        self.max_retries = max_retries
+        self.checkpoint_path = checkpoint_path
+        # Called with (filename, new chunk IDs) before the file's chunks are
+        # queued; returns how many stale chunks it deleted.
+        self.on_file_parsed = on_file_parsed
+        self.lexical_index = lexical_index
+        self.commit_interval = commit_interval
+        self.stats = PipelineStats()
+
+        self._buffer: List[Document] = []
+        self._buffer_tokens = 0
+        self._remaining: Dict[str, int] = {}
+        self._hashes: Dict[str, str] = {}
+        self._completed: Dict[str, str] = {}
+        self._checkpoint_dirty = False
+        self._last_commit = time.monotonic()
+        self._embed_futures: Set[Future] = set()
+
+    # --- Stage 3: embedding ---
+    def _embed_batch(self, batch: List[Document]) -> Tuple[List[Document], List[List[float]], int]:
+        texts = [doc.page_content for doc in batch]
+        retries = 0
+        while True:
+            try:
+                return batch, self.vector_store.embeddings.embed_documents(texts), retries
+            except Exception as e:
+                if retries >= self.max_retries:
+                    raise
+                retries += 1
+                delay = min(60.0, (2 if _is_rate_limit(e) else 0.5) * (2 ** (retries - 1)))
+                time.sleep(delay * (0.5 + random.random()))
+
+    # --- Stage 4: upsert ---
+    def _store_batch(self, future: Future):
+        batch, vectors, retries = future.result()
+        self.stats.retries += retries
+        self.vector_store._collection.upsert(
+            ids=[doc.metadata["chunk_id"] for doc in batch],
+            embeddings=vectors,
+            metadatas=[doc.metadata for doc in batch],
+            documents=[doc.page_content for doc in batch],
+        )
+        self.stats.embedded += len(batch)
+        self.stats.batches += 1
+        self._chunks_done([doc.metadata["source_file"] for doc in batch])
+        if time.monotonic() - self._last_commit >= self.commit_interval:
+            self._commit()
+
+    def _chunks_done(self, filenames: List[str]):
+        changed = False
+        for filename in filenames:
+            self._remaining[filename] -= 1
+            if self._remaining[filename] == 0:
+                self._completed[filename] = self._hashes[filename]
+                changed = True
+        self._checkpoint_dirty |= changed
+
+    def _commit(self):
+        """Makes the stored batches durable, then records the files they completed."""
+        flush_writes(self.vector_store)
+        if self._checkpoint_dirty and self.checkpoint_path:
+            _write_json_atomic(self.checkpoint_path, self._completed)
+        self._checkpoint_dirty = False
+        self._last_commit = time.monotonic()
+
+    def _drain(self, embed_pool: Executor, limit: int):
+        """Stores finished batches until fewer than `limit` are in flight."""
+        while len(self._embed_futures) >= max(1, limit):
+            done, self._embed_futures = wait(self._embed_futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                self._store_batch(future)
+
+    def _flush(self, embed_pool: Executor):
+        if not self._buffer:
+            return
+        batch, self._buffer, self._buffer_tokens = self._buffer, [], 0
+
+        # The keyword index needs no embeddings, so it is written straight away
+        if self.lexical_index is not None:
+            self.lexical_index.upsert([d.metadata["chunk_id"] for d in batch], batch)
+
+        # Skip chunks already stored (e.g. by an interrupted earlier run)
+        present = set(self.vector_store._collection.get(ids=[d.metadata["chunk_id"] for d in batch], include=[])["ids"])
+        if present:
+            self.stats.reused += len(present)
+            self._chunks_done([d.metadata["source_file"] for d in batch if d.metadata["chunk_id"] in present])
+            batch = [d for d in batch if d.metadata["chunk_id"] not in present]
+        if not batch:
+            return
+
+        self._drain(embed_pool, self.embed_concurrency)
+        self._embed_futures.add(embed_pool.submit(self._embed_batch, batch))
+
+    # --- Stage 2: batching ---
+    def _queue_file(self, filename: str, chunks: List[Document], embed_pool: Executor):
+        self.stats.files += 1
+        self.stats.chunks += len(chunks)
+        if self.on_file_parsed is not None:
+            self.stats.deleted += self.on_file_parsed(filename, [d.metadata["chunk_id"] for d in chunks])
+
+        self._remaining[filename] = len(chunks) + 1
+        for doc in chunks:
+            tokens = count_tokens(doc.page_content)
+            if self._buffer and (
+                len(self._buffer) >= self.batch_size or self._buffer_tokens + tokens > self.batch_tokens
+            ):
+                self._flush(embed_pool)
+            self._buffer.append(doc)
+            self._buffer_tokens += tokens
+        # The extra count keeps the file open until all its chunks were queued
+        self._chunks_done([filename])
+
+    # --- Stage 1: parsing ---
+    def run(self, files: List[Tuple[str, str]]) -> PipelineStats:
+        """Ingests (file_path, content_hash) pairs. Returns throughput stats."""
+        self.stats = PipelineStats()
+        for file_path, file_hash in files:
+            self._hashes[os.path.basename(file_path)] = file_hash
+
+        use_processes = self.workers > 1 and len(files) > 1
+        parse_pool: Executor = ProcessPoolExecutor(self.workers) if use_processes else ThreadPoolExecutor(1)
+        embed_pool = ThreadPoolExecutor(self.embed_concurrency)
+        try:
+            in_flight: Set[Future] = set()
+            pending = list(files)
+            pending.reverse()
+            while pending or in_flight:
+                while pending and len(in_flight) < self.workers * 2:
+                    in_flight.add(parse_pool.submit(self.parse_fn, pending.pop()[0]))
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    filename, chunks = future.result()
+                    self._queue_file(filename, chunks, embed_pool)
+            self._flush(embed_pool)
+            self._drain(embed_pool, 1)
+        finally:
+            parse_pool.shutdown(wait=True, cancel_futures=True)
+            embed_pool.shutdown(wait=True, cancel_futures=True)
+            # Also after a failure, so a re-run skips what was stored
+            self._commit()
+
+        self.stats.finish()
+        return self.stats
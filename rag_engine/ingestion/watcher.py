@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import logging
+import threading
+from typing import Callable, Dict, Optional, Set
+
+from watchdog.events import FileSystemEvent, FileSystemEventHandler
+from watchdog.observers import Observer
+from watchdog.observers.polling import PollingObserver
+
+logger = logging.getLogger("nebula.watcher")
+
+# --- CONFIGURATION ---
+# "auto" uses inotify and falls back to polling; "poll" forces polling (e.g. on network or bind mounts)
+WATCH_MODE = os.getenv("WATCH_MODE", "auto")
+WATCH_POLL_INTERVAL = float(os.getenv("WATCH_POLL_INTERVAL", "1.0"))
+# Quiet period after the last event before a burst of edits is synced
+WATCH_DEBOUNCE = float(os.getenv("WATCH_DEBOUNCE", "0.5"))
+# Upper bound on how long a continuous stream of edits can postpone a sync
+WATCH_MAX_DELAY = float(os.getenv("WATCH_MAX_DELAY", "10"))
+WATCH_STATS_FILE = os.getenv("WATCH_STATS_FILE", "ingestion_watch_stats.json")
+
+# Reads (opened / closed_no_write) must not count, or ingesting a file would re-trigger it
+_CHANGE_EVENTS = {"created", "modified", "moved", "deleted", "closed"}
+
+
+class WatchStats:
+    def __init__(self, mode: str = ""):
+        self.mode = mode
+        self.events = 0
+        self.batches = 0
+        self.files_synced = 0
+        self.errors = 0
+        self.queue_depth = 0
+        self.last_lag_s: Optional[float] = None
+        self.max_lag_s = 0.0
+        self.last_sync_at: Optional[float] = None
+
+    def as_dict(self) -> Dict:
+        return {
+            "mode": self.mode,
+            "events": self.events,
+            "batches": self.batches,
+            "files_synced": self.files_synced,
+            "errors": self.errors,
+            "queue_depth": self.queue_depth,
+            "last_lag_s": self.last_lag_s,
+            "max_lag_s": self.max_lag_s,
+            "last_sync_at": self.last_sync_at,
+        }
+
+
+def read_watch_stats(path: str = WATCH_STATS_FILE) -> Optional[Dict]:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class _PolicyEventHandler(FileSystemEventHandler):
+    def __init__(self, watcher: "PolicyWatcher"):
+        self.watcher = watcher
+
+    def on_any_event(self, event: FileSystemEvent):
+        if event.is_directory or event.event_type not in _CHANGE_EVENTS:
+            return
+        for path in (event.src_path, getattr(event, "dest_path", "")):
+            if path:
+                self.watcher.handle_path(os.fsdecode(path))
+
+
+class PolicyWatcher:
+    """
+    Watches the policy folder and hands touched file names to `sync_fn` in
+    debounced batches.
+
+    Events only record which files changed and when the first change was seen;
+    the sync runs on the calling thread once the folder has been quiet for
+    `debounce` seconds (or the oldest change is `max_delay` old), so a burst of
+    saves becomes one incremental ingest. Lag is measured from the first event
+    of a batch to the end of its sync. A failed sync is re-queued.
+
+    `idle_fn`, if given, runs on the same thread between batches for deferred
+    work (e.g. a coalesced snapshot publish) and returns the seconds until it
+    wants to run again, or None when it has nothing waiting.
+    """
+
+    def __init__(
+        self,
+        data_path: str,
+        sync_fn: Callable[[Set[str]], object],
+        debounce: float = WATCH_DEBOUNCE,
+        max_delay: float = WATCH_MAX_DELAY,
+        mode: str = WATCH_MODE,
+        poll_interval: float = WATCH_POLL_INTERVAL,
+        stats_path: Optional[str] = WATCH_STATS_FILE,
+        idle_fn: Optional[Callable[[], Optional[float]]] = None,
+    ):
+        self.data_path = os.path.abspath(data_path)
+        self.sync_fn = sync_fn
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.stats_path = stats_path
+        self.idle_fn = idle_fn
+        self.stats = WatchStats()
+        self._pending: Dict[str, float] = {}
+        self._last_event = 0.0
+        self._cond = threading.Condition()
+        self._stopped = threading.Event()
+        self._observer = None
+
+    def handle_path(self, path: str):
+        if path.endswith(".md") and os.path.dirname(os.path.abspath(path)) == self.data_path:
+            self.touch(os.path.basename(path))
+
+    def touch(self, filename: str):
+        with self._cond:
+            now = time.monotonic()
+            self._pending.setdefault(filename, now)
+            self._last_event = now
+            self.stats.events += 1
+            self.stats.queue_depth = len(self._pending)
+            self._cond.notify()
+
+    def _next_batch(self, idle_timeout: Optional[float] = None) -> Optional[Dict[str, float]]:
+        """The next due batch; {} once `idle_timeout` seconds pass first; None after stop()."""
+        deadline = None if idle_timeout is None else time.monotonic() + idle_timeout
+        with self._cond:
+            while not self._stopped.is_set():
+                now = time.monotonic()
+                if deadline is not None and now >= deadline:
+                    return {}
+                if not self._pending:
+                    self._cond.wait(None if deadline is None else deadline - now)
+                    continue
+                quiet_for = self.debounce - (now - self._last_event)
+                overdue_in = self.max_delay - (now - min(self._pending.values()))
+                wait = min(quiet_for, overdue_in)
+                if wait <= 0:
+                    batch, self._pending = self._pending, {}
+                    return batch
+                self._cond.wait(wait if deadline is None else min(wait, deadline - now))
+            return None
+
+    def sync(self, batch: Dict[str, float]):
+        """Runs one incremental sync for a batch of {filename: first event time}."""
+        try:
+            self.sync_fn(set(batch))
+        except Exception:
+            logger.exception(f"Sync failed for {sorted(batch)}; re-queued")
+            with self._cond:
+                self.stats.errors += 1
+                for filename, first_seen in batch.items():
+                    self._pending[filename] = min(first_seen, self._pending.get(filename, first_seen))
+                self._last_event = time.monotonic()
+                self.stats.queue_depth = len(self._pending)
+        else:
+            lag = time.monotonic() - min(batch.values())
+            with self._cond:
+                self.stats.batches += 1
+                self.stats.files_synced += len(batch)
+                self.stats.last_lag_s = round(lag, 3)
+                self.stats.max_lag_s = round(max(self.stats.max_lag_s, lag), 3)
+                self.stats.last_sync_at = time.time()
+                self.stats.queue_depth = len(self._pending)
+            logger.info(f"Synced {len(batch)} file(s) in {lag:.2f}s of lag: {', '.join(sorted(batch))}")
+        self.write_stats()
+
+    def write_stats(self):
+        if not self.stats_path:
+            return
+        tmp = f"{self.stats_path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.stats.as_dict(), f, indent=2)
+        os.replace(tmp, self.stats_path)
+
+    def start(self):
+        """Starts the filesystem observer: inotify where available, polling otherwise."""
+        handler = _PolicyEventHandler(self)
+        if self.mode != "poll":
+            try:
+                observer = Observer()
+                observer.schedule(handler, self.data_path, recursive=False)
+                observer.start()
+                self._observer = observer
+                self.stats.mode = type(observer).__name__.replace("Observer", "").lower() or "native"
+                return
+            except OSError:
+                logger.warning("Native file watching unavailable; falling back to polling", exc_info=True)
+        observer = PollingObserver(timeout=self.poll_interval)
+        observer.schedule(handler, self.data_path, recursive=False)
+        observer.start()
+        self._observer, self.stats.mode = observer, "polling"
+
+    def run(self):
+        """Blocks, syncing batches as they become due, until stop() is called."""
+        self.start()
+        self.write_stats()
+        logger.info(f"Watching {self.data_path} ({self.stats.mode})")
+        try:
+            while True:
+                batch = self._next_batch(self.idle_fn() if self.idle_fn is not None else None)
+                if batch is None:
+                    return
+                if batch:
+                    self.sync(batch)
+        finally:
+            self._observer.stop()
+            self._observer.join()
+
+    def stop(self):
+        with self._cond:
+            self._stopped.set()
+            self._cond.notify_all()
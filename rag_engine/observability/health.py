@@ -0,0 +1,160 @@
+import os
+import time
+import asyncio
+import logging
+import sqlite3
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import httpx
+
+logger = logging.getLogger("nebula.health")
+
+# --- CONFIGURATION ---
+HEALTH_REFRESH_INTERVAL = float(os.getenv("HEALTH_REFRESH_INTERVAL", "15"))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "5"))
+# Checks that gate /readyz; the others (by default the LLM) are reported only,
+# so a provider outage doesn't pull every replica out of rotation at once
+HEALTH_REQUIRED_CHECKS = [
+    name.strip() for name in os.getenv("HEALTH_REQUIRED_CHECKS", "vector_db,data_files,checkpoint_db").split(",")
+    if name.strip()
+]
+# Skip the LLM check (e.g. offline deployments); it makes no generation call either way
+HEALTH_LLM_CHECK = os.getenv("HEALTH_LLM_CHECK", "true").lower() in ("1", "true", "yes")
+
+Check = Callable[[], Dict[str, Any]]
+
+
+class HealthMonitor:
+    """
+    Runs dependency checks in the background and caches their results, so
+    probes only read a dict.
+
+    A check is a blocking callable returning details (a "status" key of
+    "warning" or "error" overrides the default "ok"); raising or exceeding
+    `timeout` marks it as an error. Each check runs in a worker thread.
+    A required check that is failing, or whose result is older than three
+    refresh intervals (the refresher is stuck), makes the service not ready.
+    """
+
+    def __init__(
+        self,
+        checks: Dict[str, Check],
+        interval: float = HEALTH_REFRESH_INTERVAL,
+        timeout: float = HEALTH_CHECK_TIMEOUT,
+        required: Optional[Iterable[str]] = None,
+    ):
+        self.checks = checks
+        self.interval = interval
+        self.timeout = timeout
+        self.required = set(HEALTH_REQUIRED_CHECKS if required is None else required) & set(checks)
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run_check(self, name: str, check: Check) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            result = {"status": "ok", **(await asyncio.wait_for(asyncio.to_thread(check), self.timeout))}
+        except asyncio.TimeoutError:
+            result = {"status": "error", "detail": f"timed out after {self.timeout:g}s"}
+        except Exception as e:
+            result = {"status": "error", "detail": str(e) or type(e).__name__}
+        if result["status"] == "error" and self.results.get(name, {}).get("status") != "error":
+            logger.warning(f"Health check {name} failing: {result.get('detail')}")
+        result["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        result["checked_at"] = time.time()
+        return result
+
+    async def refresh(self):
+        """Runs every check concurrently and replaces the cached results."""
+        names = list(self.checks)
+        results = await asyncio.gather(*(self._run_check(name, self.checks[name]) for name in names))
+        # One assignment per check: readers see either the old or the new result
+        for name, result in zip(names, results):
+            self.results[name] = result
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Health refresh failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="health-monitor")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        The cached results with each check's age in seconds and overall
+        readiness: "starting" until every required check has run once.
+        """
+        now = time.time()
+        stale_after = 3 * self.interval
+        checks, ready, starting = {}, True, False
+        for name in self.checks:
+            result = self.results.get(name)
+            if result is None:
+                checks[name] = {"status": "pending", "required": name in self.required}
+                starting = starting or name in self.required
+                continue
+            age = now - result["checked_at"]
+            entry = {**result, "age_s": round(age, 1), "required": name in self.required}
+            if age > stale_after:
+                entry["stale"] = True
+            checks[name] = entry
+            if name in self.required and (result["status"] == "error" or age > stale_after):
+                ready = False
+        status = "starting" if starting else ("ready" if ready else "not_ready")
+        return {"status": status, "checks": checks}
+
+
+# --- Checks ---
+
+def data_files_check(data_path: str, filenames: Iterable[str]) -> Check:
+    def check():
+        missing = [name for name in filenames if not os.path.exists(os.path.join(data_path, "structured", name))]
+        if missing:
+            return {"status": "error", "detail": f"missing: {', '.join(missing)}"}
+        return {"files": len(list(filenames))}
+    return check
+
+
+def sqlite_check(path: str) -> Check:
+    """Opens the database read-only on a separate connection, so the check never waits on the app's lock."""
+    def check():
+        if not os.path.exists(path):
+            return {"status": "warning", "detail": "not created yet"}
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=1)
+        try:
+            tables = conn.execute("SELECT count(*) FROM sqlite_master WHERE type = 'table'").fetchone()[0]
+        finally:
+            conn.close()
+        return {"tables": tables, "size_mb": round(os.path.getsize(path) / 1e6, 2)}
+    return check
+
+
+def gemini_check(model: str, api_key: Optional[str], timeout: float = HEALTH_CHECK_TIMEOUT) -> Check:
+    """
+    Fetches the model's metadata from the Gemini API: proves the endpoint is
+    reachable and the key is accepted without spending tokens.
+    """
+    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}"
+
+    def check():
+        if not api_key:
+            return {"status": "error", "detail": "GOOGLE_API_KEY is not set"}
+        response = httpx.get(url, headers={"x-goog-api-key": api_key}, timeout=timeout)
+        if response.status_code != 200:
+            return {"status": "error", "detail": f"HTTP {response.status_code}", "model": model}
+        return {"model": model}
+    return check
@@ -0,0 +1,194 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+
+# --- CONFIGURATION ---
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Local stages (embedding, vector/BM25 search, SQLite) are millisecond-scale; requests and LLM calls are seconds
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "nebula_http_request_duration_seconds", "HTTP request latency until the last body byte is sent.",
+    ["method", "route", "status"], buckets=SLOW_BUCKETS,
+)
+HTTP_IN_FLIGHT = Gauge("nebula_http_requests_in_flight", "HTTP requests currently being served.")
+AGENT_RUNS_IN_FLIGHT = Gauge("nebula_agent_runs_in_flight", "Agent runs holding a chat slot.")
+
+LLM_CALL_SECONDS = Histogram(
+    "nebula_llm_call_duration_seconds", "Latency of one chat model call.", ["model", "status"], buckets=SLOW_BUCKETS,
+)
+LLM_CALLS_PER_REQUEST = Histogram(
+    "nebula_llm_calls_per_request", "Chat model calls made to answer one question.", buckets=(1, 2, 3, 4, 5, 6, 8, 10, 15),
+)
+LLM_TOKENS = Counter("nebula_llm_tokens_total", "Tokens reported by the chat model.", ["model", "type"])
+
+TOOL_CALL_SECONDS = Histogram(
+    "nebula_tool_call_duration_seconds", "Latency of one agent tool call.", ["tool", "status"], buckets=FAST_BUCKETS + (5.0, 10.0),
+)
+TOOL_CALL_TIMEOUTS = Counter("nebula_tool_call_timeouts_total", "Tool calls abandoned after their timeout.", ["tool"])
+EMBEDDING_SECONDS = Histogram(
+    "nebula_embedding_duration_seconds", "Query embedding latency (cache lookups included).", ["provider"], buckets=FAST_BUCKETS,
+)
+VECTOR_SEARCH_SECONDS = Histogram(
+    "nebula_vector_search_duration_seconds", "Vector store search latency, excluding the query embedding.", ["backend"],
+    buckets=FAST_BUCKETS,
+)
+LEXICAL_SEARCH_SECONDS = Histogram(
+    "nebula_lexical_search_duration_seconds", "BM25 keyword search latency.", buckets=FAST_BUCKETS,
+)
+PREFETCH_REQUESTS = Counter(
+    "nebula_prefetch_requests_total",
+    "Chat requests with a speculative policy search, by outcome (hit, miss, unused, error, cancelled).", ["outcome"],
+)
+PREFETCH_SAVED_SECONDS = Histogram(
+    "nebula_prefetch_saved_seconds", "Search time saved by serving a prefetched policy search.", buckets=FAST_BUCKETS,
+)
+CHECKPOINT_SECONDS = Histogram(
+    "nebula_checkpoint_duration_seconds", "Conversation checkpoint read/write latency.", ["operation"], buckets=FAST_BUCKETS,
+)
+CHECKPOINT_COMMIT_BATCH = Histogram(
+    "nebula_checkpoint_commit_batch_size", "Checkpoint writes made durable by one group commit.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+CHECKPOINT_DB_BYTES = Gauge("nebula_checkpoint_db_bytes", "Checkpoint database size, WAL included, at the last retention pass.")
+CHECKPOINT_DB_ROWS = Gauge(
+    "nebula_checkpoint_db_rows", "Checkpoint database rows at the last retention pass.", ["table"],
+)
+
+
+@contextmanager
+def observe(histogram: Histogram, **labels: str):
+    """Times the block into `histogram` (with `labels`), whether or not it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        (histogram.labels(**labels) if labels else histogram).observe(time.perf_counter() - start)
+
+
+def render_metrics():
+    """The default registry in Prometheus text format: (body, content type)."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request latency per route template (so path
+    parameters don't explode cardinality) and the in-flight gauge. The app
+    call returns only after a streamed body has been fully sent, so SSE
+    requests are timed end to end.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.labels(method=scope["method"], route=route, status=str(status)).observe(
+                time.perf_counter() - start
+            )
+
+
+def _model_name(serialized: Optional[Dict[str, Any]], kwargs: Dict[str, Any]) -> str:
+    params = kwargs.get("invocation_params") or {}
+    name = params.get("model") or params.get("model_name") or (serialized or {}).get("name")
+    return str(name or "unknown").removeprefix("models/")
+
+
+class AgentMetricsCallback(BaseCallbackHandler):
+    """
+    Per-request LangChain callback that feeds the LLM and tool metrics.
+
+    One instance is attached to each agent run through the run config; it
+    counts that run's model calls so finish() can record calls per request.
+    Tool callbacks may arrive from worker threads, hence the lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started: Dict[Any, tuple] = {}
+        self.llm_calls = 0
+
+    def _start(self, run_id, name: str):
+        with self._lock:
+            self._started[run_id] = (name, time.perf_counter())
+
+    def _stop(self, run_id):
+        with self._lock:
+            name, started = self._started.pop(run_id, (None, None))
+        return name, (time.perf_counter() - started) if started is not None else None
+
+    # --- LLM ---
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id, _model_name(serialized, kwargs))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, _model_name(serialized, kwargs))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        model, elapsed = self._stop(run_id)
+        if model is None:
+            return
+        with self._lock:
+            self.llm_calls += 1
+        LLM_CALL_SECONDS.labels(model=model, status="ok").observe(elapsed)
+        usage = {}
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or usage
+        if not usage:
+            usage = (response.llm_output or {}).get("usage_metadata") or {}
+        if usage.get("input_tokens"):
+            LLM_TOKENS.labels(model=model, type="prompt").inc(usage["input_tokens"])
+        if usage.get("output_tokens"):
+            LLM_TOKENS.labels(model=model, type="completion").inc(usage["output_tokens"])
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        model, elapsed = self._stop(run_id)
+        if model is not None:
+            with self._lock:
+                self.llm_calls += 1
+            LLM_CALL_SECONDS.labels(model=model, status="error").observe(elapsed)
+
+    # --- Tools ---
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, (serialized or {}).get("name") or kwargs.get("name") or "unknown")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        tool, elapsed = self._stop(run_id)
+        if tool is not None:
+            TOOL_CALL_SECONDS.labels(tool=tool, status="ok").observe(elapsed)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        tool, elapsed = self._stop(run_id)
+        if tool is not None:
+            TOOL_CALL_SECONDS.labels(tool=tool, status="error").observe(elapsed)
+
+    def finish(self):
+        """Records how many model calls the run made (runs answered from cache make none)."""
+        if self.llm_calls:
+            LLM_CALLS_PER_REQUEST.observe(self.llm_calls)
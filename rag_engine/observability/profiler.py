@@ -0,0 +1,171 @@
+import os
+import sys
+import time
+import uuid
+import cProfile
+import logging
+import threading
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, Optional
+
+logger = logging.getLogger("nebula.profiler")
+
+# --- CONFIGURATION ---
+# Off by default; when on, only requests sending "X-Profile: 1" are profiled
+PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_MAX_PER_MINUTE = int(os.getenv("PROFILE_MAX_PER_MINUTE", "6"))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+
+# Leaf frames of threads that are blocked rather than burning CPU
+_IDLE_LEAVES = {
+    ("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"), ("selectors.py", "select"),
+    ("queue.py", "get"), ("thread.py", "_worker"),
+}
+
+
+class RateLimiter:
+    """At most `per_minute` profiles in any 60 s window, and one at a time."""
+
+    def __init__(self, per_minute: int = PROFILE_MAX_PER_MINUTE):
+        self.per_minute = per_minute
+        self._lock = threading.Lock()
+        self._started: Deque[float] = deque()
+        self._active = False
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            while self._started and now - self._started[0] >= 60:
+                self._started.popleft()
+            if self._active or len(self._started) >= self.per_minute:
+                return False
+            self._started.append(now)
+            self._active = True
+            return True
+
+    def release(self):
+        with self._lock:
+            self._active = False
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}"
+
+
+class StackSampler:
+    """
+    Samples every thread's Python stack each `interval` seconds from a
+    background thread and folds them into collapsed-stack counts
+    ("thread;outer;...;leaf count" lines, the input of flamegraph tools).
+    Threads parked in a wait are skipped so CPU work stands out.
+    """
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sample(self):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join([names.get(ident, str(ident))] + labels[::-1])] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfile:
+    """
+    Profiles one request with both a deterministic and a sampling profiler.
+
+    cProfile sees the event-loop thread, so the .pstats file also contains
+    whatever other requests ran on the loop meanwhile; the sampler covers
+    every thread (tool and search workers included) and writes .folded
+    collapsed stacks for flamegraphs.
+    """
+
+    def __init__(self, name: str, directory: str = PROFILE_DIR, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.profile_id = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{name}-{uuid.uuid4().hex[:8]}"
+        self.directory = directory
+        self.sampler = StackSampler(interval)
+        self._profile: Optional[cProfile.Profile] = cProfile.Profile()
+        self.paths: Dict[str, str] = {}
+
+    def start(self):
+        try:
+            self._profile.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) owns the hook; keep the sampler only
+            logger.warning("cProfile unavailable; collecting stack samples only")
+            self._profile = None
+        self.sampler.start()
+
+    def stop(self) -> Dict[str, str]:
+        self.sampler.stop()
+        if self._profile is not None:
+            self._profile.disable()
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, self.profile_id)
+        if self._profile is not None:
+            self._profile.dump_stats(f"{base}.pstats")
+            self.paths["pstats"] = f"{base}.pstats"
+        with open(f"{base}.folded", 'w') as f:
+            f.write(self.sampler.collapsed())
+        self.paths["folded"] = f"{base}.folded"
+        return self.paths
+
+
+_limiter = RateLimiter()
+
+
+@contextmanager
+def profile_request(name: str, directory: Optional[str] = None) -> Iterator[Optional[RequestProfile]]:
+    """
+    Profiles the block if the rate limit allows; yields None (and profiles
+    nothing) otherwise. Artifacts are written to `directory` (PROFILE_DIR)
+    when the block exits.
+    """
+    if not _limiter.try_acquire():
+        yield None
+        return
+    profile = RequestProfile(name, directory or PROFILE_DIR)
+    try:
+        profile.start()
+        yield profile
+    finally:
+        try:
+            paths = profile.stop()
+            logger.info(f"Profile {profile.profile_id} written ({profile.sampler.samples} samples): {paths}")
+        except OSError:
+            logger.warning(f"Could not write profile {profile.profile_id}", exc_info=True)
+        finally:
+            _limiter.release()
@@ -0,0 +1,207 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger("nebula.tracing")
+
+# --- CONFIGURATION ---
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Append every finished request's spans here as JSON lines (empty = don't export)
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")
+
+_current_trace: ContextVar[Optional["RequestTrace"]] = ContextVar("nebula_trace", default=None)
+# One writer thread keeps exports in order and the file append off the event loop
+_exporter = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trace-export")
+
+
+class RequestTrace:
+    """
+    Timing spans of one chat request, relative to when it arrived.
+
+    Spans may overlap: an agent step contains its LLM call, and hybrid search
+    runs vector and BM25 search side by side. Spans are added from the event
+    loop and from worker threads, hence the lock.
+    """
+
+    def __init__(self, name: str, **attrs: Any):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.attrs = attrs
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._end: Optional[float] = None
+        self._lock = threading.Lock()
+        self.spans: List[Dict[str, Any]] = []
+
+    def add(self, name: str, start: float, end: float, **attrs: Any):
+        """Records a span from perf_counter() readings."""
+        span = {
+            "name": name,
+            "start_ms": round((start - self._start) * 1000, 3),
+            "duration_ms": round((end - start) * 1000, 3),
+        }
+        if attrs:
+            span["attrs"] = attrs
+        with self._lock:
+            self.spans.append(span)
+
+    def finish(self):
+        if self._end is None:
+            self._end = time.perf_counter()
+
+    @property
+    def total_ms(self) -> float:
+        return round(((self._end or time.perf_counter()) - self._start) * 1000, 3)
+
+    def summary(self) -> Dict[str, Any]:
+        """Total time and, per span name, the call count and summed duration (ms)."""
+        stages: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            stage = stages.setdefault(span["name"], {"count": 0, "ms": 0.0})
+            stage["count"] += 1
+            stage["ms"] = round(stage["ms"] + span["duration_ms"], 3)
+        return {"trace_id": self.trace_id, "total_ms": self.total_ms, "stages": stages}
+
+    def server_timing(self) -> str:
+        """The summary as a Server-Timing header value."""
+        summary = self.summary()
+        entries = [f"total;dur={summary['total_ms']:.1f}"]
+        for name, stage in sorted(summary["stages"].items(), key=lambda item: -item[1]["ms"]):
+            entries.append(f'{name};dur={stage["ms"]:.1f};desc="{stage["count"]}x"')
+        return ", ".join(entries)
+
+    def to_json_lines(self) -> str:
+        """One JSON object per span, tagged with the trace and request attributes."""
+        with self._lock:
+            spans = list(self.spans)
+        base = {"trace_id": self.trace_id, "request": self.name, "started_at": self.started_at, **self.attrs}
+        lines = [json.dumps({**base, "name": "request", "start_ms": 0.0, "duration_ms": self.total_ms})]
+        lines += [json.dumps({**base, **span}) for span in spans]
+        return "\n".join(lines) + "\n"
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[None]:
+    """Times the block as a span of the current request; a no-op outside traced requests."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, start, time.perf_counter(), **attrs)
+
+
+def _append(path: str, lines: str):
+    try:
+        with open(path, 'a') as f:
+            f.write(lines)
+    except OSError:
+        logger.warning(f"Could not export trace to {path}", exc_info=True)
+
+
+def export_trace(trace: RequestTrace, path: str = TRACE_EXPORT_PATH) -> Optional[Future]:
+    """Queues the trace's spans for appending to `path` on the writer thread."""
+    if not path:
+        return None
+    return _exporter.submit(_append, path, trace.to_json_lines())
+
+
+def flush_exports():
+    """Blocks until every trace queued so far has been written."""
+    _exporter.submit(lambda: None).result()
+
+
+@contextmanager
+def traced_request(name: str, **attrs: Any) -> Iterator[Optional[RequestTrace]]:
+    """
+    Makes a new trace current for the block (and the tasks and threads it
+    starts), then exports it. Yields None when tracing is disabled.
+    """
+    if not TRACE_ENABLED:
+        yield None
+        return
+    trace = RequestTrace(name, **attrs)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        try:
+            _current_trace.reset(token)
+        except ValueError:
+            # A streaming generator closed after a disconnect may run this in another context
+            pass
+        trace.finish()
+        export_trace(trace, TRACE_EXPORT_PATH)
+
+
+class TraceCallback(BaseCallbackHandler):
+    """
+    Adds agent-step, LLM and tool spans to a request trace from LangChain
+    callbacks. Agent steps are LangGraph node runs ("step.agent",
+    "step.tools"); nested runnables inside a node are not spans.
+    """
+
+    def __init__(self, trace: RequestTrace):
+        self.trace = trace
+        self._lock = threading.Lock()
+        self._started: Dict[Any, tuple] = {}
+
+    def _start(self, run_id, name: str, attrs: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            self._started[run_id] = (name, time.perf_counter(), attrs or {})
+
+    def _stop(self, run_id, **extra: Any):
+        with self._lock:
+            name, start, attrs = self._started.pop(run_id, (None, None, None))
+        if name is not None:
+            self.trace.add(name, start, time.perf_counter(), **attrs, **extra)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if node and kwargs.get("name") == node:
+            self._start(run_id, f"step.{node}", {"step": (metadata or {}).get("langgraph_step")})
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._stop(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._stop(run_id, error=type(error).__name__)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id, "llm")
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, "llm")
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._stop(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._stop(run_id, error=type(error).__name__)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, f"tool.{(serialized or {}).get('name') or kwargs.get('name') or 'unknown'}")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._stop(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._stop(run_id, error=type(error).__name__)
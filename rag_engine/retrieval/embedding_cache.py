@@ -0,0 +1,125 @@
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+# --- CONFIGURATION ---
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache.db")
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Case- and whitespace-insensitive form used as the cache key."""
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Wraps an Embeddings client with a two-tier cache for query vectors.
+
+    Tier 1 is an in-memory LRU; tier 2 is a SQLite table that survives restarts.
+    Keys combine the model name with the normalized query, and the store is
+    purged if it was written by a different model. Vectors are rounded to
+    float32 (the disk format) before either tier sees them, so a query gets
+    the same vector whether it was a miss, a memory hit or a disk hit.
+    Document embeddings (used by ingestion) pass straight through.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_name: str,
+        path: Optional[str] = EMBEDDING_CACHE_PATH,
+        max_memory_entries: int = EMBEDDING_CACHE_SIZE,
+    ):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_memory_entries = max_memory_entries
+        # Tuples, so a caller mutating the list it got back can't change the cached vector
+        self._memory: "OrderedDict[str, Tuple[float, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._init_db()
+
+    def _init_db(self):
+        with self._lock:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS query_embeddings (key TEXT PRIMARY KEY, vector BLOB)")
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'model'").fetchone()
+            if row is None or row[0] != self.model_name:
+                # Vectors from another model are meaningless for this one
+                self._conn.execute("DELETE FROM query_embeddings")
+                self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('model', ?)", (self.model_name,))
+            self._conn.commit()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\x00{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: List[float]):
+        self._memory[key] = tuple(vector)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                return list(vector)
+            if self._conn is not None:
+                row = self._conn.execute("SELECT vector FROM query_embeddings WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    vector = array("f", row[0]).tolist()
+                    self._remember(key, vector)
+                    self.hits_disk += 1
+                    return vector
+            self.misses += 1
+
+        # Remote call happens outside the lock so other queries aren't blocked
+        packed = array("f", self.embeddings.embed_query(text))
+        vector = packed.tolist()
+        with self._lock:
+            self._remember(key, vector)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO query_embeddings VALUES (?, ?)",
+                    (key, packed.tobytes()),
+                )
+                self._conn.commit()
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def stats(self) -> Dict[str, int]:
+        hits = self.hits_memory + self.hits_disk
+        return {
+            "hits": hits,
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM query_embeddings")
+                self._conn.commit()
@@ -0,0 +1,131 @@
+import os
+import re
+import json
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# --- CONFIGURATION ---
+# "gemini" calls the Gemini embedding API; "local" hashes n-grams in-process (no network)
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "gemini")
+GEMINI_EMBEDDING_MODEL = os.getenv("GEMINI_EMBEDDING_MODEL", "models/gemini-embedding-001")
+LOCAL_EMBEDDING_DIM = int(os.getenv("LOCAL_EMBEDDING_DIM", "384"))
+INDEX_INFO_FILE = "index_info.json"
+
+PROVIDERS = ("gemini", "local")
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+class EmbeddingProviderMismatch(RuntimeError):
+    """The index was built with a different embedding provider than the one configured."""
+
+
+class LocalHashEmbeddings(Embeddings):
+    """
+    Deterministic, network-free embeddings via the hashing trick.
+
+    Words, word bigrams and character 3-grams are hashed (CRC32, stable across
+    processes) into `dim` signed buckets and the result is L2-normalized.
+    Texts sharing vocabulary land close together, which is enough for
+    retrieval tests, benchmarks and offline CI.
+    """
+
+    def __init__(self, dim: int = LOCAL_EMBEDDING_DIM):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        words = _WORD.findall(text.lower())
+        features = [f"w:{w}" for w in words]
+        features += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+        for w in words:
+            padded = f"#{w}#"
+            features += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+        return features
+
+    def _embed(self, text: str) -> List[float]:
+        features = self._features(text)
+        vector = np.zeros(self.dim, dtype=np.float32)
+        if features:
+            hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in features), dtype=np.uint64, count=len(features))
+            buckets = (hashes % self.dim).astype(np.intp)
+            signs = np.where((hashes >> np.uint64(31)) & np.uint64(1), -1.0, 1.0).astype(np.float32)
+            np.add.at(vector, buckets, signs)
+            norm = np.linalg.norm(vector)
+            if norm:
+                vector /= norm
+        return vector.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(t) for t in texts]
+
+
+def provider_signature(provider: Optional[str] = None) -> str:
+    """Identifies the vector space an index lives in, e.g. 'gemini:models/gemini-embedding-001'."""
+    provider = provider or EMBEDDING_PROVIDER
+    if provider == "gemini":
+        return f"gemini:{GEMINI_EMBEDDING_MODEL}"
+    if provider == "local":
+        return f"local:hash-ngram-v1:{LOCAL_EMBEDDING_DIM}"
+    raise ValueError(f"Unknown EMBEDDING_PROVIDER '{provider}'. Use one of: {', '.join(PROVIDERS)}.")
+
+
+def get_embeddings(provider: Optional[str] = None) -> Embeddings:
+    """Document/query embeddings for the configured provider."""
+    provider = provider or EMBEDDING_PROVIDER
+    provider_signature(provider)
+    if provider == "local":
+        return LocalHashEmbeddings()
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    return GoogleGenerativeAIEmbeddings(model=GEMINI_EMBEDDING_MODEL)
+
+
+def is_remote(provider: Optional[str] = None) -> bool:
+    return (provider or EMBEDDING_PROVIDER) != "local"
+
+
+# --- INDEX PROVENANCE ---
+def read_index_info(db_path: str) -> Dict[str, str]:
+    """What index_info.json records about how the index at `db_path` was built."""
+    try:
+        with open(os.path.join(db_path, INDEX_INFO_FILE), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_index_info(db_path: str, **fields: str):
+    """Merges `fields` into index_info.json."""
+    info = read_index_info(db_path)
+    info.update(fields)
+    os.makedirs(db_path, exist_ok=True)
+    with open(os.path.join(db_path, INDEX_INFO_FILE), 'w') as f:
+        json.dump(info, f, indent=2)
+
+
+def read_index_provider(db_path: str) -> Optional[str]:
+    return read_index_info(db_path).get("embedding_provider")
+
+
+def write_index_provider(db_path: str, provider: Optional[str] = None):
+    write_index_info(db_path, embedding_provider=provider_signature(provider))
+
+
+def check_index_provider(db_path: str, provider: Optional[str] = None, legacy_default: Optional[str] = None):
+    """
+    Raises EmbeddingProviderMismatch if the index at `db_path` was built by a
+    different provider. Indexes from before provenance was recorded are assumed
+    to be `legacy_default` (pass None to accept them).
+    """
+    recorded = read_index_provider(db_path) or legacy_default
+    expected = provider_signature(provider)
+    if recorded is not None and recorded != expected:
+        raise EmbeddingProviderMismatch(
+            f"Index at {db_path} was built with '{recorded}' but EMBEDDING_PROVIDER resolves to '{expected}'. "
+            "Re-ingest into a fresh DB_PATH or switch the provider back."
+        )
@@ -0,0 +1,109 @@
+import os
+import re
+import json
+import sqlite3
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+# --- CONFIGURATION ---
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", "./lexical_index.db")
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def to_match_query(query: str) -> Optional[str]:
+    """
+    Turns free text into an FTS5 MATCH expression: every word quoted (so
+    punctuation and FTS operators in user text are inert) and OR-ed, leaving
+    BM25 to rank documents that contain more of the terms higher.
+    """
+    terms = _TERM.findall(query.lower())
+    if not terms:
+        return None
+    return " OR ".join(f'"{t}"' for t in dict.fromkeys(terms))
+
+
+class LexicalIndex:
+    """
+    BM25 keyword index over policy chunks, stored in SQLite FTS5.
+
+    Rows are keyed by the same content-addressed chunk IDs as the vector store,
+    so ingestion keeps both in step with upserts and deletes by ID. Lookups are
+    local and need no embedding call.
+    """
+
+    def __init__(self, path: str = LEXICAL_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks (chunk_id TEXT PRIMARY KEY, content TEXT, metadata TEXT)"
+            )
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5("
+                "content, content='chunks', content_rowid='rowid', tokenize='porter unicode61')"
+            )
+            # Keep the FTS table in sync with the content table
+            self._conn.executescript("""
+                CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+                    INSERT INTO chunks_fts(rowid, content) VALUES (new.rowid, new.content);
+                END;
+                CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+                    INSERT INTO chunks_fts(chunks_fts, rowid, content) VALUES ('delete', old.rowid, old.content);
+                END;
+            """)
+            self._conn.commit()
+
+    def upsert(self, ids: Iterable[str], documents: Iterable[Document]):
+        rows = [(i, d.page_content, json.dumps(d.metadata)) for i, d in zip(ids, documents)]
+        if not rows:
+            return
+        with self._lock:
+            # DELETE + INSERT so the FTS triggers see the old content
+            self._conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", [(r[0],) for r in rows])
+            self._conn.executemany("INSERT INTO chunks (chunk_id, content, metadata) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def delete(self, ids: Iterable[str]):
+        rows = [(i,) for i in ids]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", rows)
+            self._conn.commit()
+
+    def backup(self, path: str):
+        """Writes a consistent copy of the index to `path` (SQLite online backup)."""
+        target = sqlite3.connect(path)
+        try:
+            with self._lock:
+                self._conn.backup(target)
+        finally:
+            target.close()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def search_with_scores(self, query: str, k: int = 5) -> List[Tuple[Document, float]]:
+        """Top-k chunks by BM25 (lower FTS5 scores are better; returned negated)."""
+        match = to_match_query(query)
+        if match is None:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT c.chunk_id, c.content, c.metadata, bm25(chunks_fts) AS score "
+                "FROM chunks_fts JOIN chunks c ON c.rowid = chunks_fts.rowid "
+                "WHERE chunks_fts MATCH ? ORDER BY score LIMIT ?",
+                (match, k),
+            ).fetchall()
+        return [
+            (Document(id=chunk_id, page_content=content, metadata=json.loads(metadata)), -score)
+            for chunk_id, content, metadata, score in rows
+        ]
+
+    def search(self, query: str, k: int = 5) -> List[Document]:
+        return [doc for doc, _ in self.search_with_scores(query, k)]
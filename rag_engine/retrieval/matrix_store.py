@@ -0,0 +1,464 @@
+import os
+import re
+import json
+import uuid
+import sqlite3
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from rag_engine.retrieval.embeddings import read_index_info
+
+# --- CONFIGURATION ---
+# "chroma" (default) or "matrix": an exact-search NumPy matrix memory-mapped from disk
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+# Storage type of the matrix rows: "float16" or "int8" (per-row scale)
+MATRIX_DTYPE = os.getenv("MATRIX_DTYPE", "float16")
+MATRIX_SEARCH_BLOCK = int(os.getenv("MATRIX_SEARCH_BLOCK", "8192"))
+
+BACKENDS = ("chroma", "matrix")
+MANIFEST_FILE = "matrix_manifest.json"
+CHUNKS_DB_FILE = "matrix_chunks.db"
+CHROMA_DB_FILE = "chroma.sqlite3"
+
+_FIELD = re.compile(r"^\w+$")
+# IDs per `chunk_id IN (...)` query, well under SQLite's bound-parameter limit
+ID_QUERY_CHUNK = 500
+
+
+class VectorBackendMismatch(RuntimeError):
+    """The index was built with a different vector backend than the one configured."""
+
+
+def read_index_backend(db_path: str) -> Optional[str]:
+    """Backend recorded by ingestion; indexes from before it was recorded are Chroma."""
+    recorded = read_index_info(db_path).get("vector_backend")
+    if recorded is None and os.path.exists(os.path.join(db_path, CHROMA_DB_FILE)):
+        return "chroma"
+    return recorded
+
+
+def check_index_backend(db_path: str, backend: Optional[str] = None):
+    backend = backend or VECTOR_BACKEND
+    recorded = read_index_backend(db_path)
+    if recorded is not None and recorded != backend:
+        raise VectorBackendMismatch(
+            f"Index at {db_path} was built with the '{recorded}' vector backend but VECTOR_BACKEND is '{backend}'. "
+            "Re-run ingestion to rebuild it."
+        )
+
+
+def open_vector_store(db_path: str, embeddings: Embeddings, backend: Optional[str] = None):
+    """Opens the configured vector store; both backends expose the Chroma calls ingestion and retrieval use."""
+    backend = backend or VECTOR_BACKEND
+    if backend == "matrix":
+        return MatrixVectorStore(db_path, embedding_function=embeddings)
+    if backend == "chroma":
+        from langchain_chroma import Chroma
+        return Chroma(persist_directory=db_path, embedding_function=embeddings)
+    raise ValueError(f"Unknown VECTOR_BACKEND '{backend}'. Use one of: {', '.join(BACKENDS)}.")
+
+
+def deferred_writes(vector_store):
+    """Batches a matrix store's writes into one persist at the end of the block; Chroma writes through."""
+    collection = getattr(vector_store, "_collection", vector_store)
+    return collection.deferred() if isinstance(collection, MatrixVectorStore) else nullcontext()
+
+
+def flush_writes(vector_store):
+    """Makes a deferred matrix store's writes so far durable; a no-op for Chroma."""
+    collection = getattr(vector_store, "_collection", vector_store)
+    if isinstance(collection, MatrixVectorStore):
+        collection.flush()
+
+
+def _grow(buffer: Optional[np.ndarray], used: int, new: np.ndarray) -> np.ndarray:
+    """Writes `new` after the first `used` rows of `buffer`, doubling its capacity when it is full."""
+    needed = used + len(new)
+    if buffer is None or buffer.shape[0] < needed:
+        grown = np.empty((max(needed, 2 * used),) + new.shape[1:], dtype=new.dtype)
+        if used:
+            grown[:used] = buffer[:used]
+        buffer = grown
+    buffer[used:needed] = new
+    return buffer
+
+
+def _write_json_atomic(path: str, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _save_array(path: str, array: np.ndarray):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        np.save(f, array)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class MatrixVectorStore:
+    """
+    Exact vector search over one contiguous matrix of normalized embeddings.
+
+    Rows are stored as float16, or int8 with a per-row scale, in .npy files that
+    readers memory-map: every API worker shares the same pages through the OS
+    page cache instead of holding its own copy. A query is one blocked
+    matrix-vector product plus a partial sort. Chunk text and metadata live in a
+    sidecar SQLite table keyed by chunk ID.
+
+    Writes rewrite the matrix as a new generation and then swap the manifest,
+    so a reader always sees a complete snapshot; readers pick up new
+    generations when they reopen the store. Outside `deferred()` each
+    upsert/delete is durable on return, like Chroma. Inside it, writes only
+    change the in-memory matrix and a new generation is written on `flush()`
+    or at the end of the block, so a full ingest writes the matrix a handful
+    of times instead of once per batch; the ingestion pipeline flushes before
+    it checkpoints, which keeps the checkpoint honest. This is sized for
+    corpora of thousands to low hundreds of thousands of chunks
+    (benchmarks/retrieval_bench.py --synthetic-chunks builds 100k).
+
+    Implements the subset of the Chroma API the rest of the code calls, and
+    `_collection` points back at the store for the raw collection calls.
+    """
+
+    def __init__(self, path: str, embedding_function: Optional[Embeddings] = None, dtype: str = MATRIX_DTYPE):
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"Unknown MATRIX_DTYPE '{dtype}'. Use float16 or int8.")
+        self.path = path
+        self.dtype = dtype
+        self._embedding_function = embedding_function
+        self._collection = self
+        self._lock = threading.Lock()
+        self._deferred = 0
+        self._dirty = False
+        # Chunk rows to delete once the matrix that no longer references them is written
+        self._pending_deletes: Set[str] = set()
+        os.makedirs(path, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(path, CHUNKS_DB_FILE), check_same_thread=False)
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks (chunk_id TEXT PRIMARY KEY, content TEXT, metadata TEXT)"
+            )
+            self._conn.commit()
+        self._load()
+
+    # --- Snapshot I/O ---
+    def _load(self):
+        self._generation = 0
+        self._vectors: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._ids: List[str] = []
+        self._writable = False
+        for attempt in range(3):
+            try:
+                with open(os.path.join(self.path, MANIFEST_FILE), 'r') as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                break
+            if manifest["dtype"] != self.dtype:
+                raise ValueError(
+                    f"Matrix index at {self.path} stores {manifest['dtype']} rows but MATRIX_DTYPE is '{self.dtype}'."
+                )
+            try:
+                self._generation = manifest["generation"]
+                if manifest["count"]:
+                    files = manifest["files"]
+                    self._vectors = np.load(os.path.join(self.path, files["vectors"]), mmap_mode="r")
+                    if "scales" in files:
+                        self._scales = np.load(os.path.join(self.path, files["scales"]), mmap_mode="r")
+                    self._ids = np.load(os.path.join(self.path, files["ids"])).tolist()
+                break
+            except FileNotFoundError:
+                # A writer swapped generations between reading the manifest and the files
+                if attempt == 2:
+                    raise
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+
+    def _make_writable(self):
+        if not self._writable:
+            if self._vectors is not None:
+                self._vectors = np.array(self._vectors)
+                self._scales = None if self._scales is None else np.array(self._scales)
+            self._set_matrix(self._vectors, self._scales)
+            self._writable = True
+
+    def _set_matrix(self, vectors: Optional[np.ndarray], scales: Optional[np.ndarray]):
+        # _vectors/_scales are views of the first count() rows of these; appends fill the spare rows
+        self._vectors, self._scales = vectors, scales
+        self._vector_buffer, self._scale_buffer = vectors, scales
+
+    def _persist(self):
+        old = self._generation_files(self._generation)
+        self._generation += 1
+        files = self._generation_files(self._generation)
+        count = len(self._ids)
+        if count:
+            _save_array(os.path.join(self.path, files["vectors"]), self._vectors)
+            if self._scales is not None:
+                _save_array(os.path.join(self.path, files["scales"]), self._scales)
+            _save_array(os.path.join(self.path, files["ids"]), np.array(self._ids))
+        _write_json_atomic(os.path.join(self.path, MANIFEST_FILE), {
+            "generation": self._generation,
+            "dtype": self.dtype,
+            "dim": 0 if self._vectors is None else int(self._vectors.shape[1]),
+            "count": count,
+            "files": files if count else {},
+        })
+        # Readers that still map the old generation keep it until they close it
+        for name in old.values():
+            try:
+                os.remove(os.path.join(self.path, name))
+            except FileNotFoundError:
+                pass
+
+    def _written(self):
+        """Called under the lock after each change to the in-memory matrix."""
+        if self._deferred:
+            self._dirty = True
+        else:
+            self._persist()
+            self._delete_rows()
+
+    def _delete_rows(self):
+        if self._pending_deletes:
+            self._conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", [(i,) for i in self._pending_deletes])
+            self._conn.commit()
+            self._pending_deletes.clear()
+
+    @contextmanager
+    def deferred(self):
+        """Holds back persisting writes until the block ends (blocks may nest)."""
+        with self._lock:
+            self._deferred += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._deferred -= 1
+                outermost = not self._deferred
+            if outermost:
+                self.flush()
+
+    def flush(self):
+        """Writes the deferred changes as one new generation."""
+        with self._lock:
+            if self._dirty:
+                self._persist()
+                self._dirty = False
+            self._delete_rows()
+
+    def _generation_files(self, generation: int) -> Dict[str, str]:
+        files = {"vectors": f"vectors-{generation}.npy", "ids": f"ids-{generation}.npy"}
+        if self.dtype == "int8":
+            files["scales"] = f"scales-{generation}.npy"
+        return files
+
+    # --- Encoding ---
+    def _encode(self, embeddings: Sequence[Sequence[float]]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1.0, norms)
+        if self.dtype == "float16":
+            return matrix.astype(np.float16), None
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        return np.round(matrix / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+    @staticmethod
+    def _scores(vectors: np.ndarray, scales: Optional[np.ndarray], query: np.ndarray) -> np.ndarray:
+        """Cosine similarity of every row to `query`, block by block to bound temporary memory."""
+        scores = np.empty(vectors.shape[0], dtype=np.float32)
+        for start in range(0, vectors.shape[0], MATRIX_SEARCH_BLOCK):
+            end = start + MATRIX_SEARCH_BLOCK
+            scores[start:end] = vectors[start:end].astype(np.float32) @ query
+        if scales is not None:
+            scores *= scales
+        return scores
+
+    # --- Chroma-compatible API ---
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self._embedding_function
+
+    def count(self) -> int:
+        return len(self._ids)
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+        metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+        documents: Optional[Sequence[str]] = None,
+    ):
+        if not ids:
+            return
+        metadatas = metadatas or [{} for _ in ids]
+        documents = documents or ["" for _ in ids]
+        rows, scales = self._encode(embeddings)
+        with self._lock:
+            if self._vectors is not None and rows.shape[1] != self._vectors.shape[1]:
+                raise ValueError(f"Embedding dimension {rows.shape[1]} does not match the index ({self._vectors.shape[1]}).")
+            # Metadata first: readers on the old snapshot never look these IDs up
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (chunk_id, content, metadata) VALUES (?, ?, ?)",
+                [(i, doc, json.dumps(meta or {})) for i, doc, meta in zip(ids, documents, metadatas)],
+            )
+            self._conn.commit()
+            self._pending_deletes.difference_update(ids)
+
+            self._make_writable()
+            latest = {chunk_id: n for n, chunk_id in enumerate(ids)}
+            existing = [(self._rows[i], n) for i, n in latest.items() if i in self._rows]
+            appended = [(i, n) for i, n in latest.items() if i not in self._rows]
+            for row, n in existing:
+                self._vectors[row] = rows[n]
+                if scales is not None:
+                    self._scales[row] = scales[n]
+            if appended:
+                used, order = len(self._ids), [n for _, n in appended]
+                self._vector_buffer = _grow(self._vector_buffer, used, rows[order])
+                self._vectors = self._vector_buffer[:used + len(order)]
+                if scales is not None:
+                    self._scale_buffer = _grow(self._scale_buffer, used, scales[order])
+                    self._scales = self._scale_buffer[:used + len(order)]
+                for chunk_id, _ in appended:
+                    self._rows[chunk_id] = len(self._ids)
+                    self._ids.append(chunk_id)
+            self._written()
+
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None) -> List[str]:
+        if ids is None:
+            ids = [doc.metadata.get("chunk_id") or doc.id or str(uuid.uuid4()) for doc in documents]
+        texts = [doc.page_content for doc in documents]
+        self.upsert(ids, self.embeddings.embed_documents(texts), [doc.metadata for doc in documents], texts)
+        return ids
+
+    def delete(self, ids: Optional[Iterable[str]] = None):
+        doomed = {i for i in (ids or []) if i in self._rows}
+        if not doomed:
+            return
+        with self._lock:
+            self._make_writable()
+            keep = [row for row, chunk_id in enumerate(self._ids) if chunk_id not in doomed]
+            self._ids = [self._ids[row] for row in keep]
+            self._rows = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+            if self._ids:
+                self._set_matrix(self._vectors[keep], None if self._scales is None else self._scales[keep])
+            else:
+                self._set_matrix(None, None)
+            # Matrix first, so no snapshot references a row whose metadata is gone
+            self._pending_deletes.update(doomed)
+            self._written()
+
+    def _where_clause(self, where: Optional[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+        """Supports Chroma's {field: value} and {field: {"$in": [...]}} filters on metadata."""
+        clauses, params = [], []
+        for field, condition in (where or {}).items():
+            if not _FIELD.match(field):
+                raise ValueError(f"Unsupported metadata field '{field}'")
+            column = f"json_extract(metadata, '$.{field}')"
+            if isinstance(condition, dict):
+                values = list(condition.get("$in", []))
+                if set(condition) != {"$in"}:
+                    raise ValueError(f"Unsupported filter {condition}")
+                if not values:
+                    clauses.append("0")
+                    continue
+                clauses.append(f"{column} IN ({', '.join('?' for _ in values)})")
+                params.extend(values)
+            else:
+                clauses.append(f"{column} = ?")
+                params.append(condition)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _select(self, ids: Optional[Sequence[str]], where: Optional[Dict[str, Any]]) -> List[Tuple[str, str, str]]:
+        """Chunk rows matching `where` (and `ids`, queried in slices), ordered by chunk ID."""
+        sql, params = self._where_clause(where)
+        query = f"SELECT chunk_id, content, metadata FROM chunks{sql}"
+        with self._lock:
+            if ids is None:
+                return self._conn.execute(f"{query} ORDER BY chunk_id", params).fetchall()
+            wanted = sorted(set(ids))
+            rows = []
+            for start in range(0, len(wanted), ID_QUERY_CHUNK):
+                chunk = wanted[start:start + ID_QUERY_CHUNK]
+                condition = f"chunk_id IN ({', '.join('?' for _ in chunk)})"
+                rows.extend(self._conn.execute(
+                    f"{query} {'AND' if sql else 'WHERE'} {condition}", params + chunk,
+                ).fetchall())
+        return sorted(rows)
+
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        include: Sequence[str] = ("documents", "metadatas"),
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Dict[str, List]:
+        positions, vectors, scales = self._rows, self._vectors, self._scales
+        if ids is not None and where is None and "documents" not in include and "metadatas" not in include:
+            # The ingestion pipeline's "already stored?" check: answered from memory
+            rows = [(i, None, None) for i in sorted(set(ids)) if i in positions]
+        else:
+            rows = self._select(ids, where)
+            rows = [r for r in rows if r[0] in positions]
+        rows = rows[offset:None if limit is None else offset + limit]
+        result: Dict[str, List] = {"ids": [r[0] for r in rows]}
+        if "embeddings" in include and not rows:
+            result["embeddings"] = []
+        elif "embeddings" in include:
+            matrix = vectors[[positions[r[0]] for r in rows]].astype(np.float32)
+            if scales is not None:
+                matrix *= scales[[positions[r[0]] for r in rows]][:, None]
+            result["embeddings"] = matrix.tolist()
+        if "documents" in include:
+            result["documents"] = [r[1] for r in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [json.loads(r[2]) for r in rows]
+        return result
+
+    def similarity_search_by_vector_with_scores(self, embedding: Sequence[float], k: int = 5) -> List[Tuple[Document, float]]:
+        vectors, scales, ids = self._vectors, self._scales, self._ids
+        if vectors is None or not ids or k <= 0:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        scores = self._scores(vectors, scales, query)
+        k = min(k, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        hits = [(ids[row], float(scores[row])) for row in top]
+
+        with self._lock:
+            found = {
+                chunk_id: (content, metadata)
+                for chunk_id, content, metadata in self._conn.execute(
+                    f"SELECT chunk_id, content, metadata FROM chunks WHERE chunk_id IN ({', '.join('?' for _ in hits)})",
+                    [chunk_id for chunk_id, _ in hits],
+                )
+            }
+        return [
+            (Document(id=chunk_id, page_content=found[chunk_id][0], metadata=json.loads(found[chunk_id][1])), score)
+            for chunk_id, score in hits
+            if chunk_id in found
+        ]
+
+    def similarity_search_by_vector(self, embedding: Sequence[float], k: int = 5) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_scores(embedding, k=k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 5) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_scores(self.embeddings.embed_query(query), k=k)
+
+    def similarity_search(self, query: str, k: int = 5) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k)]
@@ -0,0 +1,182 @@
+import os
+import re
+import time
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from rag_engine.observability.metrics import PREFETCH_REQUESTS, PREFETCH_SAVED_SECONDS
+from rag_engine.observability.tracing import span
+from rag_engine.retrieval.retriever import get_retriever
+
+logger = logging.getLogger("nebula.prefetch")
+
+# --- CONFIGURATION ---
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "false").lower() in ("1", "true", "yes")
+# The question's results are served when the tool query and the question share
+# nearly the same content words (Jaccard similarity of the two word sets)...
+PREFETCH_MIN_OVERLAP = float(os.getenv("PREFETCH_MIN_OVERLAP", "0.75"))
+# ...or when the two embeddings are at least this similar (cosine)
+PREFETCH_MIN_SIMILARITY = float(os.getenv("PREFETCH_MIN_SIMILARITY", "0.85"))
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))
+
+_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+_current_prefetch: contextvars.ContextVar[Optional["Prefetch"]] = contextvars.ContextVar(
+    "nebula_prefetch", default=None,
+)
+
+
+# Question words that never appear in a keyword query
+STOPWORDS = frozenset(
+    "about all and any are can could did does for from get has have how many much our should "
+    "that the there this what when where which who why will with would you your".split()
+)
+
+
+def _content_words(text: str) -> set:
+    return {w for w in re.findall(r"\w+", text.lower()) if len(w) >= 3 and w not in STOPWORDS}
+
+
+def word_overlap(query: str, question: str) -> float:
+    """
+    Jaccard similarity of the content words of `query` and `question`. It is
+    symmetric, so a shorter retry ("stipend" after "remote stipend policy") or
+    one part of a compound question scores low.
+    """
+    words, question_words = _content_words(query), _content_words(question)
+    if not words or not question_words:
+        return 0.0
+    return len(words & question_words) / len(words | question_words)
+
+
+def _unit(vector: List[float]) -> np.ndarray:
+    arr = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(arr)
+    return arr / norm if norm else arr
+
+
+class Prefetch:
+    """
+    A policy search for the user's question, started when the request
+    arrives so it runs while the agent's first model call decides which
+    tools to use.
+
+    `match` serves the results to a search_policies call whose query has
+    nearly the same content words as the question (`min_overlap`), or whose
+    embedding has cosine similarity >= `min_similarity` with it, waiting for
+    the search if it is still running. The results are served at most once
+    per request: retries and parallel sub-queries always reach the
+    retriever. Otherwise the tool searches as usual; on remote providers the
+    query embedding made for the comparison is cached, so a miss costs no
+    extra embedding call.
+
+    Time saved on a hit is the prefetch's own duration (what the tool's
+    search would have taken) minus the time the tool spent in `match`.
+    """
+
+    def __init__(
+        self,
+        query: str,
+        search: Callable[[str], List[Document]],
+        embed: Callable[[str], List[float]],
+        min_overlap: float = PREFETCH_MIN_OVERLAP,
+        min_similarity: float = PREFETCH_MIN_SIMILARITY,
+        executor: Optional[ThreadPoolExecutor] = None,
+    ):
+        self.query = query
+        self.search = search
+        self.embed = embed
+        self.min_overlap = min_overlap
+        self.min_similarity = min_similarity
+        self.duration: Optional[float] = None
+        self.outcome: Optional[str] = None
+        self.saved = 0.0
+        self.served = False
+        self._lock = threading.Lock()
+        # The worker runs in a copy of this context so its spans land in the request's trace
+        self._future = (executor or _executor).submit(contextvars.copy_context().run, self._run)
+
+    def _run(self) -> Tuple[np.ndarray, List[Document]]:
+        start = time.perf_counter()
+        with span("prefetch"):
+            vector = _unit(self.embed(self.query))
+            results = self.search(self.query)
+        self.duration = time.perf_counter() - start
+        return vector, results
+
+    def _record(self, outcome: str):
+        with self._lock:
+            # A request counts as a hit if any of its searches was served
+            if self.outcome != "hit":
+                self.outcome = outcome
+
+    def match(self, query: str) -> Optional[List[Document]]:
+        """The prefetched results if not yet served and `query` is close enough to the question, else None."""
+        if self.served:
+            return None
+        start = time.perf_counter()
+        try:
+            vector = None if word_overlap(query, self.query) >= self.min_overlap else _unit(self.embed(query))
+            question_vector, results = self._future.result()
+        except Exception:
+            logger.warning("Policy prefetch failed; searching as usual", exc_info=True)
+            self._record("error")
+            return None
+        if vector is not None:
+            similarity = float(np.dot(vector, question_vector))
+            if similarity < self.min_similarity:
+                logger.debug(f"Prefetch miss (similarity={similarity:.3f}): {query[:80]}")
+                self._record("miss")
+                return None
+        with self._lock:
+            if self.served:
+                # A parallel call with the same query claimed the results first
+                return None
+            self.served = True
+            self.outcome = "hit"
+            self.saved = max((self.duration or 0.0) - (time.perf_counter() - start), 0.0)
+        PREFETCH_SAVED_SECONDS.observe(self.saved)
+        return results
+
+    def finish(self):
+        """Counts the request's outcome; "unused" when the tool was never called."""
+        if self._future.cancel():
+            # Still queued behind other prefetches: skip the search altogether
+            PREFETCH_REQUESTS.labels(outcome="cancelled").inc()
+            return
+        PREFETCH_REQUESTS.labels(outcome=self.outcome or "unused").inc()
+
+
+@contextmanager
+def prefetch_policies(query: str, k: int, enabled: Optional[bool] = None) -> Iterator[Optional[Prefetch]]:
+    """
+    Starts the question's policy search (`k` results, like the tool) and makes
+    it visible to search_policies calls made inside the block.
+    """
+    if not (PREFETCH_ENABLED if enabled is None else enabled):
+        yield None
+        return
+    retriever = get_retriever()
+    prefetch = Prefetch(query, search=lambda q: retriever.search(q, k=k), embed=retriever.embed_query)
+    token = _current_prefetch.set(prefetch)
+    try:
+        yield prefetch
+    finally:
+        try:
+            _current_prefetch.reset(token)
+        except ValueError:
+            # A streaming generator closed after a disconnect may run this in another context
+            pass
+        prefetch.finish()
+
+
+def prefetched_results(query: str) -> Optional[List[Document]]:
+    """Results of the current request's prefetch for `query`, or None to search as usual."""
+    prefetch = _current_prefetch.get()
+    return prefetch.match(query) if prefetch is not None else None
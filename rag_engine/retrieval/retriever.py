@@ -0,0 +1,290 @@
+import os
+import threading
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from rag_engine.retrieval.embedding_cache import CachedQueryEmbeddings
+from rag_engine.retrieval.embeddings import (
+    EMBEDDING_PROVIDER, check_index_provider, get_embeddings, is_remote, provider_signature,
+)
+from rag_engine.retrieval.lexical_index import LexicalIndex, LEXICAL_INDEX_PATH
+from rag_engine.retrieval.matrix_store import VECTOR_BACKEND, check_index_backend, open_vector_store
+from rag_engine.observability.metrics import EMBEDDING_SECONDS, LEXICAL_SEARCH_SECONDS, VECTOR_SEARCH_SECONDS, observe
+from rag_engine.observability.tracing import span
+from rag_engine.retrieval.snapshots import LEXICAL_FILE, SNAPSHOT_DIR, VECTORS_DIR, current_pointer, read_current
+
+logger = logging.getLogger("nebula.retriever")
+
+# --- CONFIGURATION ---
+DB_PATH = os.getenv("DB_PATH", "./chroma_db")
+STATE_FILE = os.getenv("INGESTION_STATE_FILE", "ingestion_state.json")
+# "hybrid" fuses BM25 and vector results; "vector" or "lexical" use one side only
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+RETRIEVAL_FETCH_K = int(os.getenv("RETRIEVAL_FETCH_K", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+VECTOR_SEARCH_TIMEOUT = float(os.getenv("VECTOR_SEARCH_TIMEOUT", "5"))
+
+
+def query_embeddings(provider: Optional[str] = None) -> Embeddings:
+    """Embeddings for search; remote providers get the query-embedding cache in front."""
+    embeddings = get_embeddings(provider)
+    if is_remote(provider):
+        # Repeated onboarding questions skip the remote embedding round-trip
+        return CachedQueryEmbeddings(embeddings, model_name=provider_signature(provider))
+    return embeddings
+
+
+def _doc_key(doc: Document) -> str:
+    return doc.metadata.get("chunk_id") or doc.id or doc.page_content
+
+
+def reciprocal_rank_fusion(result_lists: Sequence[List[Document]], k: int = RRF_K, limit: Optional[int] = None) -> List[Document]:
+    """
+    Merges ranked lists: each document scores sum(1 / (k + rank)) over the
+    lists it appears in. Rank-based, so BM25 and cosine scores never need to
+    be put on the same scale.
+    """
+    scores: Dict[str, float] = {}
+    docs: Dict[str, Document] = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = _doc_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            docs.setdefault(key, doc)
+    ranked = sorted(scores, key=lambda key: scores[key], reverse=True)
+    return [docs[key] for key in ranked[:limit]]
+
+
+class RetrieverService:
+    """
+    Process-wide owner of the embeddings client and the vector store
+    (Chroma or the memory-mapped matrix, per VECTOR_BACKEND).
+
+    The store is opened once and shared by every caller. Each access stats the
+    ingestion state file; when ingestion has rewritten it, the store is reopened
+    so new chunks become searchable without restarting the API.
+
+    With the default embeddings, the configured EMBEDDING_PROVIDER must match
+    the one recorded by ingestion; a mismatched index is refused rather than
+    searched with incomparable vectors. Likewise an index written by the other
+    vector backend is refused until ingestion has rebuilt it.
+
+    With `snapshot_dir` set, the service serves the published snapshot that
+    CURRENT.json points at instead of the live index, and watches that file
+    instead of the state file. A new snapshot is opened next to the old one
+    and swapped in as a unit; searches already running finish on the objects
+    they hold, and the publisher keeps old snapshots on disk for them.
+    """
+
+    def __init__(
+        self,
+        db_path: str = DB_PATH,
+        state_file: str = STATE_FILE,
+        embeddings_factory: Optional[Callable[[], Embeddings]] = None,
+        lexical_index_path: Optional[str] = LEXICAL_INDEX_PATH,
+        mode: str = RETRIEVAL_MODE,
+        provider: Optional[str] = None,
+        backend: str = VECTOR_BACKEND,
+        snapshot_dir: Optional[str] = SNAPSHOT_DIR or None,
+    ):
+        self.db_path = db_path
+        self.state_file = state_file
+        self.lexical_index_path = lexical_index_path
+        self.mode = mode
+        self.backend = backend
+        self.snapshot_dir = snapshot_dir
+        self.active_db_path = db_path
+        self.active_snapshot: Optional[Dict] = None
+        if embeddings_factory is None:
+            provider = provider or EMBEDDING_PROVIDER
+            embeddings_factory = lambda: query_embeddings(provider)  # noqa: E731
+        self.provider = provider
+        self._embeddings_factory = embeddings_factory
+        self._lexical_index: Optional[LexicalIndex] = None
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="vector-search")
+        self._lock = threading.Lock()
+        self._embeddings: Optional[Embeddings] = None
+        self._vector_store = None
+        self._state_signature: Optional[Tuple[int, int]] = None
+        self.reload_count = 0
+
+    def _read_state_signature(self) -> Optional[Tuple[int, int]]:
+        watched = current_pointer(self.snapshot_dir) if self.snapshot_dir else self.state_file
+        try:
+            st = os.stat(watched)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def get_embeddings(self) -> Embeddings:
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    self._embeddings = self._embeddings_factory()
+        return self._embeddings
+
+    def embed_query(self, text: str) -> List[float]:
+        embeddings = self.get_embeddings()
+        with observe(EMBEDDING_SECONDS, provider=self.provider or "custom"), span("embedding"):
+            return embeddings.embed_query(text)
+
+    def _build(self, signature: Optional[Tuple[int, int]]):
+        db_path, snapshot, lexical_index = self.db_path, None, self._lexical_index
+        if self.snapshot_dir:
+            snapshot = read_current(self.snapshot_dir)
+            if snapshot is None:
+                logger.warning(f"No snapshot published in {self.snapshot_dir} yet; serving {self.db_path}")
+                lexical_index = LexicalIndex(self.lexical_index_path) if self.lexical_index_path else None
+            else:
+                db_path = os.path.join(snapshot["path"], VECTORS_DIR)
+                lexical_path = os.path.join(snapshot["path"], LEXICAL_FILE)
+                lexical_index = (
+                    LexicalIndex(lexical_path) if self.lexical_index_path and os.path.exists(lexical_path) else None
+                )
+        if self.provider is not None:
+            # Non-empty indexes from before provenance was recorded were all built with Gemini
+            has_data = os.path.isdir(db_path) and bool(os.listdir(db_path))
+            legacy = provider_signature("gemini") if has_data else None
+            check_index_provider(db_path, self.provider, legacy_default=legacy)
+        check_index_backend(db_path, self.backend)
+        if self._embeddings is None:
+            self._embeddings = self._embeddings_factory()
+        store = open_vector_store(db_path, self._embeddings, self.backend)
+
+        # Swap the store and its keyword index together
+        self._vector_store, self._lexical_index = store, lexical_index
+        self.active_db_path, self.active_snapshot = db_path, snapshot
+        self._state_signature = signature
+        self.reload_count += 1
+        label = f"snapshot {snapshot['version']}" if snapshot else db_path
+        logger.info(f"Vector store opened from {label} (load #{self.reload_count})")
+        return self._vector_store
+
+    def get_vector_store(self):
+        """Returns the shared store, reopening it if the ingestion state changed."""
+        signature = self._read_state_signature()
+        store = self._vector_store
+        if store is not None and signature == self._state_signature:
+            return store
+
+        with self._lock:
+            # Another thread may have rebuilt while we waited for the lock
+            if self._vector_store is not None and signature == self._state_signature:
+                return self._vector_store
+            return self._build(signature)
+
+    def warm(self) -> int:
+        """Opens the store ahead of the first request. Returns the chunk count."""
+        published = self.snapshot_dir and os.path.exists(current_pointer(self.snapshot_dir))
+        if not published and not os.path.exists(self.db_path):
+            return 0
+        return self.count()
+
+    def refresh(self, force: bool = False) -> Optional[str]:
+        """
+        Picks up a newly published snapshot (or re-ingested index) now rather
+        than on the next search; `force` reopens even if nothing changed.
+        Returns the active snapshot version.
+        """
+        if force:
+            with self._lock:
+                self._build(self._read_state_signature())
+        else:
+            self.get_vector_store()
+        return self.index_version()
+
+    def index_version(self) -> Optional[str]:
+        return self.active_snapshot["version"] if self.active_snapshot else None
+
+    def count(self) -> int:
+        return self.get_vector_store()._collection.count()
+
+    def similarity_search(self, query: str, k: int = 5) -> List[Document]:
+        """Embeds, then searches, as two steps so each is timed on its own."""
+        store = self.get_vector_store()
+        vector = self.embed_query(query)
+        with observe(VECTOR_SEARCH_SECONDS, backend=self.backend), span("vector_search", backend=self.backend):
+            return store.similarity_search_by_vector(vector, k=k)
+
+    def lexical_search(self, lexical: LexicalIndex, query: str, k: int) -> List[Document]:
+        with observe(LEXICAL_SEARCH_SECONDS), span("lexical_search"):
+            return lexical.search(query, k=k)
+
+    def get_lexical_index(self) -> Optional[LexicalIndex]:
+        if self.snapshot_dir:
+            # The snapshot's keyword index is swapped together with its store
+            self.get_vector_store()
+            return self._lexical_index
+        if self._lexical_index is None and self.lexical_index_path:
+            with self._lock:
+                if self._lexical_index is None:
+                    self._lexical_index = LexicalIndex(self.lexical_index_path)
+        return self._lexical_index
+
+    def search(self, query: str, k: int = 5) -> List[Document]:
+        """
+        Policy retrieval in the configured mode. In hybrid mode the vector
+        search runs on a worker thread while BM25 runs here; if the embedding
+        call is slow or failing, the lexical results are served alone.
+        """
+        lexical = self.get_lexical_index() if self.mode in ("hybrid", "lexical") else None
+        if lexical is None:
+            return self.similarity_search(query, k=k)
+        if self.mode == "lexical":
+            return self.lexical_search(lexical, query, k)
+
+        fetch_k = max(k, RETRIEVAL_FETCH_K)
+        # The worker runs in a copy of this context so its spans land in the request's trace
+        vector_future = self._executor.submit(contextvars.copy_context().run, self.similarity_search, query, fetch_k)
+        lexical_results = self.lexical_search(lexical, query, fetch_k)
+        try:
+            vector_results = vector_future.result(timeout=VECTOR_SEARCH_TIMEOUT)
+        except FutureTimeout:
+            logger.warning(f"Vector search exceeded {VECTOR_SEARCH_TIMEOUT}s; serving lexical results only")
+            vector_results = []
+        except Exception:
+            logger.warning("Vector search failed; serving lexical results only", exc_info=True)
+            vector_results = []
+        if not lexical_results:
+            return vector_results[:k]
+        return reciprocal_rank_fusion([vector_results, lexical_results], limit=k)
+
+    def embedding_cache_stats(self) -> Optional[dict]:
+        """Hit/miss counters of the query-embedding cache, if one is in use."""
+        if isinstance(self._embeddings, CachedQueryEmbeddings):
+            return self._embeddings.stats()
+        return None
+
+    def reset(self):
+        """Drops the open store; the next access rebuilds it."""
+        with self._lock:
+            self._vector_store = None
+            self._state_signature = None
+            if self.snapshot_dir:
+                self._lexical_index = None
+
+
+# --- SINGLETON ---
+_retriever: Optional[RetrieverService] = None
+_retriever_lock = threading.Lock()
+
+
+def get_retriever() -> RetrieverService:
+    global _retriever
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                _retriever = RetrieverService()
+    return _retriever
+
+
+def set_retriever(service: Optional[RetrieverService]):
+    """Replaces the process-wide service (used by tests and alternate setups)."""
+    global _retriever
+    with _retriever_lock:
+        _retriever = service
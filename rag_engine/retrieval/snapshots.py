@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from rag_engine.retrieval.embeddings import read_index_info, write_index_info
+from rag_engine.retrieval.lexical_index import LexicalIndex
+from rag_engine.retrieval.matrix_store import VECTOR_BACKEND, open_vector_store
+
+# --- CONFIGURATION ---
+# Empty disables snapshots: the API then reads the live ingestion index directly
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "")
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "3"))
+# Watch mode publishes at most one snapshot per this many seconds; each one copies the whole store
+SNAPSHOT_MIN_INTERVAL = float(os.getenv("SNAPSHOT_MIN_INTERVAL", "60"))
+
+CURRENT_FILE = "CURRENT.json"
+MANIFEST_FILE = "manifest.json"
+VECTORS_DIR = "vectors"
+LEXICAL_FILE = "lexical_index.db"
+
+logger = logging.getLogger("nebula.snapshots")
+
+
+def _write_json_atomic(path: str, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def current_pointer(snapshot_dir: str) -> str:
+    return os.path.join(snapshot_dir, CURRENT_FILE)
+
+
+def read_manifest(snapshot_dir: str, version: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(snapshot_dir, version, MANIFEST_FILE), 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    manifest["path"] = os.path.join(snapshot_dir, version)
+    return manifest
+
+
+def read_current(snapshot_dir: str) -> Optional[Dict]:
+    """Manifest of the snapshot CURRENT.json points at, with its directory under 'path'."""
+    try:
+        with open(current_pointer(snapshot_dir), 'r') as f:
+            version = json.load(f)["version"]
+    except (OSError, ValueError, KeyError):
+        return None
+    return read_manifest(snapshot_dir, version)
+
+
+def list_snapshots(snapshot_dir: str) -> List[str]:
+    """Published snapshot versions, oldest first (versions sort by creation time)."""
+    if not os.path.isdir(snapshot_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(snapshot_dir)
+        if os.path.exists(os.path.join(snapshot_dir, name, MANIFEST_FILE))
+    )
+
+
+def activate_snapshot(snapshot_dir: str, version: str):
+    """Points CURRENT.json at `version`; running APIs swap to it on their next search."""
+    if read_manifest(snapshot_dir, version) is None:
+        raise ValueError(f"No snapshot '{version}' in {snapshot_dir}")
+    _write_json_atomic(current_pointer(snapshot_dir), {"version": version})
+
+
+def _state_digest(files: Dict[str, str]) -> str:
+    return hashlib.md5(json.dumps(files, sort_keys=True).encode("utf-8")).hexdigest()[:8]
+
+
+def copy_vector_store(source, target, page_size: int = 500) -> int:
+    """Copies every stored chunk with its vector, so nothing is re-embedded."""
+    copied = 0
+    offset = 0
+    while True:
+        page = source.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+        if not len(page["ids"]):
+            return copied
+        target._collection.upsert(
+            ids=list(page["ids"]),
+            embeddings=[list(v) for v in page["embeddings"]],
+            metadatas=list(page["metadatas"]),
+            documents=list(page["documents"]),
+        )
+        copied += len(page["ids"])
+        offset += page_size
+
+
+def publish_snapshot(
+    vector_store,
+    lexical_index: Optional[LexicalIndex],
+    files: Dict[str, str],
+    db_path: str,
+    snapshot_dir: str = SNAPSHOT_DIR,
+    backend: str = VECTOR_BACKEND,
+    keep: int = SNAPSHOT_KEEP,
+) -> Optional[Dict]:
+    """
+    Publishes the ingested index as an immutable, versioned snapshot and makes
+    it current.
+
+    The snapshot directory only counts once its manifest exists, and the
+    manifest is written last, so readers never open a partial one;
+    CURRENT.json is then replaced atomically. Returns the manifest, or None if
+    the current snapshot already covers `files` with the same embedding
+    provider and backend.
+    """
+    info = read_index_info(db_path)
+    provider = info.get("embedding_provider")
+    current = read_current(snapshot_dir)
+    if (
+        current is not None
+        and current.get("files") == files
+        and current.get("embedding_provider") == provider
+        and current.get("vector_backend") == backend
+    ):
+        return None
+
+    version = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')}-{_state_digest(files)}"
+    path = os.path.join(snapshot_dir, version)
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+
+    vectors_path = os.path.join(path, VECTORS_DIR)
+    target = open_vector_store(vectors_path, vector_store.embeddings, backend)
+    chunk_count = copy_vector_store(vector_store, target)
+    write_index_info(vectors_path, **{**info, "vector_backend": backend})
+    if lexical_index is not None:
+        lexical_index.backup(os.path.join(path, LEXICAL_FILE))
+
+    manifest = {
+        "version": version,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "embedding_provider": provider,
+        "vector_backend": backend,
+        "chunk_count": chunk_count,
+        "files": files,
+    }
+    _write_json_atomic(os.path.join(path, MANIFEST_FILE), manifest)
+    activate_snapshot(snapshot_dir, version)
+    prune_snapshots(snapshot_dir, keep)
+    manifest["path"] = path
+    return manifest
+
+
+def prune_snapshots(snapshot_dir: str, keep: int = SNAPSHOT_KEEP) -> List[str]:
+    """
+    Deletes all but the newest `keep` snapshots, never the current one. The
+    previous snapshots stay on disk so searches still running against them
+    finish, and so an operator can roll back with activate_snapshot.
+    """
+    current = read_current(snapshot_dir)
+    current_version = current["version"] if current else None
+    versions = list_snapshots(snapshot_dir)
+    doomed = [v for v in versions[:max(0, len(versions) - max(1, keep))] if v != current_version]
+    # Directories without a manifest are leftovers of interrupted publishes
+    doomed += [
+        name for name in os.listdir(snapshot_dir)
+        if os.path.isdir(os.path.join(snapshot_dir, name)) and name not in versions
+    ]
+    for version in doomed:
+        shutil.rmtree(os.path.join(snapshot_dir, version), ignore_errors=True)
+    return doomed
+
+
+class SnapshotPublisher:
+    """
+    Coalesces the publishes of a long-running ingester (`ingest.py --watch`).
+
+    Each sync hands over the ingested file state with `request`; `run_due`
+    publishes the latest requested state once `min_interval` seconds have
+    passed since the previous publish, so a stream of small edits produces
+    one full store copy per interval instead of one per edit. Call `run_due`
+    from the thread that writes the store, between syncs, so a snapshot never
+    sees a half-applied sync.
+    """
+
+    def __init__(
+        self,
+        vector_store,
+        lexical_index: Optional[LexicalIndex],
+        db_path: str,
+        snapshot_dir: str = SNAPSHOT_DIR,
+        backend: str = VECTOR_BACKEND,
+        min_interval: float = SNAPSHOT_MIN_INTERVAL,
+        keep: int = SNAPSHOT_KEEP,
+    ):
+        self.vector_store = vector_store
+        self.lexical_index = lexical_index
+        self.db_path = db_path
+        self.snapshot_dir = snapshot_dir
+        self.backend = backend
+        self.min_interval = min_interval
+        self.keep = keep
+        self.published = 0
+        self._requested: Optional[Dict[str, str]] = None
+        # Created right after the catch-up sync published, so the first edit waits a full interval
+        self._last_publish = time.monotonic()
+
+    def request(self, files: Dict[str, str]):
+        self._requested = dict(files)
+
+    def run_due(self, force: bool = False) -> Optional[float]:
+        """Publishes the requested state if due. Returns seconds until it will be, or None if nothing is waiting."""
+        if self._requested is None:
+            return None
+        wait = self.min_interval - (time.monotonic() - self._last_publish)
+        if wait > 0 and not force:
+            return wait
+        files, self._requested = self._requested, None
+        self._last_publish = time.monotonic()
+        try:
+            manifest = publish_snapshot(
+                self.vector_store, self.lexical_index, files, self.db_path, self.snapshot_dir, self.backend, self.keep,
+            )
+        except Exception:
+            logger.exception("Snapshot publish failed; retrying after the next interval")
+            self._requested = files
+            return self.min_interval
+        if manifest is not None:
+            self.published += 1
+            logger.info(f"Published snapshot {manifest['version']} ({manifest['chunk_count']} chunks)")
+        return None
@@ -34,19 +34,16 @@ echo -e "${BLUE}Checking Knowledge Base status...${NC}"
 # We run a small python snippet to count docs in the DB
 DOC_COUNT=$(python3 -c '
 try:
-    from langchain_chroma import Chroma
-    from langchain_google_genai import GoogleGenerativeAIEmbeddings
     from dotenv import load_dotenv
     import os
-    
+
     load_dotenv()
     if not os.path.exists("./chroma_db"):
         print("0")
         exit()
 
-    embedding = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
-    db = Chroma(persist_directory="./chroma_db", embedding_function=embedding)
-    print(db._collection.count())
+    from rag_engine.retrieval.retriever import get_retriever
+    print(get_retriever().warm())
 except Exception:
     print("0")
 ')
@@ -59,7 +56,7 @@ if [ "$DOC_COUNT" -eq "0" ]; then
     echo
     if [[ $REPLY =~ ^[Yy]$ ]]; then
         echo -e "${GREEN}Running Ingestion Script...${NC}"
-        python3 rag_engine/ingestion/ingest.py
+        python3 -m rag_engine.ingestion.ingest
         
         # Verify again
         if [ $? -ne 0 ]; then
@@ -1,5 +1,11 @@
 import sys
 import os
+import tempfile
 
 # Add project root to path so tests can import modules
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# The API module builds the Gemini client and SQLite memory at import time.
+# Unit tests swap the agent out, so a placeholder key and a throwaway DB suffice.
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+os.environ.setdefault("MEMORY_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="nebula-test-"), "memory.db"))
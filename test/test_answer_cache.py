@@ -0,0 +1,79 @@
+"""Unit tests for the semantic answer cache."""
+import json
+import os
+
+import pytest
+
+from rag_engine.agents import answer_cache
+from rag_engine.agents.answer_cache import AnswerCache, knowledge_version
+
+
+def _embed(query: str):
+    # Questions about the same topic share a direction
+    return [1.0, 0.0] if "stipend" in query.lower() else [0.0, 1.0]
+
+
+class TestAnswerCache:
+    def test_similar_question_hits(self):
+        cache = AnswerCache(embed_fn=_embed, threshold=0.9, version_fn=lambda: "v1")
+        cache.store("How much is the home office stipend?", "$1,500")
+        entry, _, similarity = cache.lookup("What's the stipend amount?")
+        assert entry.answer == "$1,500"
+        assert similarity > 0.99
+        assert cache.stats()["hits"] == 1
+
+    def test_dissimilar_question_misses(self):
+        cache = AnswerCache(embed_fn=_embed, threshold=0.9, version_fn=lambda: "v1")
+        cache.store("How much is the stipend?", "$1,500")
+        entry, vector, _ = cache.lookup("What is the password policy?")
+        assert entry is None
+        assert vector is not None
+
+    def test_version_change_evicts(self):
+        version = {"value": "v1"}
+        cache = AnswerCache(embed_fn=_embed, threshold=0.9, version_fn=lambda: version["value"])
+        cache.store("stipend?", "$1,500")
+        version["value"] = "v2"
+        entry, _, _ = cache.lookup("stipend?")
+        assert entry is None
+        assert cache.stats()["entries"] == 0
+
+    def test_ttl_expiry(self):
+        cache = AnswerCache(embed_fn=_embed, threshold=0.9, ttl=-1, version_fn=lambda: "v1")
+        cache.store("stipend?", "$1,500")
+        assert cache.lookup("stipend?")[0] is None
+
+    def test_lru_bound(self):
+        # Threshold above 1 disables semantic matches, leaving exact keys only
+        cache = AnswerCache(embed_fn=_embed, threshold=1.01, max_entries=2, version_fn=lambda: "v1")
+        for q in ["a", "b", "c"]:
+            cache.store(q, q.upper())
+        assert cache.stats()["entries"] == 2
+        assert cache.lookup("a")[0] is None
+
+
+class TestKnowledgeVersion:
+    def test_changes_with_ingestion_state(self, tmp_path):
+        state = tmp_path / "state.json"
+        state.write_text(json.dumps({"a.md": "1"}))
+        os.utime(state, ns=(1, 1))
+        before = knowledge_version(str(state), [])
+        state.write_text(json.dumps({"a.md": "2"}))
+        # Same size; explicit mtimes, as two writes can share a filesystem clock tick
+        os.utime(state, ns=(2, 2))
+        assert knowledge_version(str(state), []) != before
+
+    def test_unchanged_files_not_reparsed(self, tmp_path, monkeypatch):
+        state = tmp_path / "state.json"
+        state.write_text(json.dumps({"a.md": "1"}))
+        version = knowledge_version(str(state), [])
+        monkeypatch.setattr(answer_cache.json, "load", lambda f: pytest.fail("state re-parsed"))
+        assert knowledge_version(str(state), []) == version
+
+    def test_changes_with_structured_mtime(self, tmp_path):
+        org = tmp_path / "org_chart.json"
+        org.write_text("[]")
+        os.utime(org, ns=(1, 1))
+        before = knowledge_version(str(tmp_path / "none.json"), [str(org)])
+        os.utime(org, ns=(2, 2))
+        assert knowledge_version(str(tmp_path / "none.json"), [str(org)]) != before
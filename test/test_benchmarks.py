@@ -0,0 +1,149 @@
+"""Unit tests for the offline benchmark helpers (no server, no network)."""
+import asyncio
+import json
+import os
+
+from langchain_core.documents import Document
+from langchain_core.messages import HumanMessage
+from langchain_core.tools import tool
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.prebuilt import create_react_agent
+
+from benchmarks.checkpoint_bench import make_history, make_saver, run_level
+from benchmarks.common import ROOT, compare_metrics, percentiles
+from benchmarks.fake_llm import ScriptedChatModel
+from benchmarks.load_test import ToolTimer, flatten
+from benchmarks.retrieval_bench import QA_FILE, label_chunks, parse_indexes, recommend, score_rankings, sweep
+from benchmarks.synthetic_corpus import generate_corpus
+
+
+@tool
+def search_policies(query: str) -> str:
+    """Stub policy search."""
+    return f"policy text for {query}"
+
+
+@tool
+def lookup_role_requirements(role_title_or_id: str) -> str:
+    """Stub role lookup."""
+    return f"role {role_title_or_id}"
+
+
+class TestScriptedChatModel:
+    def _run(self, question):
+        timer = ToolTimer()
+        tools = [t.model_copy(update={"callbacks": [timer]}) for t in (search_policies, lookup_role_requirements)]
+        agent = create_react_agent(ScriptedChatModel(), tools, checkpointer=InMemorySaver())
+        result = asyncio.run(agent.ainvoke(
+            {"messages": [HumanMessage(content=question)]}, config={"configurable": {"thread_id": "t"}},
+        ))
+        return result["messages"], timer
+
+    def test_scripted_calls_then_answer(self):
+        messages, timer = self._run("Can a Senior Backend Engineer install TikTok?")
+        assert [tc["name"] for tc in messages[1].tool_calls] == ["lookup_role_requirements", "search_policies"]
+        assert "policy text for prohibited software TikTok" in messages[-1].content
+        assert set(timer.report()) == {"lookup_role_requirements", "search_policies"}
+
+    def test_unknown_question_searches_policies(self):
+        messages, _ = self._run("Where do I park?")
+        assert messages[1].tool_calls[0]["args"] == {"query": "Where do I park?"}
+
+    def test_answer_streams_in_pieces(self):
+        agent = create_react_agent(ScriptedChatModel(), [search_policies], checkpointer=InMemorySaver())
+
+        async def collect():
+            pieces = []
+            async for chunk, _ in agent.astream(
+                {"messages": [HumanMessage(content="How many vacation days do I get?")]},
+                config={"configurable": {"thread_id": "t"}}, stream_mode="messages",
+            ):
+                if chunk.content and chunk.type == "AIMessageChunk":
+                    pieces.append(chunk.content)
+            return pieces
+
+        assert len(asyncio.run(collect())) > 3
+
+
+class TestReporting:
+    def test_percentiles_in_ms(self):
+        stats = percentiles([0.001 * i for i in range(1, 101)])
+        assert stats["count"] == 100
+        assert stats["p50"] == 50.5 and stats["max"] == 100.0
+        assert percentiles([])["p95"] is None
+
+    def test_compare_flattened_results(self):
+        def result(p95):
+            return {
+                "endpoints": {"chat": {"throughput_rps": 10.0, "latency_ms": {"p50": 1.0, "p95": p95, "p99": 3.0}}},
+                "tools": {"chat": {"search_policies": {"p95": 4.0}}},
+            }
+
+        lines = compare_metrics(flatten(result(3.0)), flatten(result(2.0)))
+        assert any("chat.latency_ms.p95" in line and "+50.0%" in line for line in lines)
+        assert any("chat.tool.search_policies.p95" in line for line in lines)
+
+
+class TestSyntheticCorpus:
+    def test_facts_are_labeled_and_deterministic(self, tmp_path):
+        questions = generate_corpus(str(tmp_path / "a"), chunks=250, questions=20)
+        assert len(questions) == 20
+        assert len(os.listdir(tmp_path / "a" / "policies")) == 3
+        for q in questions:
+            text = (tmp_path / "a" / "policies" / q["file"]).read_text()
+            assert text.count(q["expect"] + ")") == 1
+        assert generate_corpus(str(tmp_path / "b"), chunks=250, questions=20) == questions
+        assert json.loads((tmp_path / "a" / "questions.json").read_text()) == questions
+
+
+class TestRetrievalScoring:
+    def test_recall_and_mrr(self):
+        relevant = [{"a"}, {"b"}, set()]
+        rankings = [["a", "x"], ["x", "b"], ["a", "b"]]
+        assert score_rankings(rankings, relevant, k=1) == {"recall": round(1 / 3, 4), "mrr": round(1 / 3, 4)}
+        assert score_rankings(rankings, relevant, k=2) == {"recall": round(2 / 3, 4), "mrr": 0.5}
+
+    def test_labels_match_expected_text_in_file(self):
+        chunks = [
+            Document(page_content="* **Minimum Length:** 16  characters.", metadata={"source_file": "it.md", "chunk_id": "1"}),
+            Document(page_content="16 characters", metadata={"source_file": "hr.md", "chunk_id": "2"}),
+        ]
+        assert label_chunks([{"file": "it.md", "expect": "Minimum length: 16 characters"}], chunks) == [{"1"}]
+
+    def test_parse_indexes_and_recommend(self):
+        assert parse_indexes("chroma,matrix:int8,matrix") == [("chroma", None), ("matrix", "int8"), ("matrix", "float16")]
+        runs = [
+            {"recall": 1.0, "context_tokens": 500, "latency_ms": {"p95": 1.0}},
+            {"recall": 1.0, "context_tokens": 200, "latency_ms": {"p95": 3.0}},
+            {"recall": 0.9, "context_tokens": 100, "latency_ms": {"p95": 0.5}},
+        ]
+        assert recommend(runs)["context_tokens"] == 200
+        assert recommend(runs, tolerance=0.1)["context_tokens"] == 100
+
+    def test_seed_sweep(self, tmp_path):
+        with open(QA_FILE, 'r') as f:
+            questions = json.load(f)
+        results = sweep(
+            os.path.join(ROOT, "data_seed", "policies"), questions, str(tmp_path),
+            chunk_sizes=[1000], overlaps=[100], ks=[1, 5], indexes=[("matrix", "int8")],
+            modes=["lexical", "hybrid"], log=lambda *_: None,
+        )
+        assert results["builds"][0]["unanswerable"] == 0
+        assert set(results["builds"][0]["indexes"]) == {"bm25", "matrix-int8"}
+        runs = {(r["index"], r["mode"], r["k"]): r for r in results["runs"]}
+        assert set(runs) == {("bm25", "lexical", 1), ("bm25", "lexical", 5), ("matrix-int8", "hybrid", 1), ("matrix-int8", "hybrid", 5)}
+        assert runs[("bm25", "lexical", 5)]["recall"] >= 0.9
+        assert runs[("bm25", "lexical", 5)]["context_tokens"] > runs[("bm25", "lexical", 1)]["context_tokens"]
+
+
+class TestCheckpointBench:
+    def test_both_modes_measure_every_operation(self, tmp_path):
+        history = make_history(4)
+        for mode in ("threaded", "pooled"):
+            saver = make_saver(mode, str(tmp_path / f"{mode}.db"))
+            try:
+                run = asyncio.run(run_level(saver, concurrency=3, turns=2, history=history, think=0.0))
+            finally:
+                getattr(saver, "close", lambda: None)()
+            assert run["turns_per_s"] > 0
+            assert run["get_ms"]["count"] == run["put_ms"]["count"] == run["put_writes_ms"]["count"] == 6
@@ -0,0 +1,166 @@
+"""Tests for the async chat endpoints using a stub agent (no LLM calls)."""
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage
+
+from backend.app import main
+from rag_engine.agents.answer_cache import AnswerCache
+
+
+class SlowAgent:
+    """Mimics agent_executor with a non-blocking delay per call."""
+
+    def __init__(self, delay: float = 0.2):
+        self.delay = delay
+        self.calls = 0
+        self.threads = {}
+
+    async def aget_state(self, config):
+        class _State:
+            values = {"messages": self.threads.get(config["configurable"]["thread_id"], [])}
+        return _State()
+
+    async def aupdate_state(self, config, values, as_node=None):
+        self.threads.setdefault(config["configurable"]["thread_id"], []).extend(values["messages"])
+
+    async def ainvoke(self, inputs, config=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        messages = inputs["messages"] + [AIMessage(content="ok")]
+        self.threads.setdefault(config["configurable"]["thread_id"], []).extend(messages)
+        return {"messages": messages}
+
+    async def astream(self, inputs, config=None, stream_mode=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        meta = {"langgraph_node": "agent"}
+        # Step 1: preamble text, then a tool call
+        yield "messages", (AIMessageChunk(content="Let me check. "), meta)
+        call = {"name": "search_policies", "args": {"query": "stipend"}, "id": "c1"}
+        yield "updates", {"agent": {"messages": [AIMessage(content="Let me check. ", tool_calls=[call])]}}
+        yield "updates", {"tools": {"messages": [ToolMessage(content="$1,500", name="search_policies", tool_call_id="c1")]}}
+        # Step 2: the answer, streamed token by token
+        for token in ["streamed ", "answer"]:
+            yield "messages", (AIMessageChunk(content=token), meta)
+        yield "updates", {"agent": {"messages": [AIMessage(content="streamed answer")]}}
+
+
+class NonStreamingAgent(SlowAgent):
+    async def astream(self, inputs, config=None, stream_mode=None):
+        yield "updates", {"agent": {"messages": [AIMessage(content=[{"type": "text", "text": "whole answer"}])]}}
+
+
+@pytest.fixture(autouse=True)
+def no_answer_cache(monkeypatch):
+    monkeypatch.setattr(main, "answer_cache", None)
+
+
+@pytest.fixture
+def slow_agent(monkeypatch):
+    agent = SlowAgent()
+    monkeypatch.setattr(main, "agent_executor", agent)
+    return agent
+
+
+def _events(response):
+    return [json.loads(line[6:]) for line in response.text.splitlines() if line.startswith("data: ")]
+
+
+async def _post_many(path, n):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await asyncio.gather(*[
+            client.post(path, json={"query": f"question {i}", "thread_id": f"t{i}"}) for i in range(n)
+        ])
+
+
+async def _post_sequence(path, payloads):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return [await client.post(path, json=p) for p in payloads]
+
+
+class TestAsyncChat:
+    def test_concurrent_requests_overlap(self, slow_agent):
+        start = time.perf_counter()
+        responses = asyncio.run(_post_many("/api/v1/chat", 5))
+        elapsed = time.perf_counter() - start
+        assert all(r.status_code == 200 for r in responses)
+        assert all(r.json()["answer"] == "ok" for r in responses)
+        # Serialized execution would take 5 x 0.2s
+        assert elapsed < 0.8
+
+    def test_stream_token_deltas(self, slow_agent):
+        (response,) = asyncio.run(_post_many("/api/v1/chat/stream", 1))
+        events = _events(response)
+        assert [e["type"] for e in events] == [
+            "token", "answer_reset", "tool_call", "tool_result", "token", "token", "done", "timing",
+        ]
+        answer = ""
+        for event in events:
+            if event["type"] == "answer_reset":
+                answer = ""
+            elif event["type"] == "token":
+                answer += event["content"]
+        assert answer == "streamed answer"
+
+    def test_stream_without_token_chunks(self, monkeypatch):
+        monkeypatch.setattr(main, "agent_executor", NonStreamingAgent())
+        (response,) = asyncio.run(_post_many("/api/v1/chat/stream", 1))
+        assert _events(response)[0] == {"type": "token", "content": "whole answer"}
+
+    def test_capacity_limit_returns_503(self, slow_agent, monkeypatch):
+        monkeypatch.setattr(main, "chat_slots", asyncio.Semaphore(1))
+        monkeypatch.setattr(main, "CHAT_QUEUE_TIMEOUT", 0.05)
+        responses = asyncio.run(_post_many("/api/v1/chat", 2))
+        assert sorted(r.status_code for r in responses) == [200, 503]
+
+
+class TestAnswerCacheEndpoints:
+    @pytest.fixture
+    def cache(self, monkeypatch):
+        cache = AnswerCache(embed_fn=lambda q: [1.0, float(len(q))], threshold=0.999, version_fn=lambda: "v1")
+        monkeypatch.setattr(main, "answer_cache", cache)
+        return cache
+
+    def test_first_turn_hit_skips_agent(self, slow_agent, cache):
+        responses = asyncio.run(_post_sequence("/api/v1/chat", [
+            {"query": "What is the stipend?", "thread_id": "a"},
+            {"query": "what is the  STIPEND?", "thread_id": "b"},
+        ]))
+        assert [r.headers["X-Answer-Cache"] for r in responses] == ["miss", "hit"]
+        assert responses[1].json()["answer"] == "ok"
+        assert slow_agent.calls == 1
+        # The cached exchange is recorded in the new thread's history
+        assert [m.content for m in slow_agent.threads["b"]] == ["what is the  STIPEND?", "ok"]
+
+    def test_follow_up_turns_bypass_cache(self, slow_agent, cache):
+        responses = asyncio.run(_post_sequence("/api/v1/chat", [
+            {"query": "What is the stipend?", "thread_id": "a"},
+            {"query": "What is the stipend?", "thread_id": "a"},
+        ]))
+        assert [r.headers["X-Answer-Cache"] for r in responses] == ["miss", "miss"]
+        assert slow_agent.calls == 2
+
+    def test_stream_cache_hit_event(self, slow_agent, cache):
+        cache.store("What is the stipend?", "It is $1,500.")
+        (response,) = asyncio.run(_post_sequence("/api/v1/chat/stream", [
+            {"query": "What is the stipend?", "thread_id": "s"},
+        ]))
+        events = _events(response)
+        assert events[:-1] == [
+            {"type": "cache_hit"},
+            {"type": "token", "content": "It is $1,500."},
+            {"type": "done"},
+        ]
+        assert events[-1]["type"] == "timing"
+        assert slow_agent.calls == 0
+
+    def test_stream_miss_stores_final_answer(self, slow_agent, cache):
+        asyncio.run(_post_sequence("/api/v1/chat/stream", [{"query": "stipend?", "thread_id": "s"}]))
+        entry, _, _ = cache.lookup("stipend?")
+        assert entry.answer == "streamed answer"
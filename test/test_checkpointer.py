@@ -0,0 +1,146 @@
+"""Unit tests for the async-capable SQLite checkpointers."""
+import asyncio
+import operator
+import sqlite3
+import threading
+from concurrent.futures import Future
+from typing import Annotated, List, TypedDict
+
+from langgraph.graph import StateGraph, START, END
+
+import pytest
+
+from rag_engine.agents.checkpointer import PooledSqliteSaver, ThreadedSqliteSaver
+
+
+class _State(TypedDict):
+    items: Annotated[List[str], operator.add]
+
+
+def _build_graph(saver):
+    graph = StateGraph(_State)
+    graph.add_node("echo", lambda state: {"items": ["step"]})
+    graph.add_edge(START, "echo")
+    graph.add_edge("echo", END)
+    return graph.compile(checkpointer=saver)
+
+
+class TestThreadedSqliteSaver:
+    def test_async_roundtrip(self, tmp_path):
+        saver = ThreadedSqliteSaver(sqlite3.connect(str(tmp_path / "mem.db"), check_same_thread=False))
+        app = _build_graph(saver)
+        config = {"configurable": {"thread_id": "t1"}}
+
+        async def run():
+            await app.ainvoke({"items": ["a"]}, config=config)
+            return await app.ainvoke({"items": ["b"]}, config=config)
+
+        result = asyncio.run(run())
+        assert result["items"] == ["a", "step", "b", "step"]
+
+        checkpoint = asyncio.run(saver.aget_tuple(config))
+        assert checkpoint is not None
+
+        async def collect():
+            return [c async for c in saver.alist(config, limit=2)]
+
+        assert len(asyncio.run(collect())) == 2
+
+    def test_async_delete_thread(self, tmp_path):
+        saver = ThreadedSqliteSaver(sqlite3.connect(str(tmp_path / "mem.db"), check_same_thread=False))
+        config = {"configurable": {"thread_id": "t1"}}
+        asyncio.run(_build_graph(saver).ainvoke({"items": []}, config=config))
+        asyncio.run(saver.adelete_thread("t1"))
+        assert saver.get_tuple(config) is None
+
+
+@pytest.fixture
+def pooled(tmp_path):
+    saver = PooledSqliteSaver(str(tmp_path / "mem.db"), readers=2)
+    yield saver
+    saver.close()
+
+
+class TestPooledSqliteSaver:
+    def test_async_roundtrip_in_wal_mode(self, pooled, tmp_path):
+        app = _build_graph(pooled)
+        config = {"configurable": {"thread_id": "t1"}}
+
+        async def run():
+            await app.ainvoke({"items": ["a"]}, config=config)
+            return await app.ainvoke({"items": ["b"]}, config=config)
+
+        assert asyncio.run(run())["items"] == ["a", "step", "b", "step"]
+
+        async def collect():
+            return [c async for c in pooled.alist(config, limit=2)]
+
+        assert len(asyncio.run(collect())) == 2
+        assert pooled.get_tuple(config).checkpoint["channel_values"]["items"] == ["a", "step", "b", "step"]
+        mode = sqlite3.connect(str(tmp_path / "mem.db")).execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode == "wal"
+
+    def test_concurrent_threads_group_committed(self, pooled):
+        app = _build_graph(pooled)
+        batches = []
+        commit = pooled._commit
+
+        def recording_commit(batch):
+            batches.append(len(batch))
+            commit(batch)
+
+        pooled._commit = recording_commit
+
+        async def run():
+            await asyncio.gather(*(
+                app.ainvoke({"items": [str(i)]}, config={"configurable": {"thread_id": f"t{i}"}}) for i in range(20)
+            ))
+
+        asyncio.run(run())
+        for i in range(20):
+            state = pooled.get_tuple({"configurable": {"thread_id": f"t{i}"}})
+            assert state.checkpoint["channel_values"]["items"] == [str(i), "step"]
+        assert max(batches) > 1
+
+    def test_reads_not_blocked_by_a_slow_commit(self, pooled):
+        asyncio.run(_build_graph(pooled).ainvoke({"items": []}, config={"configurable": {"thread_id": "t1"}}))
+        release, committing = threading.Event(), threading.Event()
+        commit = pooled._commit
+
+        def slow_commit(batch):
+            committing.set()
+            release.wait(5)
+            commit(batch)
+
+        pooled._commit = slow_commit
+        pending = pooled._submit(pooled._delete_statements("other"))
+        assert committing.wait(5)
+        # Reads go to the pool while the writer is stuck mid-commit
+        assert asyncio.run(pooled.aget_tuple({"configurable": {"thread_id": "t1"}})) is not None
+        release.set()
+        pending.result(timeout=5)
+
+    def test_failed_write_does_not_fail_its_batch(self, pooled):
+        good, bad = Future(), Future()
+        pooled._commit([
+            (pooled._delete_statements("t1"), good),
+            ([("INSERT INTO missing_table VALUES (?)", [(1,)])], bad),
+        ])
+        assert good.result() is None
+        with pytest.raises(sqlite3.OperationalError):
+            bad.result()
+
+    def test_close_flushes_and_rejects_new_writes(self, tmp_path):
+        saver = PooledSqliteSaver(str(tmp_path / "mem.db"))
+        config = {"configurable": {"thread_id": "t1"}}
+        asyncio.run(_build_graph(saver).ainvoke({"items": ["a"]}, config=config))
+        saver.close()
+        with pytest.raises(RuntimeError):
+            saver.delete_thread("t1")
+        reopened = PooledSqliteSaver(str(tmp_path / "mem.db"))
+        try:
+            assert reopened.get_tuple(config) is not None
+            asyncio.run(reopened.adelete_thread("t1"))
+            assert reopened.get_tuple(config) is None
+        finally:
+            reopened.close()
@@ -0,0 +1,138 @@
+"""Tests for conversation context windowing: tool trimming, token budget and rolling summary."""
+import asyncio
+import json
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.tools import tool
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.prebuilt import create_react_agent
+
+from benchmarks.fake_llm import ScriptedChatModel
+from rag_engine.agents.context import ContextManager, ContextState, compact_turn, message_tokens, split_turns
+
+SYSTEM = "You are the onboarding assistant."
+
+
+@tool
+def lookup_employee(name_or_id_or_role: str) -> str:
+    """Stub directory lookup returning a bulky JSON record, like the real tool."""
+    return json.dumps([{"name": name_or_id_or_role, "bio": "engineer " * 150}], indent=2)
+
+
+class _PromptSizes(BaseCallbackHandler):
+    def __init__(self):
+        self.sizes = []
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.sizes.append(sum(message_tokens(m) for m in messages[0]))
+
+
+def _turn(i, tool_calls=True):
+    messages = [HumanMessage(content=f"question {i}", id=f"h{i}")]
+    if tool_calls:
+        messages += [
+            AIMessage(content="", tool_calls=[{"name": "lookup_employee", "args": {}, "id": f"c{i}"}], id=f"a{i}"),
+            ToolMessage(content="x " * 50, tool_call_id=f"c{i}", name="lookup_employee", id=f"t{i}"),
+        ]
+    return messages + [AIMessage(content=f"answer {i}", id=f"f{i}")]
+
+
+class TestTurns:
+    def test_split_and_compact(self):
+        messages = _turn(1) + _turn(2, tool_calls=False)
+        turns = split_turns(messages)
+        assert [len(t) for t in turns] == [4, 2]
+        assert [m.id for m in compact_turn(turns[0])] == ["h1", "f1"]
+
+
+class TestContextManager:
+    def test_old_tool_messages_trimmed_from_thread(self):
+        manager = ContextManager(SYSTEM, keep_tool_turns=1, max_tokens=100_000)
+        state = {"messages": _turn(1) + _turn(2) + [HumanMessage(content="question 3", id="h3")]}
+        update = asyncio.run(manager.ahook(state))
+        assert {m.id for m in update["messages"]} == {"a1", "t1"}
+        assert [m.id for m in update["llm_input_messages"]] == ["h1", "f1", "h2", "a2", "t2", "f2", "h3"]
+        assert "summary" not in update
+
+    def test_over_budget_folds_oldest_turns_into_summary(self):
+        calls = []
+
+        async def summarize(summary, messages):
+            calls.append([m.id for m in messages])
+            return f"{summary}+{len(messages)}"
+
+        manager = ContextManager(SYSTEM, summarize=summarize, max_tokens=120, target_tokens=80,
+                                 keep_tool_turns=0, summary_tokens=10)
+        history = [m for i in range(10) for m in _turn(i, tool_calls=False)]
+        state = {"messages": history + [HumanMessage(content="question 10", id="h10")], "summary": "s"}
+        update = asyncio.run(manager.ahook(state))
+        folded = calls[0]
+        assert folded[:2] == ["h0", "f0"]
+        assert update["summary"] == f"s+{len(folded)}"
+        assert {m.id for m in update["messages"]} == set(folded)
+        assert update["llm_input_messages"][-1].id == "h10"
+        assert sum(message_tokens(m) for m in update["llm_input_messages"]) <= 80
+
+    def test_summarizer_failure_keeps_previous_summary(self):
+        async def broken(summary, messages):
+            raise RuntimeError("quota")
+
+        manager = ContextManager(SYSTEM, summarize=broken, max_tokens=60, target_tokens=40, summary_tokens=5)
+        history = [m for i in range(6) for m in _turn(i, tool_calls=False)]
+        update = asyncio.run(manager.ahook({"messages": history + [HumanMessage(content="q", id="q")],
+                                            "summary": "kept"}))
+        assert update["summary"] == "kept"
+        assert update["messages"]
+
+    def test_long_tool_result_capped_in_model_input_only(self):
+        manager = ContextManager(SYSTEM, max_tool_tokens=50)
+        state = {"messages": [HumanMessage(content="q", id="h")] + _turn(0)[1:2] + [
+            ToolMessage(content="word " * 1000, tool_call_id="c0", name="lookup_employee", id="t0"),
+        ]}
+        update = asyncio.run(manager.ahook(state))
+        capped = update["llm_input_messages"][-1]
+        assert capped.content.endswith("[... truncated to fit the context budget]")
+        assert len(capped.content) < 300 and update["messages"] == []
+
+    def test_sync_hook_leaves_thread_untouched(self):
+        manager = ContextManager(SYSTEM, keep_tool_turns=0)
+        update = manager.hook({"messages": _turn(1) + [HumanMessage(content="q", id="q")]})
+        assert set(update) == {"llm_input_messages"}
+        assert [m.id for m in update["llm_input_messages"]] == ["h1", "f1", "q"]
+
+    def test_prompt_carries_summary(self):
+        messages = ContextManager(SYSTEM).prompt({"messages": [HumanMessage(content="q")], "summary": "Asked about PTO."})
+        assert isinstance(messages[0], SystemMessage) and "Asked about PTO." in messages[0].content
+
+
+class TestLongConversation:
+    def test_prompt_and_thread_stay_bounded(self):
+        summaries = []
+
+        async def summarize(summary, messages):
+            summaries.append(len(messages))
+            return (summary + f" [{len(messages)} messages]").strip()
+
+        manager = ContextManager(SYSTEM, summarize=summarize, max_tokens=1500, target_tokens=900)
+        agent = create_react_agent(
+            ScriptedChatModel(), [lookup_employee], prompt=manager.prompt, checkpointer=InMemorySaver(),
+            state_schema=ContextState, pre_model_hook=manager.as_runnable(),
+        )
+        sizes = _PromptSizes()
+        config = {"configurable": {"thread_id": "long"}, "callbacks": [sizes]}
+
+        async def run():
+            lengths = []
+            for i in range(80):
+                await agent.ainvoke({"messages": [HumanMessage(content=f"Who is employee {i}?")]}, config=config)
+                lengths.append(len((await agent.aget_state(config)).values["messages"]))
+            return lengths, await agent.aget_state(config)
+
+        lengths, state = asyncio.run(run())
+        # Prompt and thread follow a sawtooth: they grow to the budget, then fold back
+        assert max(sizes.sizes) <= 1500 + 50  # budget plus the summary's growth within a fold
+        assert max(lengths) < 80  # vs. 320 messages unbounded
+        assert len(summaries) >= 2
+        assert state.values["summary"].count("messages]") == len(summaries)
+        assert state.values["messages"][-1].content.startswith("Here is what I found.")
@@ -0,0 +1,125 @@
+"""Unit tests for the indexed employee/role directory."""
+import json
+import os
+
+import pytest
+
+from rag_engine.agents.directory import EmployeeDirectory, RoleDirectory
+from rag_engine.agents.tools import _load_json
+
+
+def _linear_employee_search(employees, query):
+    """The original lookup_employee scan, used as the reference implementation."""
+    query_parts = query.lower().split()
+    matches = []
+    for emp in employees:
+        if query.lower() == emp["employee_id"].lower():
+            matches.append(emp)
+            continue
+        emp_text = f"{emp['name']} {emp['title']} {emp['role_id']}".lower()
+        if all(part in emp_text for part in query_parts):
+            matches.append(emp)
+    return matches
+
+
+def _linear_role_find(roles, query):
+    query_str = query.lower()
+    for role in roles:
+        if query_str in role["role_id"].lower() or query_str in role["title"].lower():
+            return role
+    return None
+
+
+@pytest.fixture
+def seed_path():
+    return os.path.join(os.getenv("DATA_PATH", "./data_seed"), "structured")
+
+
+class TestEmployeeDirectory:
+    @pytest.mark.parametrize("query", [
+        "ENG-042", "eng-042", "Sarah Chen", "Elena", "Systems Administrator", "director",
+        "Engineering Director", "en", "ro", "IT-DIR", "", "Nonexistent Person XYZ", "chen sarah",
+    ])
+    def test_matches_linear_scan(self, seed_path, query):
+        directory = EmployeeDirectory(os.path.join(seed_path, "org_chart.json"))
+        expected = _linear_employee_search(_load_json("org_chart.json"), query)
+        assert directory.search(query) == expected
+
+    def test_direct_reports(self, seed_path):
+        directory = EmployeeDirectory(os.path.join(seed_path, "org_chart.json"))
+        assert set(directory.direct_reports("EXEC-001")) == {"ENG-DIR-01", "IT-DIR-01", "SALES-010"}
+        assert directory.direct_reports("ENG-042") == []
+
+    def test_reloads_on_mtime_change(self, tmp_path):
+        path = tmp_path / "org_chart.json"
+        record = {"employee_id": "A-1", "name": "Ann Lee", "role_id": "X", "title": "Analyst", "manager_id": None}
+        path.write_text(json.dumps([record]))
+        os.utime(path, ns=(1, 1))
+        directory = EmployeeDirectory(str(path))
+        assert directory.search("ann")[0]["employee_id"] == "A-1"
+
+        record["name"] = "Bea Lee"
+        path.write_text(json.dumps([record]))
+        os.utime(path, ns=(2, 2))
+        assert directory.search("ann") == []
+        assert directory.search("bea")[0]["employee_id"] == "A-1"
+        assert directory.version == 2
+
+    def test_missing_file(self, tmp_path):
+        directory = EmployeeDirectory(str(tmp_path / "missing.json"))
+        assert directory.search("anyone") == []
+
+
+class TestRoleDirectory:
+    @pytest.mark.parametrize("query", [
+        "Senior Backend Engineer", "SALES-AE-MID", "sales", "eng", "Systems Administrator", "e", "Chief Happiness Officer",
+    ])
+    def test_matches_linear_scan(self, seed_path, query):
+        directory = RoleDirectory(os.path.join(seed_path, "role_definitions.json"))
+        expected = _linear_role_find(_load_json("role_definitions.json"), query)
+        assert directory.find(query) == expected
+        # Memoized path returns the same answer
+        assert directory.find(query) == expected
+
+    def test_earlier_substring_beats_exact_id(self, tmp_path):
+        path = tmp_path / "roles.json"
+        path.write_text(json.dumps([
+            {"role_id": "ENG-LEAD", "title": "Lead"},
+            {"role_id": "ENG", "title": "Engineer"},
+        ]))
+        assert RoleDirectory(str(path)).find("eng")["role_id"] == "ENG-LEAD"
+
+
+class TestOrgHierarchy:
+    @pytest.fixture
+    def directory(self, seed_path):
+        return EmployeeDirectory(os.path.join(seed_path, "org_chart.json"))
+
+    def test_manager_chain(self, directory):
+        assert directory.manager_chain("ENG-042") == ["ENG-DIR-01", "EXEC-001"]
+        assert directory.manager_chain("EXEC-001") == []
+
+    def test_skip_level(self, directory):
+        assert directory.skip_level("IT-005") == "EXEC-001"
+        assert directory.skip_level("ENG-DIR-01") is None
+
+    def test_org_members(self, directory):
+        assert set(directory.org_members("EXEC-001")) == {"ENG-DIR-01", "IT-DIR-01", "IT-005", "ENG-042", "SALES-010"}
+        assert directory.org_members("ENG-DIR-01") == ["ENG-042"]
+        assert directory.org_members("ENG-042") == []
+
+    def test_is_in_org(self, directory):
+        assert directory.is_in_org("ENG-042", "EXEC-001")
+        assert directory.is_in_org("IT-005", "IT-DIR-01")
+        assert not directory.is_in_org("IT-005", "ENG-DIR-01")
+        assert not directory.is_in_org("EXEC-001", "EXEC-001")
+
+    def test_manager_cycle_terminates(self, tmp_path):
+        path = tmp_path / "org.json"
+        path.write_text(json.dumps([
+            {"employee_id": "A", "name": "A", "role_id": "R", "title": "T", "manager_id": "B"},
+            {"employee_id": "B", "name": "B", "role_id": "R", "title": "T", "manager_id": "A"},
+        ]))
+        directory = EmployeeDirectory(str(path))
+        assert directory.manager_chain("A") == ["B"]
+        assert directory.org_members("A") == ["B"]
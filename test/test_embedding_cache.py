@@ -0,0 +1,88 @@
+"""Unit tests for the two-tier query-embedding cache."""
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from rag_engine.retrieval.embedding_cache import CachedQueryEmbeddings, normalize_query
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.query_calls = 0
+
+    def embed_query(self, text: str) -> List[float]:
+        self.query_calls += 1
+        return [float(len(text)), 0.5, -1.0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(t) for t in texts]
+
+
+class TestNormalizeQuery:
+    def test_case_and_whitespace(self):
+        assert normalize_query("  Home   Office\tStipend ") == "home office stipend"
+
+
+class TestCachedQueryEmbeddings:
+    def test_memory_hit_skips_remote_call(self, tmp_path):
+        inner = CountingEmbeddings()
+        cache = CachedQueryEmbeddings(inner, "model-a", path=str(tmp_path / "cache.db"))
+        first = cache.embed_query("Password policy")
+        second = cache.embed_query("password   POLICY")
+        assert first == second
+        assert inner.query_calls == 1
+        assert cache.stats()["hits_memory"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_disk_tier_survives_restart(self, tmp_path):
+        path = str(tmp_path / "cache.db")
+        CachedQueryEmbeddings(CountingEmbeddings(), "model-a", path=path).embed_query("stipend")
+
+        inner = CountingEmbeddings()
+        cache = CachedQueryEmbeddings(inner, "model-a", path=path)
+        assert cache.embed_query("stipend") == [7.0, 0.5, -1.0]
+        assert inner.query_calls == 0
+        assert cache.stats()["hits_disk"] == 1
+
+    def test_tiers_return_identical_vectors(self, tmp_path):
+        class Precise(CountingEmbeddings):
+            def embed_query(self, text):
+                return [0.1, 1 / 3, -2 / 7]
+
+        path = str(tmp_path / "cache.db")
+        cache = CachedQueryEmbeddings(Precise(), "model-a", path=path)
+        miss = cache.embed_query("stipend")
+        memory = cache.embed_query("stipend")
+        disk = CachedQueryEmbeddings(Precise(), "model-a", path=path).embed_query("stipend")
+        assert miss == memory == disk
+        assert miss != [0.1, 1 / 3, -2 / 7]  # float32, like the stored copy
+
+    def test_caller_mutation_does_not_reach_the_cache(self, tmp_path):
+        cache = CachedQueryEmbeddings(CountingEmbeddings(), "model-a", path=str(tmp_path / "cache.db"))
+        for _ in range(2):
+            vector = cache.embed_query("stipend")
+            assert vector == [7.0, 0.5, -1.0]
+            vector[0] = 99.0  # miss, then memory hit
+        assert cache.embed_query("stipend") == [7.0, 0.5, -1.0]
+
+    def test_model_change_invalidates(self, tmp_path):
+        path = str(tmp_path / "cache.db")
+        CachedQueryEmbeddings(CountingEmbeddings(), "model-a", path=path).embed_query("stipend")
+
+        inner = CountingEmbeddings()
+        cache = CachedQueryEmbeddings(inner, "model-b", path=path)
+        cache.embed_query("stipend")
+        assert inner.query_calls == 1
+
+    def test_lru_bound(self):
+        cache = CachedQueryEmbeddings(CountingEmbeddings(), "model-a", path=None, max_memory_entries=2)
+        for q in ["a", "b", "c"]:
+            cache.embed_query(q)
+        assert cache.stats()["memory_entries"] == 2
+
+    def test_documents_pass_through(self):
+        inner = CountingEmbeddings()
+        cache = CachedQueryEmbeddings(inner, "model-a", path=None)
+        cache.embed_documents(["x", "y"])
+        cache.embed_documents(["x", "y"])
+        assert inner.query_calls == 4
@@ -0,0 +1,82 @@
+"""Unit tests for the pluggable embedding providers (local backend, no network)."""
+import numpy as np
+import pytest
+
+from rag_engine.ingestion import ingest
+from rag_engine.retrieval.embeddings import (
+    EmbeddingProviderMismatch, LocalHashEmbeddings, check_index_provider, get_embeddings,
+    provider_signature, read_index_provider, write_index_provider,
+)
+from rag_engine.retrieval.retriever import RetrieverService
+
+
+class TestLocalHashEmbeddings:
+    def test_deterministic_and_normalized(self):
+        emb = LocalHashEmbeddings(dim=64)
+        a = emb.embed_query("home office stipend")
+        assert a == LocalHashEmbeddings(dim=64).embed_query("home office stipend")
+        assert len(a) == 64
+        assert np.isclose(np.linalg.norm(a), 1.0)
+
+    def test_shared_vocabulary_is_closer(self):
+        emb = LocalHashEmbeddings()
+        q = np.array(emb.embed_query("stipend for a standing desk"))
+        near, far = (np.array(v) for v in emb.embed_documents([
+            "The stipend covers a standing desk and monitor.",
+            "Passwords must be 16 characters.",
+        ]))
+        assert q @ near > q @ far
+
+    def test_empty_text(self):
+        assert not any(LocalHashEmbeddings(dim=8).embed_query("   "))
+
+
+class TestProviders:
+    def test_get_local(self):
+        assert isinstance(get_embeddings("local"), LocalHashEmbeddings)
+
+    def test_unknown_provider(self):
+        with pytest.raises(ValueError):
+            provider_signature("openai")
+
+    def test_provenance_roundtrip(self, tmp_path):
+        write_index_provider(str(tmp_path), "local")
+        assert read_index_provider(str(tmp_path)) == provider_signature("local")
+        check_index_provider(str(tmp_path), "local")
+        with pytest.raises(EmbeddingProviderMismatch):
+            check_index_provider(str(tmp_path), "gemini")
+
+
+@pytest.fixture
+def local_env(tmp_path, monkeypatch):
+    policies = tmp_path / "policies"
+    policies.mkdir()
+    (policies / "hr.md").write_text("# Benefits\nThe home office stipend is $1,500.\n\n# Security\nPasswords need 16 characters.")
+    db_path = str(tmp_path / "chroma")
+    monkeypatch.setattr(ingest, "DATA_PATH", str(policies))
+    monkeypatch.setattr(ingest, "DB_PATH", db_path)
+    monkeypatch.setattr(ingest, "EMBEDDING_PROVIDER", "local")
+    monkeypatch.setattr("rag_engine.retrieval.embeddings.EMBEDDING_PROVIDER", "local")
+    for name in ("STATE_FILE", "HASH_CACHE_FILE", "CHECKPOINT_FILE", "LEXICAL_INDEX_PATH"):
+        monkeypatch.setattr(ingest, name, str(tmp_path / name.lower()))
+    return tmp_path, db_path
+
+
+class TestOfflineRetrieval:
+    def test_ingest_and_search_locally(self, local_env):
+        tmp_path, db_path = local_env
+        ingest.ingest_data(workers=1)
+        assert read_index_provider(db_path) == provider_signature("local")
+
+        service = RetrieverService(
+            db_path=db_path, state_file=str(tmp_path / "state_file"), provider="local", mode="vector",
+            lexical_index_path=None,
+        )
+        assert "stipend" in service.search("home office stipend", k=1)[0].page_content
+
+    def test_mismatched_query_provider_refused(self, local_env):
+        tmp_path, db_path = local_env
+        ingest.ingest_data(workers=1)
+        service = RetrieverService(db_path=db_path, provider="gemini", lexical_index_path=None)
+        with pytest.raises(EmbeddingProviderMismatch):
+            service.get_vector_store()
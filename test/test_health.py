@@ -0,0 +1,125 @@
+"""Tests for the cached health checks and the /livez, /readyz and /health endpoints."""
+import asyncio
+import sqlite3
+import time
+
+import httpx
+
+from backend.app import main
+from rag_engine.observability.health import HealthMonitor, data_files_check, sqlite_check
+
+
+def _get(path):
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(path)
+    return asyncio.run(run())
+
+
+class TestHealthMonitor:
+    def test_results_cached_with_age(self):
+        calls = []
+
+        def check():
+            calls.append(1)
+            return {"doc_count": 3}
+
+        monitor = HealthMonitor({"vector_db": check}, required=["vector_db"])
+        assert monitor.snapshot()["status"] == "starting"
+        asyncio.run(monitor.refresh())
+        for _ in range(3):
+            snapshot = monitor.snapshot()
+        assert len(calls) == 1
+        assert snapshot["status"] == "ready"
+        result = snapshot["checks"]["vector_db"]
+        assert result["status"] == "ok" and result["doc_count"] == 3
+        assert result["age_s"] >= 0 and result["required"]
+
+    def test_failures_timeouts_and_optional_checks(self):
+        def broken():
+            raise RuntimeError("disk gone")
+
+        def slow():
+            time.sleep(0.5)
+            return {}
+
+        def llm_down():
+            return {"status": "error", "detail": "HTTP 503"}
+
+        monitor = HealthMonitor(
+            {"vector_db": broken, "checkpoint_db": slow, "llm": llm_down},
+            timeout=0.05, required=["vector_db", "checkpoint_db"],
+        )
+        asyncio.run(monitor.refresh())
+        snapshot = monitor.snapshot()
+        assert snapshot["status"] == "not_ready"
+        assert snapshot["checks"]["vector_db"]["detail"] == "disk gone"
+        assert "timed out" in snapshot["checks"]["checkpoint_db"]["detail"]
+        assert not snapshot["checks"]["llm"]["required"]
+
+        # An unrequired failure alone doesn't affect readiness
+        monitor = HealthMonitor({"llm": llm_down}, required=[])
+        asyncio.run(monitor.refresh())
+        assert monitor.snapshot()["status"] == "ready"
+
+    def test_stale_results_not_ready(self):
+        monitor = HealthMonitor({"vector_db": lambda: {}}, interval=1, required=["vector_db"])
+        asyncio.run(monitor.refresh())
+        monitor.results["vector_db"]["checked_at"] -= 10
+        snapshot = monitor.snapshot()
+        assert snapshot["status"] == "not_ready" and snapshot["checks"]["vector_db"]["stale"]
+
+    def test_background_task_refreshes(self):
+        calls = []
+
+        async def run():
+            monitor = HealthMonitor({"vector_db": lambda: calls.append(1) or {}}, interval=0.01)
+            monitor.start()
+            await asyncio.sleep(0.1)
+            await monitor.stop()
+
+        asyncio.run(run())
+        assert len(calls) >= 2
+
+
+class TestChecks:
+    def test_data_files(self, tmp_path):
+        (tmp_path / "structured").mkdir()
+        (tmp_path / "structured" / "org_chart.json").write_text("[]")
+        check = data_files_check(str(tmp_path), ["org_chart.json", "role_definitions.json"])
+        assert check() == {"status": "error", "detail": "missing: role_definitions.json"}
+        (tmp_path / "structured" / "role_definitions.json").write_text("[]")
+        assert check() == {"files": 2}
+
+    def test_sqlite(self, tmp_path):
+        path = tmp_path / "memory.db"
+        assert sqlite_check(str(path))()["status"] == "warning"
+        conn = sqlite3.connect(str(path))
+        conn.execute("CREATE TABLE checkpoints (id TEXT)")
+        conn.commit()
+        conn.close()
+        assert sqlite_check(str(path))()["tables"] == 1
+
+
+class TestProbeEndpoints:
+    def test_livez(self):
+        response = _get("/livez")
+        assert response.status_code == 200 and response.json() == {"status": "ok"}
+
+    def test_readyz_serves_cached_results(self, monkeypatch):
+        calls = []
+        monitor = HealthMonitor({"vector_db": lambda: calls.append(1) or {"doc_count": 5}}, required=["vector_db"])
+        monkeypatch.setattr(main, "health_monitor", monitor)
+        assert _get("/readyz").status_code == 503
+
+        asyncio.run(monitor.refresh())
+        for _ in range(3):
+            response = _get("/readyz")
+        assert response.status_code == 200
+        assert response.json()["checks"]["vector_db"]["doc_count"] == 5
+        assert len(calls) == 1
+
+        health = _get("/health").json()
+        assert health["status"] == "ok" and health["checks"]["vector_db"]["doc_count"] == 5
+        assert len(calls) == 1
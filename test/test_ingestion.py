@@ -1,5 +1,16 @@
 """Unit tests for the ingestion pipeline (no API keys needed for most tests)."""
-from rag_engine.ingestion.ingest import calculate_file_hash, load_state, save_state, process_document
+import os
+import subprocess
+import sys
+
+import pytest
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from rag_engine.ingestion.ingest import (
+    calculate_file_hash, load_state, save_state, process_document, assign_chunk_ids, ingest_data,
+)
 
 
 class TestFileHash:
@@ -53,3 +64,142 @@ class TestProcessDocument:
     def test_invalid_path(self):
         chunks = process_document("/nonexistent/file.md")
         assert chunks == []
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    embedded: int = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def ingest_env(tmp_path, monkeypatch):
+    policies = tmp_path / "policies"
+    policies.mkdir()
+    monkeypatch.setattr("rag_engine.ingestion.ingest.DATA_PATH", str(policies))
+    monkeypatch.setattr("rag_engine.ingestion.ingest.STATE_FILE", str(tmp_path / "state.json"))
+    monkeypatch.setattr("rag_engine.ingestion.ingest.HASH_CACHE_FILE", str(tmp_path / "hash_cache.json"))
+    monkeypatch.setattr("rag_engine.ingestion.ingest.CHECKPOINT_FILE", str(tmp_path / "checkpoint.json"))
+    monkeypatch.setattr("rag_engine.ingestion.ingest.LEXICAL_INDEX_PATH", str(tmp_path / "lexical.db"))
+    embeddings = CountingEmbeddings(size=8)
+    store = Chroma(persist_directory=str(tmp_path / "chroma"), embedding_function=embeddings)
+    return policies, store, embeddings
+
+
+class TestChunkIds:
+    def test_deterministic(self, tmp_path):
+        doc = tmp_path / "policy.md"
+        doc.write_text("# A\nAlpha.\n\n# B\nBeta.")
+        assert assign_chunk_ids("policy.md", process_document(str(doc))) == \
+            assign_chunk_ids("policy.md", process_document(str(doc)))
+
+    def test_header_path_distinguishes_identical_text(self, tmp_path):
+        doc = tmp_path / "policy.md"
+        doc.write_text("# A\nSame text.\n\n# B\nSame text.")
+        ids = assign_chunk_ids("policy.md", process_document(str(doc)))
+        assert len(set(ids)) == len(ids) == 2
+
+    def test_duplicates_get_suffix(self):
+        chunks = [Document(page_content="x", metadata={}), Document(page_content="x", metadata={})]
+        ids = assign_chunk_ids("f.md", chunks)
+        assert ids[1] == f"{ids[0]}-1"
+
+
+class TestIncrementalIngestion:
+    def test_single_edit_embeds_one_chunk(self, ingest_env):
+        policies, store, embeddings = ingest_env
+        sections = [f"# Section {i}\nContent for section {i}." for i in range(5)]
+        (policies / "handbook.md").write_text("\n\n".join(sections))
+        ingest_data(vector_store=store)
+        assert embeddings.embedded == 5
+        assert store._collection.count() == 5
+
+        sections[2] = "# Section 2\nEdited content."
+        (policies / "handbook.md").write_text("\n\n".join(sections))
+        ingest_data(vector_store=store)
+        assert embeddings.embedded == 6
+        assert store._collection.count() == 5
+        assert any("Edited content" in d for d in store.get()["documents"])
+
+    def test_unchanged_run_is_noop(self, ingest_env):
+        policies, store, embeddings = ingest_env
+        (policies / "a.md").write_text("# A\nAlpha.")
+        ingest_data(vector_store=store)
+        ingest_data(vector_store=store)
+        assert embeddings.embedded == 1
+
+    def test_deleted_file_removes_chunks(self, ingest_env):
+        policies, store, _ = ingest_env
+        (policies / "a.md").write_text("# A\nAlpha.")
+        (policies / "b.md").write_text("# B\nBeta.")
+        ingest_data(vector_store=store)
+        (policies / "a.md").unlink()
+        ingest_data(vector_store=store)
+        assert [m["source_file"] for m in store.get()["metadatas"]] == ["b.md"]
+
+    def test_legacy_chunks_replaced(self, ingest_env):
+        policies, store, _ = ingest_env
+        path = policies / "a.md"
+        path.write_text("# A\nAlpha.")
+        store.add_documents([Document(page_content="old", metadata={"source": str(path)})])
+        ingest_data(vector_store=store)
+        assert store.get()["documents"] == ["Alpha."]
+
+    def test_lexical_index_follows_chunks(self, ingest_env, tmp_path):
+        from rag_engine.retrieval.lexical_index import LexicalIndex
+        policies, store, _ = ingest_env
+        (policies / "a.md").write_text("# A\nThe stipend is $1,500.\n\n# B\nPasswords need 16 characters.")
+        ingest_data(vector_store=store)
+        lexical = LexicalIndex(str(tmp_path / "lexical.db"))
+        assert lexical.count() == 2
+        assert lexical.search("stipend")[0].metadata["source_file"] == "a.md"
+
+        (policies / "a.md").write_text("# B\nPasswords need 16 characters.")
+        ingest_data(vector_store=store)
+        assert lexical.count() == 1
+        assert lexical.search("stipend") == []
+
+    def test_partial_sync_only_diffs_touched_files(self, ingest_env, tmp_path):
+        import json
+        policies, store, embeddings = ingest_env
+        (policies / "a.md").write_text("# A\nAlpha.")
+        (policies / "b.md").write_text("# B\nBeta.")
+        (policies / "c.md").write_text("# C\nGamma.")
+        ingest_data(vector_store=store)
+        before = json.loads((tmp_path / "state.json").read_text())
+
+        (policies / "a.md").write_text("# A\nAlpha, edited.")
+        (policies / "b.md").write_text("# B\nBeta, edited.")
+        (policies / "c.md").unlink()
+        ingest_data(vector_store=store, only={"a.md"})
+        assert embeddings.embedded == 4
+        state = json.loads((tmp_path / "state.json").read_text())
+        assert state["a.md"] != before["a.md"]
+        # Untouched files are left for their own events
+        assert state["b.md"] == before["b.md"] and state["c.md"] == before["c.md"]
+        assert sorted(m["source_file"] for m in store.get()["metadatas"]) == ["a.md", "b.md", "c.md"]
+
+
+class TestCommandLine:
+    def test_documented_command_runs_from_repo_root(self, tmp_path):
+        """`python -m rag_engine.ingestion.ingest`, as run_app.sh, the README and docker-compose run it."""
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        (tmp_path / "policies").mkdir()
+        (tmp_path / "policies" / "hr.md").write_text("# Benefits\nThe home office stipend is $1,500.")
+        env = {k: v for k, v in os.environ.items() if k != "PYTHONPATH"}
+        env.update({
+            "DATA_PATH": str(tmp_path), "DB_PATH": str(tmp_path / "index"), "EMBEDDING_PROVIDER": "local",
+            "VECTOR_BACKEND": "matrix", "SNAPSHOT_DIR": "",
+            **{name: str(tmp_path / name.lower()) for name in (
+                "INGESTION_STATE_FILE", "INGESTION_HASH_CACHE_FILE", "INGESTION_CHECKPOINT_FILE", "LEXICAL_INDEX_PATH",
+            )},
+        })
+        result = subprocess.run(
+            [sys.executable, "-m", "rag_engine.ingestion.ingest"], cwd=root, env=env,
+            capture_output=True, text=True, timeout=120,
+        )
+        assert result.returncode == 0, result.stderr
+        assert "--- Ingestion Complete ---" in result.stdout
+        assert "hr.md" in (tmp_path / "ingestion_state_file").read_text()
@@ -0,0 +1,72 @@
+"""Unit tests for the BM25 lexical index and hybrid rank fusion."""
+import time
+
+from langchain_core.documents import Document
+
+from rag_engine.retrieval.lexical_index import LexicalIndex, to_match_query
+from rag_engine.retrieval.retriever import RetrieverService, reciprocal_rank_fusion
+
+
+def _doc(chunk_id, text):
+    return Document(page_content=text, metadata={"chunk_id": chunk_id, "source": f"{chunk_id}.md"})
+
+
+class TestMatchQuery:
+    def test_quotes_and_ors_terms(self):
+        assert to_match_query("remote stipend policy") == '"remote" OR "stipend" OR "policy"'
+
+    def test_operators_are_inert(self):
+        assert to_match_query('NOT "16 characters"*') == '"not" OR "16" OR "characters"'
+
+    def test_empty(self):
+        assert to_match_query("?!") is None
+
+
+class TestLexicalIndex:
+    def test_exact_terms_rank_first(self, tmp_path):
+        index = LexicalIndex(str(tmp_path / "lex.db"))
+        index.upsert(["a", "b", "c"], [
+            _doc("a", "Passwords must be at least 16 characters long."),
+            _doc("b", "The home office stipend covers desks and monitors."),
+            _doc("c", "Core hours are 10am to 3pm."),
+        ])
+        results = index.search("stipend", k=2)
+        assert [d.id for d in results] == ["b"]
+        assert index.search("16 characters")[0].metadata["source"] == "a.md"
+
+    def test_upsert_replaces_and_delete_removes(self, tmp_path):
+        index = LexicalIndex(str(tmp_path / "lex.db"))
+        index.upsert(["a"], [_doc("a", "old wording")])
+        index.upsert(["a"], [_doc("a", "new wording")])
+        assert index.count() == 1
+        assert index.search("old") == []
+        index.delete(["a"])
+        assert index.search("new") == []
+
+
+class TestReciprocalRankFusion:
+    def test_agreement_wins(self):
+        a, b, c = _doc("a", "A"), _doc("b", "B"), _doc("c", "C")
+        fused = reciprocal_rank_fusion([[a, b], [b, c]], limit=3)
+        assert [d.metadata["chunk_id"] for d in fused] == ["b", "a", "c"]
+
+
+class _SlowStore:
+    def similarity_search(self, query, k):
+        time.sleep(1)
+        return []
+
+
+class TestHybridSearch:
+    def test_falls_back_to_lexical_when_vector_is_slow(self, tmp_path, monkeypatch):
+        service = RetrieverService(
+            db_path=str(tmp_path / "chroma"),
+            state_file=str(tmp_path / "state.json"),
+            embeddings_factory=lambda: None,
+            lexical_index_path=str(tmp_path / "lex.db"),
+        )
+        service.get_lexical_index().upsert(["b"], [_doc("b", "The home office stipend is $1,500.")])
+        monkeypatch.setattr(service, "similarity_search", lambda q, k=5: _SlowStore().similarity_search(q, k))
+        monkeypatch.setattr("rag_engine.retrieval.retriever.VECTOR_SEARCH_TIMEOUT", 0.05)
+        results = service.search("stipend", k=5)
+        assert [d.id for d in results] == ["b"]
@@ -0,0 +1,175 @@
+"""Unit tests for the memory-mapped matrix vector store (local embeddings, no network)."""
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from rag_engine.ingestion import ingest
+from rag_engine.retrieval import matrix_store
+from rag_engine.retrieval.embeddings import LocalHashEmbeddings, read_index_info
+from rag_engine.retrieval.matrix_store import MatrixVectorStore, VectorBackendMismatch, read_index_backend
+from rag_engine.retrieval.retriever import RetrieverService
+
+TEXTS = [
+    "The home office stipend is $1,500 per year.",
+    "Passwords must be at least 16 characters long.",
+    "Engineers get a 30-day onboarding buddy.",
+    "Expense reports are due by the 5th of each month.",
+]
+
+
+def _store(tmp_path, dtype="float16"):
+    return MatrixVectorStore(str(tmp_path / "matrix"), embedding_function=LocalHashEmbeddings(dim=64), dtype=dtype)
+
+
+def _docs():
+    return [Document(page_content=t, metadata={"source_file": f"f{i % 2}.md", "chunk_id": f"c{i}"}) for i, t in enumerate(TEXTS)]
+
+
+class TestMatrixVectorStore:
+    @pytest.mark.parametrize("dtype", ["float16", "int8"])
+    def test_exact_top_k_matches_brute_force(self, tmp_path, dtype):
+        store = _store(tmp_path, dtype)
+        store.add_documents(_docs())
+        emb = LocalHashEmbeddings(dim=64)
+        query = "stipend for the home office"
+        expected = np.argsort(-(np.array(emb.embed_documents(TEXTS)) @ np.array(emb.embed_query(query))))
+        results = store.similarity_search_with_score(query, k=3)
+        assert [doc.id for doc, _ in results] == [f"c{i}" for i in expected[:3]]
+        assert results[0][1] > results[1][1]
+
+    def test_persists_and_memory_maps(self, tmp_path):
+        _store(tmp_path).add_documents(_docs())
+        reopened = _store(tmp_path)
+        assert isinstance(reopened._vectors, np.memmap)
+        assert reopened._vectors.dtype == np.float16
+        assert reopened.count() == 4
+        assert reopened.similarity_search("password length", k=1)[0].metadata["chunk_id"] == "c1"
+
+    def test_upsert_replaces_and_delete_compacts(self, tmp_path):
+        store = _store(tmp_path)
+        store.add_documents(_docs())
+        store.add_documents([Document(page_content="Passwords rotate yearly.", metadata={"chunk_id": "c1"})])
+        assert store.count() == 4
+        assert store.get(ids=["c1"])["documents"] == ["Passwords rotate yearly."]
+
+        store.delete(ids=["c0", "c2", "missing"])
+        assert store.count() == 2
+        assert sorted(store.get(include=[])["ids"]) == ["c1", "c3"]
+        assert {d.id for d in store.similarity_search("anything", k=10)} == {"c1", "c3"}
+
+    def test_where_filters_and_paging(self, tmp_path):
+        store = _store(tmp_path)
+        store.add_documents(_docs())
+        assert store.get(where={"source_file": "f0.md"}, include=[])["ids"] == ["c0", "c2"]
+        assert store.get(where={"chunk_id": {"$in": ["c1", "c3"]}}, include=[])["ids"] == ["c1", "c3"]
+        pages = [store.get(include=["metadatas"], limit=3, offset=o)["ids"] for o in (0, 3)]
+        assert pages == [["c0", "c1", "c2"], ["c3"]]
+        with pytest.raises(ValueError):
+            store.get(where={"source'; --": "x"})
+
+    def test_get_by_ids_queries_only_those_ids(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(matrix_store, "ID_QUERY_CHUNK", 2)
+        store = _store(tmp_path)
+        store.add_documents(_docs())
+        statements = []
+        store._conn.set_trace_callback(statements.append)
+
+        assert store.get(ids=["c3", "c0", "missing", "c1"])["documents"] == [TEXTS[0], TEXTS[1], TEXTS[3]]
+        # Two slices of at most two IDs, no scan of the whole table
+        assert [sql.count("'c") + sql.count("'missing'") for sql in statements] == [2, 2]
+        assert store.get(ids=["c0", "c1", "c2"], where={"source_file": "f0.md"}, include=[])["ids"] == ["c0", "c2"]
+        # The pipeline's "already stored?" check never reaches SQLite
+        statements.clear()
+        assert store.get(ids=["c2", "missing", "c1"], include=[])["ids"] == ["c1", "c2"]
+        assert statements == []
+
+    def test_deferred_writes_persist_once(self, tmp_path):
+        store = _store(tmp_path)
+        store.add_documents(_docs())
+        with store.deferred():
+            for n in range(5):
+                store.add_documents([Document(page_content=f"Extra rule {n}.", metadata={"chunk_id": f"x{n}"})])
+            store.delete(ids=["c0"])
+            # Readers keep the last flushed generation, metadata included
+            reader = _store(tmp_path)
+            assert reader.count() == 4 and reader.get(ids=["c0"])["documents"] == [TEXTS[0]]
+            assert store.count() == 8 and store.get(ids=["c0"])["ids"] == []
+        assert store._generation == 2
+        reopened = _store(tmp_path)
+        assert reopened.count() == 8 and reopened.get(ids=["c0"], include=["documents"])["ids"] == []
+        assert store._conn.execute("SELECT COUNT(*) FROM chunks WHERE chunk_id = 'c0'").fetchone()[0] == 0
+
+    def test_reader_keeps_its_snapshot(self, tmp_path):
+        writer = _store(tmp_path)
+        writer.add_documents(_docs())
+        reader = _store(tmp_path)
+        writer.delete(ids=["c0", "c1", "c2"])
+        # The old generation stays mapped until the reader reopens
+        assert reader.count() == 4
+        assert reader.similarity_search("expense report deadline", k=1)[0].id == "c3"
+        assert _store(tmp_path).count() == 1
+
+    def test_dimension_mismatch_rejected(self, tmp_path):
+        store = _store(tmp_path)
+        store.upsert(["a"], [[1.0, 0.0]], [{}], ["a"])
+        with pytest.raises(ValueError):
+            store.upsert(["b"], [[1.0, 0.0, 0.0]], [{}], ["b"])
+
+
+@pytest.fixture
+def matrix_env(tmp_path, monkeypatch):
+    policies = tmp_path / "policies"
+    policies.mkdir()
+    (policies / "hr.md").write_text("# Benefits\nThe home office stipend is $1,500.\n\n# Security\nPasswords need 16 characters.")
+    db_path = str(tmp_path / "index")
+    monkeypatch.setattr(ingest, "DATA_PATH", str(policies))
+    monkeypatch.setattr(ingest, "DB_PATH", db_path)
+    monkeypatch.setattr(ingest, "EMBEDDING_PROVIDER", "local")
+    monkeypatch.setattr("rag_engine.retrieval.embeddings.EMBEDDING_PROVIDER", "local")
+    monkeypatch.setattr(ingest, "VECTOR_BACKEND", "matrix")
+    monkeypatch.setattr(matrix_store, "VECTOR_BACKEND", "matrix")
+    for name in ("STATE_FILE", "HASH_CACHE_FILE", "CHECKPOINT_FILE", "LEXICAL_INDEX_PATH"):
+        monkeypatch.setattr(ingest, name, str(tmp_path / name.lower()))
+    return tmp_path, db_path
+
+
+class TestMatrixBackendIngestion:
+    def test_ingest_and_retrieve(self, matrix_env):
+        tmp_path, db_path = matrix_env
+        stats = ingest.ingest_data(workers=1)
+        assert stats.embedded > 0
+        assert read_index_backend(db_path) == "matrix"
+
+        service = RetrieverService(db_path=db_path, provider="local", backend="matrix", mode="vector", lexical_index_path=None)
+        assert isinstance(service.get_vector_store(), MatrixVectorStore)
+        assert "stipend" in service.search("home office stipend", k=1)[0].page_content
+
+        # Unchanged corpus -> nothing re-embedded
+        assert ingest.ingest_data(workers=1).embedded == 0
+
+    def test_backend_switch_rebuilds(self, matrix_env, monkeypatch):
+        tmp_path, db_path = matrix_env
+        ingest.ingest_data(workers=1)
+        chroma = RetrieverService(db_path=db_path, provider="local", backend="chroma", lexical_index_path=None)
+        with pytest.raises(VectorBackendMismatch):
+            chroma.get_vector_store()
+
+        monkeypatch.setattr(ingest, "VECTOR_BACKEND", "chroma")
+        stats = ingest.ingest_data(workers=1)
+        assert stats.embedded > 0
+        assert read_index_backend(db_path) == "chroma"
+        assert chroma.count() == stats.embedded
+
+    def test_chunking_change_rechunks(self, matrix_env, monkeypatch):
+        tmp_path, db_path = matrix_env
+        first = ingest.ingest_data(workers=1)
+        assert read_index_info(db_path)["chunking"] == "1000/100"
+
+        monkeypatch.setattr(ingest, "CHUNK_SIZE", 20)
+        monkeypatch.setattr(ingest, "CHUNK_OVERLAP", 0)
+        stats = ingest.ingest_data(workers=1)
+        assert stats.embedded > first.embedded
+        assert read_index_info(db_path)["chunking"] == "20/0"
+        store = MatrixVectorStore(db_path)
+        assert store.count() == stats.embedded
+        assert all(len(text) <= 20 for text in store.get()["documents"])
@@ -0,0 +1,104 @@
+"""Tests for the Prometheus metrics: agent callbacks, instrumented stages and the /metrics endpoint."""
+import asyncio
+
+import httpx
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+from langgraph.prebuilt import create_react_agent
+from prometheus_client import REGISTRY
+
+from backend.app import main
+from benchmarks.fake_llm import ScriptedChatModel
+from rag_engine.agents import tools
+from rag_engine.agents.checkpointer import ThreadedSqliteSaver
+from rag_engine.observability.metrics import AgentMetricsCallback
+
+
+def _value(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class TestAgentMetricsCallback:
+    def test_counts_llm_and_tool_calls(self, tmp_path):
+        import sqlite3
+        saver = ThreadedSqliteSaver(sqlite3.connect(str(tmp_path / "memory.db"), check_same_thread=False))
+        agent = create_react_agent(ScriptedChatModel(), [tools.lookup_org_hierarchy], checkpointer=saver)
+        llm_before = _value("nebula_llm_call_duration_seconds_count", model="ScriptedChatModel", status="ok")
+        tool_before = _value("nebula_tool_call_duration_seconds_count", tool="lookup_org_hierarchy", status="ok")
+        put_before = _value("nebula_checkpoint_duration_seconds_count", operation="put")
+
+        callback = AgentMetricsCallback()
+        asyncio.run(agent.ainvoke(
+            {"messages": [HumanMessage(content="Who is the manager of Sarah Chen?")]},
+            config={"configurable": {"thread_id": "t"}, "callbacks": [callback]},
+        ))
+        callback.finish()
+
+        assert callback.llm_calls == 2
+        assert _value("nebula_llm_call_duration_seconds_count", model="ScriptedChatModel", status="ok") == llm_before + 2
+        assert _value("nebula_tool_call_duration_seconds_count", tool="lookup_org_hierarchy", status="ok") == tool_before + 1
+        assert _value("nebula_checkpoint_duration_seconds_count", operation="put") > put_before
+
+    def test_token_usage_counted(self):
+        import uuid
+        callback = AgentMetricsCallback()
+        run_id = uuid.uuid4()
+        before = _value("nebula_llm_tokens_total", model="gemini-test", type="prompt")
+        completion_before = _value("nebula_llm_tokens_total", model="gemini-test", type="completion")
+        callback.on_chat_model_start({}, [[]], run_id=run_id, invocation_params={"model": "models/gemini-test"})
+        message = AIMessage(content="hi", usage_metadata={"input_tokens": 120, "output_tokens": 7, "total_tokens": 127})
+        callback.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]), run_id=run_id)
+        assert _value("nebula_llm_tokens_total", model="gemini-test", type="prompt") == before + 120
+        assert _value("nebula_llm_tokens_total", model="gemini-test", type="completion") == completion_before + 7
+
+
+class TestMetricsEndpoint:
+    def test_routes_and_gauges_exposed(self, monkeypatch):
+        class Agent:
+            async def aget_state(self, config):
+                class _State:
+                    values = {"messages": []}
+                return _State()
+
+            async def ainvoke(self, inputs, config=None):
+                assert config["callbacks"]
+                return {"messages": inputs["messages"] + [AIMessage(content="ok")]}
+
+        monkeypatch.setattr(main, "answer_cache", None)
+        monkeypatch.setattr(main, "agent_executor", Agent())
+
+        async def run():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                await client.post("/api/v1/chat", json={"query": "hi", "thread_id": "m1"})
+                return await client.get("/metrics")
+
+        before = _value("nebula_http_request_duration_seconds_count", method="POST", route="/api/v1/chat", status="200")
+        response = asyncio.run(run())
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "nebula_llm_calls_per_request" in response.text
+        assert _value("nebula_http_request_duration_seconds_count", method="POST", route="/api/v1/chat", status="200") == before + 1
+        assert _value("nebula_agent_runs_in_flight") == 0
+
+
+class TestRetrieverMetrics:
+    def test_embedding_and_search_timed_separately(self, tmp_path):
+        from langchain_chroma import Chroma
+        from langchain_core.documents import Document
+        from rag_engine.retrieval.embeddings import LocalHashEmbeddings
+        from rag_engine.retrieval.retriever import RetrieverService
+
+        embeddings = LocalHashEmbeddings()
+        Chroma(persist_directory=str(tmp_path / "db"), embedding_function=embeddings).add_documents(
+            [Document(page_content="The home office stipend is $1,500.")], ids=["c1"],
+        )
+        service = RetrieverService(
+            db_path=str(tmp_path / "db"), state_file=str(tmp_path / "state.json"),
+            embeddings_factory=lambda: embeddings, lexical_index_path=None, mode="vector", snapshot_dir=None,
+        )
+        embed_before = _value("nebula_embedding_duration_seconds_count", provider="custom")
+        search_before = _value("nebula_vector_search_duration_seconds_count", backend=service.backend)
+        assert "stipend" in service.search("stipend", k=1)[0].page_content
+        assert _value("nebula_embedding_duration_seconds_count", provider="custom") == embed_before + 1
+        assert _value("nebula_vector_search_duration_seconds_count", backend=service.backend) == search_before + 1
@@ -0,0 +1,143 @@
+"""Unit tests for the streaming ingestion pipeline (local fake embeddings)."""
+import json
+
+import pytest
+from langchain_chroma import Chroma
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from rag_engine.ingestion import ingest
+from rag_engine.ingestion.pipeline import IngestionPipeline, load_checkpoint
+from rag_engine.retrieval.matrix_store import MatrixVectorStore, deferred_writes
+
+
+class RecordingEmbeddings(DeterministicFakeEmbedding):
+    batches: list = []
+    failures: int = 0
+
+    def embed_documents(self, texts):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("429 Resource has been exhausted (e.g. check quota).")
+        self.batches.append(len(texts))
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return Chroma(persist_directory=str(tmp_path / "chroma"), embedding_function=RecordingEmbeddings(size=8, batches=[]))
+
+
+def _write_files(directory, n_files, sections):
+    paths = []
+    for i in range(n_files):
+        path = directory / f"doc_{i}.md"
+        path.write_text("\n\n".join(f"# Doc {i} Section {j}\nBody {i}-{j}." for j in range(sections)))
+        paths.append((str(path), f"hash{i}"))
+    return paths
+
+
+class TestIngestionPipeline:
+    def test_batches_bounded_by_size(self, tmp_path, store):
+        files = _write_files(tmp_path, 3, 4)
+        pipeline = IngestionPipeline(store, ingest.parse_file, workers=1, batch_size=5, checkpoint_path=None)
+        stats = pipeline.run(files)
+        assert stats.chunks == stats.embedded == 12
+        assert max(store.embeddings.batches) <= 5
+        assert store._collection.count() == 12
+
+    def test_batches_bounded_by_tokens(self, tmp_path, store):
+        files = _write_files(tmp_path, 1, 6)
+        pipeline = IngestionPipeline(store, ingest.parse_file, workers=1, batch_tokens=1, checkpoint_path=None)
+        pipeline.run(files)
+        assert store.embeddings.batches == [1] * 6
+
+    def test_process_pool(self, tmp_path, store):
+        files = _write_files(tmp_path, 4, 2)
+        stats = IngestionPipeline(store, ingest.parse_file, workers=2, checkpoint_path=None).run(files)
+        assert stats.files == 4
+        assert store._collection.count() == 8
+
+    def test_retries_rate_limit(self, tmp_path, store, monkeypatch):
+        monkeypatch.setattr("rag_engine.ingestion.pipeline.time.sleep", lambda s: None)
+        store.embeddings.failures = 2
+        stats = IngestionPipeline(store, ingest.parse_file, workers=1, checkpoint_path=None).run(_write_files(tmp_path, 1, 2))
+        assert stats.retries == 2
+        assert stats.embedded == 2
+
+    def test_checkpoint_and_skip_stored_chunks(self, tmp_path, store):
+        files = _write_files(tmp_path, 2, 2)
+        checkpoint = str(tmp_path / "checkpoint.json")
+        IngestionPipeline(store, ingest.parse_file, workers=1, batch_size=1, checkpoint_path=checkpoint).run(files)
+        assert load_checkpoint(checkpoint) == {"doc_0.md": "hash0", "doc_1.md": "hash1"}
+
+        # Re-running (e.g. after a crash before state was saved) re-embeds nothing
+        stats = IngestionPipeline(store, ingest.parse_file, workers=1, checkpoint_path=None).run(files)
+        assert stats.embedded == 0
+        assert stats.reused == 4
+
+    def test_matrix_store_written_at_commits_only(self, tmp_path):
+        matrix = MatrixVectorStore(str(tmp_path / "matrix"), embedding_function=RecordingEmbeddings(size=8, batches=[]))
+        files = _write_files(tmp_path, 3, 4)
+        checkpoint = str(tmp_path / "checkpoint.json")
+        with deferred_writes(matrix):
+            stats = IngestionPipeline(matrix, ingest.parse_file, workers=1, batch_size=1, checkpoint_path=checkpoint).run(files)
+        assert stats.batches == 12
+        # One generation for the end-of-run commit instead of one per batch
+        assert matrix._generation == 1
+        assert MatrixVectorStore(str(tmp_path / "matrix")).count() == 12
+        assert len(load_checkpoint(checkpoint)) == 3
+
+    def test_checkpoint_only_after_the_store_is_flushed(self, tmp_path):
+        matrix = MatrixVectorStore(str(tmp_path / "matrix"), embedding_function=RecordingEmbeddings(size=8, batches=[]))
+        checkpoint = tmp_path / "checkpoint.json"
+        durable = []
+
+        class Checked(IngestionPipeline):
+            def _chunks_done(self, filenames):
+                super()._chunks_done(filenames)
+                if checkpoint.exists():
+                    # Every checkpointed file is in the matrix a fresh reader loads
+                    durable.append(MatrixVectorStore(str(tmp_path / "matrix")).count() >= 2 * len(load_checkpoint(str(checkpoint))))
+
+        with deferred_writes(matrix):
+            Checked(matrix, ingest.parse_file, workers=1, batch_size=1, checkpoint_path=str(checkpoint), commit_interval=0).run(
+                _write_files(tmp_path, 3, 2)
+            )
+        assert durable and all(durable)
+        assert matrix._generation == 6
+
+    def test_report(self, tmp_path, store):
+        stats = IngestionPipeline(store, ingest.parse_file, workers=1, checkpoint_path=None).run(_write_files(tmp_path, 1, 1))
+        assert "files/s" in stats.report()
+        assert stats.as_dict()["chunks"] == 1
+
+
+class TestResume:
+    def test_ingest_skips_checkpointed_files(self, tmp_path, store, monkeypatch):
+        policies = tmp_path / "policies"
+        policies.mkdir()
+        (policies / "a.md").write_text("# A\nAlpha.")
+        (policies / "b.md").write_text("# B\nBeta.")
+        monkeypatch.setattr(ingest, "DATA_PATH", str(policies))
+        monkeypatch.setattr(ingest, "STATE_FILE", str(tmp_path / "state.json"))
+        monkeypatch.setattr(ingest, "HASH_CACHE_FILE", str(tmp_path / "hash_cache.json"))
+        checkpoint = tmp_path / "checkpoint.json"
+        monkeypatch.setattr(ingest, "CHECKPOINT_FILE", str(checkpoint))
+        monkeypatch.setattr(ingest, "LEXICAL_INDEX_PATH", str(tmp_path / "lexical.db"))
+
+        # Simulate a run that finished a.md and then died
+        checkpoint.write_text(json.dumps({"a.md": ingest.calculate_file_hash(str(policies / "a.md"))}))
+        stats = ingest.ingest_data(vector_store=store, workers=1)
+        assert stats.files == 1
+        assert not checkpoint.exists()
+        assert set(json.loads((tmp_path / "state.json").read_text())) == {"a.md", "b.md"}
+
+
+class TestHashCache:
+    def test_fast_path_skips_read(self, tmp_path, monkeypatch):
+        path = tmp_path / "a.md"
+        path.write_text("content")
+        cache = {}
+        first = ingest.cached_file_hash(str(path), cache)
+        monkeypatch.setattr(ingest, "calculate_file_hash", lambda p: pytest.fail("file was re-read"))
+        assert ingest.cached_file_hash(str(path), cache) == first
@@ -0,0 +1,206 @@
+"""Tests for the speculative policy search: matching, outcomes, the tool hook and the overlap with the model call."""
+import asyncio
+import time
+
+import httpx
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.prebuilt import create_react_agent
+
+from backend.app import main
+from benchmarks.fake_llm import ScriptedChatModel
+from rag_engine.agents import tools
+from rag_engine.agents.tool_execution import build_tool_node
+from rag_engine.observability.metrics import PREFETCH_REQUESTS
+from rag_engine.retrieval import prefetch as prefetch_module
+from rag_engine.retrieval.prefetch import Prefetch, prefetch_policies, prefetched_results, word_overlap
+
+QUESTION = "What is the minimum password length?"
+STIPEND = "What is the remote stipend policy?"
+COMPOUND = "How many vacation days do I get, and what is the remote stipend?"
+VECTORS = {
+    QUESTION: [1.0, 0.0], STIPEND: [1.0, 0.0], COMPOUND: [1.0, 0.0],
+    "password rules": [0.95, 0.31], "holiday calendar": [0.0, 1.0],
+}
+
+
+class _Retriever:
+    """Counts searches; each takes `delay` seconds."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.searches = []
+
+    def search(self, query, k=5):
+        time.sleep(self.delay)
+        self.searches.append(query)
+        return [Document(page_content=f"results for {query}", metadata={"source": "security.md"})]
+
+    def embed_query(self, text):
+        return VECTORS.get(text, [0.6, 0.8])
+
+
+def _outcomes():
+    return {o: PREFETCH_REQUESTS.labels(outcome=o)._value.get() for o in ("hit", "miss", "unused")}
+
+
+class TestPrefetch:
+    def test_keywords_from_the_question_served_without_embedding(self):
+        retriever = _Retriever()
+        embedded = []
+        prefetch = Prefetch(QUESTION, retriever.search, lambda t: embedded.append(t) or retriever.embed_query(t))
+        results = prefetch.match("minimum password length")
+        assert results[0].page_content == f"results for {QUESTION}"
+        assert embedded == [QUESTION] and retriever.searches == [QUESTION]
+        assert prefetch.outcome == "hit"
+
+    def test_similar_embedding_hits_and_distant_misses(self):
+        retriever = _Retriever()
+        prefetch = Prefetch(QUESTION, retriever.search, retriever.embed_query, min_similarity=0.9)
+        assert prefetch.match("holiday calendar") is None
+        assert prefetch.outcome == "miss"
+        assert prefetch.match("password rules") is not None
+        assert prefetch.outcome == "hit"
+
+    def test_hit_waits_for_a_running_search_and_reports_time_saved(self):
+        retriever = _Retriever(delay=0.2)
+        prefetch = Prefetch(QUESTION, retriever.search, retriever.embed_query)
+        time.sleep(0.15)  # the first model call
+        start = time.perf_counter()
+        assert prefetch.match(QUESTION) is not None
+        waited = time.perf_counter() - start
+        assert waited < 0.15
+        assert 0.1 < prefetch.saved <= prefetch.duration
+
+    def test_results_served_once(self):
+        retriever = _Retriever()
+        prefetch = Prefetch(QUESTION, retriever.search, retriever.embed_query)
+        assert prefetch.match(QUESTION) is not None
+        assert prefetch.match(QUESTION) is None and prefetch.match("password rules") is None
+        assert prefetch.outcome == "hit"
+
+    def test_failed_search_falls_back(self):
+        def broken(query):
+            raise RuntimeError("index unavailable")
+
+        prefetch = Prefetch(QUESTION, broken, _Retriever().embed_query)
+        assert prefetch.match(QUESTION) is None and prefetch.outcome == "error"
+
+    def test_word_overlap(self):
+        assert word_overlap("minimum password length", QUESTION) == 1.0
+        assert word_overlap("vacation days PTO", "How many vacation days do I get?") == 2 / 3
+        # Symmetric: a query covering part of the question scores low
+        assert word_overlap("stipend", STIPEND) == 1 / 3
+        assert word_overlap("vacation days", COMPOUND) == 2 / 4
+        assert word_overlap("a", QUESTION) == 0.0
+
+
+class TestPrefetchPolicies:
+    def test_disabled_by_default(self, monkeypatch):
+        monkeypatch.setattr(prefetch_module, "get_retriever", lambda: _Retriever())
+        with prefetch_policies(QUESTION, k=5) as prefetch:
+            assert prefetch is None and prefetched_results(QUESTION) is None
+
+    def test_tool_served_and_outcome_counted(self, monkeypatch):
+        retriever = _Retriever()
+        monkeypatch.setattr(prefetch_module, "get_retriever", lambda: retriever)
+        monkeypatch.setattr(tools, "get_retriever", lambda: retriever)
+        before = _outcomes()
+        with prefetch_policies(QUESTION, k=5, enabled=True):
+            result = tools.search_policies.invoke({"query": "minimum password length"})
+        with prefetch_policies("Who is my manager?", k=5, enabled=True) as unused:
+            unused._future.result()  # started, so it counts as unused rather than cancelled
+        assert f"Content: results for {QUESTION}" in result
+        assert retriever.searches == [QUESTION, "Who is my manager?"]
+        after = _outcomes()
+        assert after["hit"] == before["hit"] + 1 and after["unused"] == before["unused"] + 1
+
+    def test_shorter_retry_reaches_the_retriever(self, monkeypatch):
+        retriever = _Retriever()
+        monkeypatch.setattr(prefetch_module, "get_retriever", lambda: retriever)
+        monkeypatch.setattr(tools, "get_retriever", lambda: retriever)
+        with prefetch_policies(STIPEND, k=5, enabled=True):
+            first = tools.search_policies.invoke({"query": "remote stipend policy"})
+            retry = tools.search_policies.invoke({"query": "stipend"})
+            repeat = tools.search_policies.invoke({"query": "remote stipend policy"})
+        assert f"results for {STIPEND}" in first
+        assert "results for stipend" in retry and "results for remote stipend policy" in repeat
+        assert retriever.searches == [STIPEND, "stipend", "remote stipend policy"]
+
+    def test_parallel_sub_queries_reach_the_retriever(self, monkeypatch):
+        retriever = _Retriever(delay=0.05)
+        monkeypatch.setattr(prefetch_module, "get_retriever", lambda: retriever)
+        monkeypatch.setattr(tools, "get_retriever", lambda: retriever)
+        calls = [("search_policies", {"query": "vacation days"}), ("search_policies", {"query": "remote stipend"})]
+        model = ScriptedChatModel(script={COMPOUND: calls, QUESTION: [("search_policies", {"query": QUESTION})] * 2})
+        agent = create_react_agent(model, build_tool_node([tools.search_policies]))
+
+        def run(question):
+            with prefetch_policies(question, k=5, enabled=True):
+                result = agent.invoke({"messages": [HumanMessage(content=question)]})
+            return [m.content for m in result["messages"] if isinstance(m, ToolMessage)]
+
+        vacation, stipend = run(COMPOUND)
+        assert "results for vacation days" in vacation and "results for remote stipend" in stipend
+        assert sorted(retriever.searches) == sorted([COMPOUND, "vacation days", "remote stipend"])
+        # The same query twice in one step: one call is served, the other searches
+        retriever.searches.clear()
+        assert all(f"Content: results for {QUESTION}" in result for result in run(QUESTION))
+        assert retriever.searches == [QUESTION, QUESTION]
+
+    def test_search_overlaps_the_first_model_call(self, monkeypatch):
+        retriever = _Retriever(delay=0.2)
+        monkeypatch.setattr(prefetch_module, "get_retriever", lambda: retriever)
+        monkeypatch.setattr(tools, "get_retriever", lambda: retriever)
+        agent = create_react_agent(ScriptedChatModel(latency=0.2), build_tool_node([tools.search_policies]))
+
+        async def run(enabled):
+            start = time.perf_counter()
+            with prefetch_policies(QUESTION, k=5, enabled=enabled):
+                result = await agent.ainvoke({"messages": [HumanMessage(content=QUESTION)]})
+            return result["messages"][-1].content, time.perf_counter() - start
+
+        answer, sequential = asyncio.run(run(False))
+        answer_prefetched, overlapped = asyncio.run(run(True))
+        assert "results for minimum password length" in answer
+        assert f"results for {QUESTION}" in answer_prefetched
+        assert sequential >= 0.6 and overlapped < 0.5  # two model calls, plus the search unless prefetched
+        assert len(retriever.searches) == 2
+
+
+class _Agent:
+    def __init__(self):
+        self.served = []
+
+    async def aget_state(self, config):
+        class _State:
+            values = {"messages": []}
+        return _State()
+
+    async def ainvoke(self, inputs, config=None):
+        self.served.append(await asyncio.to_thread(prefetched_results, QUESTION))
+        return {"messages": inputs["messages"] + [AIMessage(content="ok")]}
+
+    async def astream(self, inputs, config=None, stream_mode=None):
+        self.served.append(await asyncio.to_thread(prefetched_results, QUESTION))
+        yield "updates", {"agent": {"messages": [AIMessage(content="ok")]}}
+
+
+class TestChatEndpoints:
+    def test_both_endpoints_prefetch_when_enabled(self, monkeypatch):
+        retriever = _Retriever()
+        agent = _Agent()
+        monkeypatch.setattr(prefetch_module, "get_retriever", lambda: retriever)
+        monkeypatch.setattr(prefetch_module, "PREFETCH_ENABLED", True)
+        monkeypatch.setattr(main, "answer_cache", None)
+        monkeypatch.setattr(main, "agent_executor", agent)
+
+        async def run():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                for path in ("/api/v1/chat", "/api/v1/chat/stream"):
+                    response = await client.post(path, json={"query": QUESTION, "thread_id": f"pf-{path}"})
+                    assert response.status_code == 200
+
+        asyncio.run(run())
+        assert [r[0].page_content for r in agent.served] == [f"results for {QUESTION}"] * 2
@@ -0,0 +1,135 @@
+"""Tests for the on-demand request profiler: rate limiting, artifacts and the chat endpoint gate."""
+import asyncio
+import json
+import pstats
+import threading
+import time
+
+import httpx
+from langchain_core.messages import AIMessage
+
+from backend.app import main
+from rag_engine.observability import profiler
+from rag_engine.observability.profiler import RateLimiter, StackSampler, profile_request
+
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total += sum(range(100))
+    return total
+
+
+class TestRateLimiter:
+    def test_one_at_a_time_and_per_minute(self):
+        limiter = RateLimiter(per_minute=2)
+        assert limiter.try_acquire()
+        assert not limiter.try_acquire()
+        limiter.release()
+        assert limiter.try_acquire()
+        limiter.release()
+        assert not limiter.try_acquire()
+
+
+class TestStackSampler:
+    def test_collapsed_stacks_name_thread_and_frames(self):
+        stop = threading.Event()
+
+        def spin():
+            while not stop.is_set():
+                _busy(0.001)
+
+        worker = threading.Thread(target=spin, name="spinner")
+        worker.start()
+        sampler = StackSampler(interval=0.001)
+        try:
+            for _ in range(5):
+                sampler.sample()
+        finally:
+            stop.set()
+            worker.join()
+        lines = sampler.collapsed().splitlines()
+        assert sampler.samples == 5
+        spinner = [line for line in lines if line.startswith("spinner;")]
+        assert spinner and "test_profiler.py:spin:" in spinner[0]
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+class TestProfileRequest:
+    def test_writes_pstats_and_folded(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(profiler, "_limiter", RateLimiter(per_minute=5))
+        with profile_request("chat", directory=str(tmp_path)) as profile:
+            _busy(0.05)
+        assert set(profile.paths) == {"pstats", "folded"}
+        stats = pstats.Stats(profile.paths["pstats"])
+        assert any(func[2] == "_busy" for func in stats.stats)
+        assert "_busy" in open(profile.paths["folded"]).read()
+
+    def test_rate_limited_yields_none(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(profiler, "_limiter", RateLimiter(per_minute=1))
+        with profile_request("chat", directory=str(tmp_path)):
+            pass
+        with profile_request("chat", directory=str(tmp_path)) as profile:
+            assert profile is None
+        assert len(list(tmp_path.iterdir())) == 2
+
+
+class _Agent:
+    async def aget_state(self, config):
+        class _State:
+            values = {"messages": []}
+        return _State()
+
+    async def ainvoke(self, inputs, config=None):
+        return {"messages": inputs["messages"] + [AIMessage(content="ok")]}
+
+    async def astream(self, inputs, config=None, stream_mode=None):
+        yield "updates", {"agent": {"messages": [AIMessage(content="ok")]}}
+
+
+def _post(path, headers):
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(path, json={"query": "hi", "thread_id": "p1"}, headers=headers)
+    return asyncio.run(run())
+
+
+class TestProfiledEndpoints:
+    def _setup(self, tmp_path, monkeypatch, enabled=True):
+        monkeypatch.setattr(main, "answer_cache", None)
+        monkeypatch.setattr(main, "agent_executor", _Agent())
+        monkeypatch.setattr(main, "PROFILE_ENABLED", enabled)
+        monkeypatch.setattr(main, "ADMIN_TOKEN", "")
+        monkeypatch.setattr(profiler, "PROFILE_DIR", str(tmp_path))
+        monkeypatch.setattr(profiler, "_limiter", RateLimiter(per_minute=5))
+
+    def test_chat_profiled_on_header(self, tmp_path, monkeypatch):
+        self._setup(tmp_path, monkeypatch)
+        response = _post("/api/v1/chat", {"X-Profile": "1"})
+        assert response.status_code == 200
+        profile_id = response.headers["X-Profile"]
+        assert (tmp_path / f"{profile_id}.pstats").exists()
+        assert (tmp_path / f"{profile_id}.folded").exists()
+
+    def test_chat_without_header_or_disabled_not_profiled(self, tmp_path, monkeypatch):
+        self._setup(tmp_path, monkeypatch)
+        assert "X-Profile" not in _post("/api/v1/chat", {}).headers
+        self._setup(tmp_path, monkeypatch, enabled=False)
+        assert "X-Profile" not in _post("/api/v1/chat", {"X-Profile": "1"}).headers
+        assert list(tmp_path.iterdir()) == []
+
+    def test_admin_token_required_when_set(self, tmp_path, monkeypatch):
+        self._setup(tmp_path, monkeypatch)
+        monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+        assert "X-Profile" not in _post("/api/v1/chat", {"X-Profile": "1"}).headers
+        assert "X-Profile" in _post("/api/v1/chat", {"X-Profile": "1", "X-Admin-Token": "secret"}).headers
+
+    def test_stream_ends_with_profile_event(self, tmp_path, monkeypatch):
+        self._setup(tmp_path, monkeypatch)
+        response = _post("/api/v1/chat/stream", {"X-Profile": "1"})
+        events = [json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: ")]
+        assert "done" in [event["type"] for event in events]
+        assert events[-1]["type"] == "profile" and not events[-1]["skipped"]
+        assert (tmp_path / f"{events[-1]['id']}.folded").exists()
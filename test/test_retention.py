@@ -0,0 +1,190 @@
+"""Tests for checkpoint retention: pruning, expiry, in-flight threads, vacuum and stats."""
+import asyncio
+import os
+import sqlite3
+import time
+
+import httpx
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from backend.app import main
+from rag_engine.agents.retention import CheckpointRetention, ThreadActivity, checkpoint_id_at
+
+DAY = 86400
+
+
+def _id(timestamp, n=0):
+    return checkpoint_id_at(timestamp)[:-12] + f"{n:012x}"
+
+
+def _save(saver, thread_id, timestamps, payload=""):
+    """Saves one checkpoint (with a pending write) per timestamp, oldest first."""
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    for n, timestamp in enumerate(timestamps):
+        checkpoint = {**empty_checkpoint(), "id": _id(timestamp, n)}
+        checkpoint["channel_values"] = {"messages": [f"turn {n} {payload}"]}
+        config = saver.put(config, checkpoint, {"step": n}, {})
+        saver.put_writes(config, [("messages", f"write {n}")], task_id=f"task-{n}")
+
+
+def _db(tmp_path):
+    path = str(tmp_path / "memory.db")
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    return path, SqliteSaver(conn)
+
+
+def _rows(saver, table, thread_id):
+    return saver.conn.execute(f"SELECT COUNT(*) FROM {table} WHERE thread_id = ?", (thread_id,)).fetchone()[0]
+
+
+class TestCheckpointIds:
+    def test_cutoff_orders_with_real_ids(self):
+        before = empty_checkpoint()["id"]
+        time.sleep(0.01)
+        cutoff = checkpoint_id_at(time.time())
+        time.sleep(0.01)
+        after = empty_checkpoint()["id"]
+        assert before < cutoff < after
+
+
+class TestCheckpointRetention:
+    def test_prunes_expires_and_spares_recent_threads(self, tmp_path):
+        path, saver = _db(tmp_path)
+        now = time.time()
+        _save(saver, "abandoned", [now - 40 * DAY + i for i in range(3)])
+        _save(saver, "long", [now - 3600 + i for i in range(12)])
+        _save(saver, "live", [now - 60 + i for i in range(12)])
+        latest = saver.get_tuple({"configurable": {"thread_id": "long"}}).checkpoint["id"]
+
+        report = CheckpointRetention(path, keep_per_thread=4, ttl_days=30, min_idle=300).collect()
+        assert report["expired_threads"] == 1 and report["pruned_threads"] == 1
+        assert _rows(saver, "checkpoints", "abandoned") == 0 and _rows(saver, "writes", "abandoned") == 0
+        assert _rows(saver, "checkpoints", "long") == 4 and _rows(saver, "writes", "long") == 4
+        assert _rows(saver, "checkpoints", "live") == 12
+        # The agent resumes from the same state
+        assert saver.get_tuple({"configurable": {"thread_id": "long"}}).checkpoint["id"] == latest
+        assert report["stats"]["checkpoints"] == 16 and report["stats"]["threads"] == 2
+
+    def test_dry_run_deletes_nothing(self, tmp_path):
+        path, saver = _db(tmp_path)
+        _save(saver, "long", [time.time() - 3600 + i for i in range(6)])
+        report = CheckpointRetention(path, keep_per_thread=2, min_idle=300).collect(dry_run=True)
+        assert report["pruned_threads"] == 1 and report["deleted_rows"] == 0
+        assert _rows(saver, "checkpoints", "long") == 6
+
+    def test_busy_threads_untouched(self, tmp_path):
+        path, saver = _db(tmp_path)
+        now = time.time()
+        _save(saver, "busy", [now - 40 * DAY + i for i in range(3)])
+        _save(saver, "idle", [now - 40 * DAY + i for i in range(3)])
+        activity = ThreadActivity()
+
+        async def run():
+            async with activity.track("busy"):
+                retention = CheckpointRetention(path, ttl_days=30, activity=activity)
+                return await asyncio.to_thread(retention.collect)
+
+        report = asyncio.run(run())
+        assert report["busy_threads"] == 1 and report["expired_threads"] == 1
+        assert _rows(saver, "checkpoints", "busy") == 3 and _rows(saver, "checkpoints", "idle") == 0
+
+    def test_expiry_rechecks_threads_written_since_selection(self, tmp_path):
+        path, saver = _db(tmp_path)
+        _save(saver, "revived", [time.time() - 40 * DAY])
+        retention = CheckpointRetention(path, ttl_days=30)
+        conn = retention.connect()
+        expired, _ = retention.candidates(conn)
+        assert expired == ["revived"]
+        saver.put(
+            {"configurable": {"thread_id": "revived", "checkpoint_ns": ""}}, empty_checkpoint(), {"step": 1}, {},
+        )
+        assert retention.expire(conn, expired) == 0
+        conn.close()
+        assert _rows(saver, "checkpoints", "revived") == 2
+
+    def test_vacuum_returns_space(self, tmp_path):
+        path, saver = _db(tmp_path)
+        _save(saver, "bulky", [time.time() - 40 * DAY + i for i in range(20)], payload="x" * 50_000)
+        saver.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        size = os.path.getsize(path)
+
+        report = CheckpointRetention(path, ttl_days=30).collect()
+        assert report["vacuumed_mb"] > 0.5 and report["stats"]["free_mb"] == 0
+        assert report["stats"]["auto_vacuum"] == "incremental"
+        saver.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        assert os.path.getsize(path) < size / 4
+
+    def test_enable_incremental_vacuum_converts_old_files(self, tmp_path):
+        path = str(tmp_path / "old.db")
+        SqliteSaver(sqlite3.connect(path, check_same_thread=False)).setup()
+        retention = CheckpointRetention(path)
+        conn = retention.connect()
+        assert retention.stats(conn)["auto_vacuum"] == "none"
+        assert retention.enable_incremental_vacuum(conn)
+        assert not retention.enable_incremental_vacuum(conn)
+        assert retention.stats(conn)["auto_vacuum"] == "incremental"
+        conn.close()
+
+    def test_missing_database(self, tmp_path):
+        assert CheckpointRetention(str(tmp_path / "none.db")).collect()["status"] == "warning"
+
+
+class TestThreadActivity:
+    def test_request_waits_for_held_thread(self):
+        activity = ThreadActivity()
+        order = []
+
+        async def request():
+            async with activity.track("t1"):
+                order.append("request")
+
+        async def run():
+            with activity.hold(["t1", "t2"]) as idle:
+                assert idle == ["t1", "t2"]
+                task = asyncio.create_task(request())
+                await asyncio.sleep(0.05)
+                order.append("released")
+            await task
+            assert activity.active() == []
+
+        asyncio.run(run())
+        assert order == ["released", "request"]
+
+
+class _Agent:
+    def __init__(self):
+        self.active = []
+
+    async def aget_state(self, config):
+        class _State:
+            values = {"messages": []}
+        return _State()
+
+    async def ainvoke(self, inputs, config=None):
+        self.active.append(main.thread_activity.active())
+        return {"messages": inputs["messages"] + [AIMessage(content="ok")]}
+
+    async def astream(self, inputs, config=None, stream_mode=None):
+        self.active.append(main.thread_activity.active())
+        yield "updates", {"agent": {"messages": [AIMessage(content="ok")]}}
+
+
+class TestChatTracksThreads:
+    def test_thread_active_only_while_answering(self, monkeypatch):
+        agent = _Agent()
+        monkeypatch.setattr(main, "answer_cache", None)
+        monkeypatch.setattr(main, "agent_executor", agent)
+
+        async def run():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                for path in ("/api/v1/chat", "/api/v1/chat/stream"):
+                    response = await client.post(path, json={"query": "hi", "thread_id": "gc-1"})
+                    assert response.status_code == 200
+
+        asyncio.run(run())
+        assert agent.active == [["gc-1"], ["gc-1"]]
+        assert main.thread_activity.active() == []
@@ -0,0 +1,83 @@
+"""Unit tests for the shared retriever service (local fake embeddings, no API key needed)."""
+import json
+import os
+import threading
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from rag_engine.retrieval.retriever import RetrieverService, get_retriever, set_retriever
+
+
+def _make_service(tmp_path, calls=None):
+    def factory():
+        if calls is not None:
+            calls.append(1)
+        return DeterministicFakeEmbedding(size=16)
+
+    return RetrieverService(
+        db_path=str(tmp_path / "chroma"),
+        state_file=str(tmp_path / "state.json"),
+        embeddings_factory=factory,
+        lexical_index_path=str(tmp_path / "lexical.db"),
+    )
+
+
+class TestRetrieverService:
+    def test_store_is_reused(self, tmp_path):
+        calls = []
+        service = _make_service(tmp_path, calls)
+        first = service.get_vector_store()
+        second = service.get_vector_store()
+        assert first is second
+        assert len(calls) == 1
+        assert service.reload_count == 1
+
+    def test_reloads_when_state_changes(self, tmp_path):
+        service = _make_service(tmp_path)
+        first = service.get_vector_store()
+
+        state_file = tmp_path / "state.json"
+        state_file.write_text(json.dumps({"a.md": "123"}))
+        os.utime(state_file, ns=(1, 1))
+        second = service.get_vector_store()
+        assert second is not first
+        assert service.reload_count == 2
+
+        # Unchanged state -> no further reloads
+        assert service.get_vector_store() is second
+
+    def test_search_returns_added_docs(self, tmp_path):
+        service = _make_service(tmp_path)
+        service.get_vector_store().add_documents([
+            Document(page_content="Home office stipend is $1,500", metadata={"source": "hr.md"}),
+        ])
+        results = service.similarity_search("stipend", k=1)
+        assert results[0].metadata["source"] == "hr.md"
+        assert service.count() == 1
+
+    def test_warm_skips_missing_db(self, tmp_path):
+        service = _make_service(tmp_path)
+        assert service.warm() == 0
+        assert not os.path.exists(service.db_path)
+
+    def test_concurrent_access_builds_once(self, tmp_path):
+        calls = []
+        service = _make_service(tmp_path, calls)
+        threads = [threading.Thread(target=service.get_vector_store) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(calls) == 1
+        assert service.reload_count == 1
+
+
+class TestSingleton:
+    def test_set_and_get(self, tmp_path):
+        service = _make_service(tmp_path)
+        set_retriever(service)
+        try:
+            assert get_retriever() is service
+        finally:
+            set_retriever(None)
@@ -0,0 +1,191 @@
+"""Unit tests for versioned index snapshots and hot-swapping (local embeddings, no network)."""
+import asyncio
+import json
+import os
+import time
+
+import httpx
+import pytest
+from langchain_core.documents import Document
+
+from backend.app import main
+from rag_engine.ingestion import ingest
+from rag_engine.retrieval import matrix_store, snapshots
+from rag_engine.retrieval.embeddings import LocalHashEmbeddings, write_index_provider
+from rag_engine.retrieval.lexical_index import LexicalIndex
+from rag_engine.retrieval.matrix_store import MatrixVectorStore
+from rag_engine.retrieval.retriever import RetrieverService, set_retriever
+from rag_engine.retrieval.snapshots import (
+    activate_snapshot, list_snapshots, prune_snapshots, publish_snapshot, read_current,
+)
+
+
+def _live_index(tmp_path, texts):
+    db_path = str(tmp_path / "live")
+    store = MatrixVectorStore(db_path, embedding_function=LocalHashEmbeddings())
+    docs = [Document(page_content=t, metadata={"chunk_id": f"c{i}", "source_file": "hr.md"}) for i, t in enumerate(texts)]
+    store.add_documents(docs)
+    lexical = LexicalIndex(str(tmp_path / "lexical.db"))
+    lexical.upsert([d.metadata["chunk_id"] for d in docs], docs)
+    write_index_provider(db_path, "local")
+    return db_path, store, lexical
+
+
+def _publish(tmp_path, store, lexical, files, db_path, **kwargs):
+    return publish_snapshot(store, lexical, files, db_path, str(tmp_path / "snapshots"), backend="matrix", **kwargs)
+
+
+def _service(tmp_path, db_path, mode="hybrid"):
+    return RetrieverService(
+        db_path=db_path, provider="local", backend="matrix", mode=mode,
+        lexical_index_path=str(tmp_path / "lexical.db"), snapshot_dir=str(tmp_path / "snapshots"),
+    )
+
+
+class TestPublish:
+    def test_publish_writes_manifest_and_current(self, tmp_path):
+        db_path, store, lexical = _live_index(tmp_path, ["Stipend is $1,500.", "Passwords need 16 characters."])
+        manifest = _publish(tmp_path, store, lexical, {"hr.md": "h1"}, db_path)
+        assert manifest["chunk_count"] == 2
+        assert manifest["embedding_provider"].startswith("local:")
+        current = read_current(str(tmp_path / "snapshots"))
+        assert current["version"] == manifest["version"]
+        assert current["files"] == {"hr.md": "h1"}
+
+        # Unchanged state -> nothing new published
+        assert _publish(tmp_path, store, lexical, {"hr.md": "h1"}, db_path) is None
+
+    def test_prune_keeps_newest_and_current(self, tmp_path):
+        db_path, store, lexical = _live_index(tmp_path, ["Stipend is $1,500."])
+        snapshot_dir = str(tmp_path / "snapshots")
+        versions = [_publish(tmp_path, store, lexical, {"hr.md": str(n)}, db_path, keep=10)["version"] for n in range(4)]
+        activate_snapshot(snapshot_dir, versions[0])
+        os.makedirs(os.path.join(snapshot_dir, "interrupted"))
+        removed = prune_snapshots(snapshot_dir, keep=2)
+        assert sorted(removed) == sorted([versions[1], "interrupted"])
+        assert list_snapshots(snapshot_dir) == [versions[0], versions[2], versions[3]]
+
+    def test_activate_unknown_version(self, tmp_path):
+        with pytest.raises(ValueError):
+            activate_snapshot(str(tmp_path), "nope")
+
+
+class TestHotSwap:
+    def test_serves_snapshot_and_swaps(self, tmp_path):
+        db_path, store, lexical = _live_index(tmp_path, ["The home office stipend is $1,500."])
+        first = _publish(tmp_path, store, lexical, {"hr.md": "h1"}, db_path)
+        service = _service(tmp_path, db_path)
+        assert service.warm() == 1
+        assert service.index_version() == first["version"]
+        old_store = service.get_vector_store()
+
+        store.add_documents([Document(page_content="Expense reports are due monthly.", metadata={"chunk_id": "c9"})])
+        lexical.upsert(["c9"], [Document(page_content="Expense reports are due monthly.")])
+        second = _publish(tmp_path, store, lexical, {"hr.md": "h2"}, db_path)
+
+        # The next search sees the new snapshot; one already holding the old store still works
+        assert "Expense" in service.search("expense reports", k=1)[0].page_content
+        assert service.index_version() == second["version"]
+        assert old_store.count() == 1
+        assert old_store.similarity_search("stipend", k=1)
+
+        # Rolling back is a pointer flip
+        activate_snapshot(str(tmp_path / "snapshots"), first["version"])
+        assert service.refresh() == first["version"]
+        assert service.count() == 1
+
+    def test_falls_back_to_live_index_without_snapshot(self, tmp_path):
+        db_path, _, _ = _live_index(tmp_path, ["Stipend is $1,500."])
+        service = _service(tmp_path, db_path)
+        assert service.count() == 1
+        assert service.index_version() is None
+
+
+def _ingest_env(tmp_path, monkeypatch):
+    policies = tmp_path / "policies"
+    policies.mkdir()
+    (policies / "hr.md").write_text("# Benefits\nThe home office stipend is $1,500.")
+    monkeypatch.setattr(ingest, "DATA_PATH", str(policies))
+    monkeypatch.setattr(ingest, "DB_PATH", str(tmp_path / "live"))
+    monkeypatch.setattr(ingest, "EMBEDDING_PROVIDER", "local")
+    monkeypatch.setattr("rag_engine.retrieval.embeddings.EMBEDDING_PROVIDER", "local")
+    monkeypatch.setattr(ingest, "VECTOR_BACKEND", "matrix")
+    monkeypatch.setattr(matrix_store, "VECTOR_BACKEND", "matrix")
+    monkeypatch.setattr(ingest, "SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    for name in ("STATE_FILE", "HASH_CACHE_FILE", "CHECKPOINT_FILE", "LEXICAL_INDEX_PATH"):
+        monkeypatch.setattr(ingest, name, str(tmp_path / name.lower()))
+    return policies
+
+
+class TestIngestPublishes:
+    def test_ingest_publishes_snapshot(self, tmp_path, monkeypatch):
+        _ingest_env(tmp_path, monkeypatch)
+        ingest.ingest_data(workers=1)
+        current = read_current(str(tmp_path / "snapshots"))
+        with open(tmp_path / "state_file") as f:
+            assert current["files"] == json.load(f)
+        assert current["vector_backend"] == "matrix"
+        assert os.path.exists(os.path.join(current["path"], "lexical_index.db"))
+
+    def test_watch_coalesces_publishes_of_single_file_edits(self, tmp_path, monkeypatch):
+        policies = _ingest_env(tmp_path, monkeypatch)
+        monkeypatch.setattr(ingest, "SNAPSHOT_MIN_INTERVAL", 0.3)
+        copies = []
+        copy = snapshots.copy_vector_store
+        monkeypatch.setattr(snapshots, "copy_vector_store", lambda source, target: copies.append(1) or copy(source, target))
+        waits = []
+
+        class _Watcher:
+            """Stands in for PolicyWatcher: three quick edits, then an idle interval."""
+            def __init__(self, data_path, sync_fn, idle_fn=None):
+                self.sync_fn, self.idle_fn = sync_fn, idle_fn
+
+            def run(self):
+                for n in range(3):
+                    (policies / "hr.md").write_text(f"# Benefits\nThe home office stipend is ${n},500.")
+                    self.sync_fn({"hr.md"})
+                    waits.append(self.idle_fn())
+                assert len(copies) == 1  # the catch-up sync only
+                time.sleep(0.3)
+                waits.append(self.idle_fn())
+                raise KeyboardInterrupt
+
+            def stop(self):
+                pass
+
+        monkeypatch.setattr(ingest, "PolicyWatcher", _Watcher)
+        ingest.watch(workers=1)
+        assert len(copies) == 2
+        assert all(0 < wait <= 0.3 for wait in waits[:3]) and waits[3] is None
+        current = read_current(str(tmp_path / "snapshots"))
+        assert current["files"] == {"hr.md": ingest.calculate_file_hash(str(policies / "hr.md"))}
+        assert "$2,500" in MatrixVectorStore(os.path.join(current["path"], "vectors")).get()["documents"][0]
+
+
+class TestReloadEndpoint:
+    def test_reload_and_rollback(self, tmp_path, monkeypatch):
+        db_path, store, lexical = _live_index(tmp_path, ["Stipend is $1,500."])
+        first = _publish(tmp_path, store, lexical, {"hr.md": "h1"}, db_path)
+        store.add_documents([Document(page_content="Badges are issued on day one.", metadata={"chunk_id": "c9"})])
+        second = _publish(tmp_path, store, lexical, {"hr.md": "h2"}, db_path)
+        set_retriever(_service(tmp_path, db_path))
+        monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+
+        async def run():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                denied = await client.post("/api/v1/admin/index/reload", json={})
+                headers = {"X-Admin-Token": "secret"}
+                latest = await client.post("/api/v1/admin/index/reload", json={}, headers=headers)
+                rolled = await client.post("/api/v1/admin/index/reload", json={"version": first["version"]}, headers=headers)
+                missing = await client.post("/api/v1/admin/index/reload", json={"version": "nope"}, headers=headers)
+                return denied, latest, rolled, missing
+
+        try:
+            denied, latest, rolled, missing = asyncio.run(run())
+        finally:
+            set_retriever(None)
+        assert denied.status_code == 403
+        assert latest.json()["snapshot"] == second["version"] and latest.json()["doc_count"] == 2
+        assert rolled.json()["snapshot"] == first["version"] and rolled.json()["doc_count"] == 1
+        assert missing.status_code == 404
@@ -0,0 +1,113 @@
+"""Tests for concurrent tool execution: async tools, the per-step cap and per-tool timeouts."""
+import asyncio
+import contextvars
+import threading
+import time
+
+from langchain_core.messages import HumanMessage, ToolMessage
+from langgraph.prebuilt import create_react_agent
+
+from benchmarks.fake_llm import ScriptedChatModel
+from rag_engine.agents.tool_execution import ToolCallLimiter, build_tool_node, parse_timeouts
+from rag_engine.agents.tools import offloaded_tool
+from rag_engine.observability.metrics import TOOL_CALL_TIMEOUTS
+
+_request = contextvars.ContextVar("request", default=None)
+QUESTION = "Can a Senior Backend Engineer install TikTok?"
+
+
+@offloaded_tool
+def check_role(role: str) -> str:
+    """Slow role lookup."""
+    time.sleep(0.2)
+    return f"role {role}"
+
+
+@offloaded_tool
+def check_policy(query: str) -> str:
+    """Slow policy search."""
+    time.sleep(0.2)
+    return f"policy {query}"
+
+
+@offloaded_tool
+def check_directory(name: str) -> str:
+    """Slow directory lookup."""
+    time.sleep(0.2)
+    return f"employee {name}"
+
+
+@offloaded_tool
+def hang(query: str) -> str:
+    """A tool whose backend stopped answering."""
+    time.sleep(1)
+    return "too late"
+
+
+def _run(tools, calls, limiter):
+    model = ScriptedChatModel(script={QUESTION: calls})
+    agent = create_react_agent(model, build_tool_node(tools, limiter))
+
+    async def run():
+        # Timed inside the loop: asyncio.run also waits for abandoned worker threads on exit
+        start = time.perf_counter()
+        result = await agent.ainvoke({"messages": [HumanMessage(content=QUESTION)]})
+        return result["messages"], time.perf_counter() - start
+    return asyncio.run(run())
+
+
+THREE_CALLS = [("check_role", {"role": "SBE"}), ("check_policy", {"query": "TikTok"}), ("check_directory", {"name": "Ana"})]
+
+
+class TestOffloadedTool:
+    def test_sync_and_async_share_the_implementation(self):
+        seen = []
+
+        @offloaded_tool
+        def where(query: str) -> str:
+            """Reports the thread and request it ran in."""
+            seen.append((threading.get_ident(), _request.get()))
+            return query
+
+        assert where.invoke({"query": "a"}) == "a"
+
+        async def run():
+            _request.set("r1")
+            return await where.ainvoke({"query": "b"})
+
+        assert asyncio.run(run()) == "b"
+        assert seen[0][0] == threading.get_ident()
+        assert seen[1][0] != threading.get_ident() and seen[1][1] == "r1"
+        assert where.args_schema.model_json_schema()["required"] == ["query"]
+
+
+class TestToolCallLimiter:
+    def test_step_takes_as_long_as_its_slowest_call(self):
+        limiter = ToolCallLimiter(max_concurrency=4, timeout=5)
+        messages, elapsed = _run([check_role, check_policy, check_directory], THREE_CALLS, limiter)
+        results = [m.content for m in messages if isinstance(m, ToolMessage)]
+        assert results == ["role SBE", "policy TikTok", "employee Ana"]
+        assert elapsed < 0.45  # vs. 0.6 one after another
+        assert limiter._steps == {}
+
+    def test_concurrency_capped_per_step(self):
+        _, elapsed = _run([check_role, check_policy, check_directory], THREE_CALLS, ToolCallLimiter(max_concurrency=1))
+        assert elapsed >= 0.6
+
+    def test_timeout_answers_with_error_and_keeps_other_results(self):
+        before = TOOL_CALL_TIMEOUTS.labels(tool="hang")._value.get()
+        limiter = ToolCallLimiter(timeout=5, timeouts={"hang": 0.1})
+        messages, elapsed = _run([check_role, hang], [("check_role", {"role": "SBE"}), ("hang", {"query": "x"})], limiter)
+        role, hung = [m for m in messages if isinstance(m, ToolMessage)]
+        assert role.content == "role SBE"
+        assert hung.status == "error" and "0.1 seconds" in hung.content
+        assert messages[-1].content.startswith("Here is what I found.")
+        assert elapsed < 0.5
+        assert TOOL_CALL_TIMEOUTS.labels(tool="hang")._value.get() == before + 1
+
+
+class TestConfig:
+    def test_parse_timeouts(self):
+        assert parse_timeouts("search_policies=15, lookup_employee=2.5,,bad=x") == {
+            "search_policies": 15.0, "lookup_employee": 2.5,
+        }
@@ -1,7 +1,8 @@
 """Unit tests for RAG engine tools (no API server or LLM needed)."""
 import json
 import pytest
-from rag_engine.agents.tools import lookup_employee, lookup_role_requirements, _load_json
+from rag_engine.agents import tools
+from rag_engine.agents.tools import lookup_employee, lookup_role_requirements, lookup_org_hierarchy, _load_json
 
 
 # --- Employee Lookup Tests ---
@@ -94,3 +95,43 @@ class TestSchemas:
         from pydantic import ValidationError
         with pytest.raises(ValidationError):
             ChatRequest(query="x" * 1001)
+
+
+# --- Org Hierarchy Tests ---
+
+class TestLookupOrgHierarchy:
+    def test_manager_chain_by_name(self):
+        result = json.loads(lookup_org_hierarchy.invoke({"employee": "Jordan Lee"}))
+        assert [m["name"] for m in result["managers"]] == ["Sarah Chen", "Elena Rostova"]
+
+    def test_skip_level(self):
+        result = json.loads(lookup_org_hierarchy.invoke({"employee": "IT-005", "relation": "skip_level"}))
+        assert result["skip_level"]["name"] == "Elena Rostova"
+
+    def test_direct_reports(self):
+        result = json.loads(lookup_org_hierarchy.invoke({"employee": "Sarah Chen", "relation": "direct_reports"}))
+        assert [r["employee_id"] for r in result["direct_reports"]] == ["ENG-042"]
+
+    def test_is_in_org(self):
+        result = json.loads(lookup_org_hierarchy.invoke(
+            {"employee": "Sarah Chen", "relation": "is_in_org", "other_employee": "Alex Johnson"}
+        ))
+        assert result["is_in_org"] is False
+
+    def test_ambiguous_employee(self):
+        result = lookup_org_hierarchy.invoke({"employee": "Director", "relation": "org_members"})
+        assert "several employees" in result
+
+    def test_empty_name_rejected(self):
+        for args in ({"employee": "  "}, {"employee": "Sarah Chen", "relation": "is_in_org", "other_employee": ""}):
+            result = lookup_org_hierarchy.invoke(args)
+            assert "is empty" in result and "several employees" not in result
+
+    def test_ambiguous_candidates_capped(self, monkeypatch):
+        monkeypatch.setattr(tools, "MAX_AMBIGUOUS_MATCHES", 1)
+        result = lookup_org_hierarchy.invoke({"employee": "Director", "relation": "org_members"})
+        assert result.count("(") == 1 and " more. Use an employee ID." in result
+
+    def test_unknown_relation(self):
+        result = lookup_org_hierarchy.invoke({"employee": "Sarah Chen", "relation": "peers"})
+        assert "Unknown relation" in result
@@ -0,0 +1,140 @@
+"""Tests for per-request tracing: spans, the Server-Timing header, the SSE timing event and JSONL export."""
+import asyncio
+import json
+import sqlite3
+import threading
+
+import httpx
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.prebuilt import create_react_agent
+
+from backend.app import main
+from benchmarks.fake_llm import ScriptedChatModel
+from rag_engine.agents import tools
+from rag_engine.agents.checkpointer import ThreadedSqliteSaver
+from rag_engine.observability import tracing
+from rag_engine.observability.tracing import TraceCallback, current_trace, span, traced_request
+
+
+class TestRequestTrace:
+    def test_span_outside_request_is_noop(self):
+        with span("embedding"):
+            pass
+        assert current_trace() is None
+
+    def test_summary_and_server_timing(self):
+        with traced_request("chat", thread_id="t") as trace:
+            with span("embedding"):
+                pass
+            with span("embedding"):
+                pass
+            with span("vector_search", backend="matrix"):
+                pass
+        assert current_trace() is None
+        summary = trace.summary()
+        assert summary["stages"]["embedding"]["count"] == 2
+        assert summary["total_ms"] >= summary["stages"]["vector_search"]["ms"]
+        header = trace.server_timing()
+        assert header.startswith("total;dur=")
+        assert 'embedding;dur=' in header and 'desc="2x"' in header
+
+    def test_spans_from_threads_and_jsonl_export(self, tmp_path, monkeypatch):
+        path = tmp_path / "trace.jsonl"
+        monkeypatch.setattr(tracing, "TRACE_EXPORT_PATH", str(path))
+
+        def search():
+            with span("vector_search"):
+                pass
+
+        async def run():
+            with traced_request("chat_stream", thread_id="t") as trace:
+                await asyncio.to_thread(search)
+            return trace
+
+        trace = asyncio.run(run())
+        tracing.flush_exports()
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [line["name"] for line in lines] == ["request", "vector_search"]
+        assert all(line["trace_id"] == trace.trace_id and line["thread_id"] == "t" for line in lines)
+
+    def test_export_runs_off_the_event_loop(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(tracing, "TRACE_EXPORT_PATH", str(tmp_path / "trace.jsonl"))
+        writers = []
+        monkeypatch.setattr(tracing, "_append", lambda path, lines: writers.append(threading.get_ident()))
+
+        async def run():
+            with traced_request("chat"):
+                pass
+            return threading.get_ident()
+
+        loop_thread = asyncio.run(run())
+        tracing.flush_exports()
+        assert len(writers) == 1 and writers[0] != loop_thread
+
+    def test_disabled(self, monkeypatch):
+        monkeypatch.setattr(tracing, "TRACE_ENABLED", False)
+        with traced_request("chat") as trace:
+            assert trace is None and current_trace() is None
+
+
+class TestTraceCallback:
+    def test_agent_steps_llm_and_tool_spans(self, tmp_path):
+        saver = ThreadedSqliteSaver(sqlite3.connect(str(tmp_path / "memory.db"), check_same_thread=False))
+        agent = create_react_agent(ScriptedChatModel(), [tools.lookup_org_hierarchy], checkpointer=saver)
+
+        async def run():
+            with traced_request("chat") as trace:
+                await agent.ainvoke(
+                    {"messages": [HumanMessage(content="Who is the manager of Sarah Chen?")]},
+                    config={"configurable": {"thread_id": "t"}, "callbacks": [TraceCallback(trace)]},
+                )
+            return trace
+
+        stages = asyncio.run(run()).summary()["stages"]
+        assert stages["step.agent"]["count"] == 2
+        assert stages["step.tools"]["count"] == 1
+        assert stages["llm"]["count"] == 2
+        assert stages["tool.lookup_org_hierarchy"]["count"] == 1
+        assert stages["checkpoint.put"]["count"] >= 3
+
+
+class TestTimingEndpoints:
+    class Agent:
+        async def aget_state(self, config):
+            class _State:
+                values = {"messages": []}
+            return _State()
+
+        async def ainvoke(self, inputs, config=None):
+            with span("vector_search"):
+                pass
+            return {"messages": inputs["messages"] + [AIMessage(content="ok")]}
+
+        async def astream(self, inputs, config=None, stream_mode=None):
+            with span("vector_search"):
+                pass
+            yield "updates", {"agent": {"messages": [AIMessage(content="ok")]}}
+
+    def _post(self, monkeypatch, path):
+        monkeypatch.setattr(main, "answer_cache", None)
+        monkeypatch.setattr(main, "agent_executor", self.Agent())
+
+        async def run():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.post(path, json={"query": "hi", "thread_id": "timing"})
+
+        return asyncio.run(run())
+
+    def test_chat_server_timing_header(self, monkeypatch):
+        response = self._post(monkeypatch, "/api/v1/chat")
+        assert response.status_code == 200
+        assert "vector_search;dur=" in response.headers["Server-Timing"]
+        assert len(response.headers["X-Trace-Id"]) == 32
+
+    def test_stream_final_timing_event(self, monkeypatch):
+        response = self._post(monkeypatch, "/api/v1/chat/stream")
+        events = [json.loads(line[6:]) for line in response.text.splitlines() if line.startswith("data: ")]
+        assert [e["type"] for e in events][-2:] == ["done", "timing"]
+        assert events[-1]["stages"]["vector_search"]["count"] == 1
+        assert events[-1]["spans"][0]["name"] == "vector_search"
@@ -0,0 +1,87 @@
+"""Unit tests for the debounced policy watcher."""
+import threading
+import time
+
+import pytest
+
+from rag_engine.ingestion.watcher import PolicyWatcher, read_watch_stats
+
+
+def _watcher(tmp_path, sync_fn, **kwargs):
+    kwargs.setdefault("debounce", 0.05)
+    kwargs.setdefault("stats_path", str(tmp_path / "stats.json"))
+    return PolicyWatcher(str(tmp_path), sync_fn, **kwargs)
+
+
+class TestDebounce:
+    def test_burst_becomes_one_batch(self, tmp_path):
+        watcher = _watcher(tmp_path, lambda touched: None)
+        for name in ["a.md", "b.md", "a.md"]:
+            watcher.touch(name)
+        assert watcher.stats.queue_depth == 2
+        batch = watcher._next_batch()
+        assert set(batch) == {"a.md", "b.md"}
+        watcher.sync(batch)
+        stats = read_watch_stats(str(tmp_path / "stats.json"))
+        assert stats["batches"] == 1 and stats["files_synced"] == 2 and stats["events"] == 3
+        assert stats["queue_depth"] == 0 and stats["last_lag_s"] >= 0.05
+
+    def test_max_delay_bounds_a_continuous_stream(self, tmp_path):
+        watcher = _watcher(tmp_path, lambda touched: None, debounce=10, max_delay=0.1)
+        watcher.touch("a.md")
+        started = time.monotonic()
+        assert watcher._next_batch() == {"a.md": pytest.approx(started, abs=0.05)}
+        assert time.monotonic() - started < 5
+
+    def test_failed_sync_is_requeued(self, tmp_path):
+        def failing(touched):
+            raise RuntimeError("embedding API down")
+
+        watcher = _watcher(tmp_path, failing)
+        watcher.touch("a.md")
+        watcher.sync(watcher._next_batch())
+        assert watcher.stats.errors == 1
+        assert watcher.stats.queue_depth == 1
+
+    def test_idle_timeout_returns_empty_batch(self, tmp_path):
+        watcher = _watcher(tmp_path, lambda touched: None, debounce=10)
+        started = time.monotonic()
+        assert watcher._next_batch(idle_timeout=0.05) == {}
+        watcher.touch("a.md")
+        # Pending edits still waiting for quiet don't hold up the idle work
+        assert watcher._next_batch(idle_timeout=0.05) == {}
+        assert time.monotonic() - started < 1
+
+    def test_ignores_other_files(self, tmp_path):
+        watcher = _watcher(tmp_path, lambda touched: None)
+        watcher.handle_path(str(tmp_path / "notes.txt"))
+        watcher.handle_path(str(tmp_path / "sub" / "nested.md"))
+        watcher.handle_path(str(tmp_path / "policy.md"))
+        assert set(watcher._pending) == {"policy.md"}
+
+
+@pytest.mark.parametrize("mode", ["auto", "poll"])
+def test_edits_reach_sync(tmp_path, mode):
+    synced = []
+    done = threading.Event()
+
+    def sync(touched):
+        synced.append(touched)
+        done.set()
+
+    watcher = _watcher(tmp_path, sync, mode=mode, poll_interval=0.1)
+    thread = threading.Thread(target=watcher.run, daemon=True)
+    thread.start()
+    try:
+        deadline = time.monotonic() + 5
+        while watcher._observer is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.2)
+        (tmp_path / "travel.md").write_text("# Travel\nBook via the portal.")
+        assert done.wait(5)
+    finally:
+        watcher.stop()
+        thread.join(5)
+    assert synced[0] == {"travel.md"}
+    if mode == "poll":
+        assert watcher.stats.mode == "polling"